@@ -0,0 +1,326 @@
+"""
+Batch mode: run the scene pipeline over many drawings with a process pool.
+
+Scenes can be given as a directory (every *.json inside), a glob pattern,
+or a manifest file (.txt / .manifest, one path per line, '#' comments).
+Each scene runs in isolation: a failing scene is reported in the output
+and the rest of the batch carries on.
+
+Usage:
+    python3 batch.py scenes/ --workers 8 --chunksize 16 --output bodies.json
+    python3 batch.py "drawings/**/*.json"
+    python3 batch.py nightly.txt --grouping unionfind --format ndjson
+    python3 batch.py scenes/ --render renders/      # also draw each scene to renders/<name>.svg
+"""
+import glob
+import json
+import logging
+import os
+import sys
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+
+from take_input import Scene
+from scene_binary import BinaryScene
+from scene_pipeline import SceneUnderstanding, configure_logging
+from result_writer import RESULT_FORMATS, error_record, write_results
+from profiling import aggregate_profiles
+from scene_cache import SceneCache
+from scene_validation import check_scene
+from engines import ENGINE_PROFILES, engine_names, resolve_engines
+
+logger = logging.getLogger(__name__)
+
+# Tests name a scene here (its path, or its "name" option) to make the worker analyzing it die
+TEST_EXIT_ENV = "SCENE_TEST_EXIT"
+
+MANIFEST_SUFFIXES = {".txt", ".manifest", ".lst"}
+SCENE_SUFFIXES = {".json", ".scnb"}
+
+def collect_scenes(source: str) -> List[str]:
+    """Expand a directory, glob pattern or manifest into a sorted list of scene paths"""
+    path = Path(source)
+    if path.is_dir():
+        return sorted(str(p) for p in path.iterdir() if p.suffix in SCENE_SUFFIXES)
+    if path.is_file() and path.suffix in MANIFEST_SUFFIXES:
+        scenes = []
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    # Relative entries are relative to the manifest itself
+                    scenes.append(str(path.parent / line) if not os.path.isabs(line) else line)
+        return scenes
+    if path.is_file():
+        return [str(path)]
+    return sorted(glob.glob(source, recursive=True))
+
+_caches: Dict[str, SceneCache] = {}
+
+def _worker_cache(cache_dir: Optional[str]) -> Optional[SceneCache]:
+    """One SceneCache per directory per process; entries are shared on disk"""
+    if not cache_dir:
+        return None
+    if cache_dir not in _caches:
+        _caches[cache_dir] = SceneCache(cache_dir)
+    return _caches[cache_dir]
+
+def _test_exit(name: Optional[str]) -> None:
+    """Test hook: exit the process, as a crashing worker would, for the scene in $SCENE_TEST_EXIT"""
+    if name and name == os.environ.get(TEST_EXIT_ENV):
+        os._exit(1)
+
+def analyze_scene_file(path: str, grouping_engine: str = "reference",
+                       classifier_engine: str = "reference",
+                       link_engine: str = "reference",
+                       include_links: bool = False, profile: bool = False,
+                       cache_dir: Optional[str] = None, validate: bool = False,
+                       render_dir: Optional[str] = None) -> Dict:
+    """Run the pipeline on one scene and return a result record; never raises"""
+    _test_exit(path)
+    try:
+        pipeline = SceneUnderstanding(path, grouping_engine=grouping_engine,
+                                      classifier_engine=classifier_engine,
+                                      link_engine=link_engine,
+                                      profile=profile,
+                                      cache=_worker_cache(cache_dir),
+                                      validate=validate)
+        pipeline.run_pipeline()
+        record = pipeline.result_record(include_links=include_links)
+    except Exception as e:
+        return error_record(path, e)
+    if render_dir:
+        _render(pipeline, path, render_dir)
+    return record
+
+def _render(pipeline: SceneUnderstanding, path: str, render_dir: str) -> None:
+    """Draw a scene to render_dir; a drawing that fails to render still has its results"""
+    try:
+        pipeline.render(str(Path(render_dir) / f"{Path(path).stem}.svg"))
+    except Exception as e:
+        logger.warning("%s: rendering failed: %s", path, e)
+
+def analyze_scene_data(data: Union[Dict, Scene, BinaryScene], options: Dict) -> Dict:
+    """
+    Run the pipeline on in-memory scene data or an already parsed scene; never raises.
+
+    options may hold name, engine (profile), grouping, classifier, link, timings (profile), links,
+    components, validate, budget and budget_steps, as accepted by the service
+    and stream modes.
+    """
+    name = options.get("name")
+    _test_exit(name)
+    try:
+        if options.get("validate"):
+            check_scene(data, name)
+        scene = Scene(data, source=name) if isinstance(data, dict) else data
+        pipeline = SceneUnderstanding(scene,
+                                      engine=options.get("engine"),
+                                      grouping_engine=options.get("grouping"),
+                                      classifier_engine=options.get("classifier"),
+                                      link_engine=options.get("link"),
+                                      profile=bool(options.get("timings")),
+                                      split_components=bool(options.get("components")),
+                                      budget=options.get("budget"),
+                                      budget_steps=options.get("budget_steps"))
+        pipeline.run_pipeline()
+        return pipeline.result_record(include_links=bool(options.get("links")))
+    except Exception as e:
+        return error_record(name, e)
+
+def _analyze_chunk(task: Callable[[str], Dict], paths: List[str]) -> List[Dict]:
+    return [task(path) for path in paths]
+
+def _run_pool(task: Callable[[str], Dict], scenes: List[str], workers: Optional[int],
+              chunksize: int) -> List[Dict]:
+    """
+    Records for `scenes` from a process pool, in order, surviving dead workers.
+
+    At most one chunk per worker is in flight, so when a worker dies the
+    chunks not handed out yet go to a new pool. A lone scene in flight is
+    the one that was running and gets an error record; several are rerun
+    one at a time, so only a scene that kills its worker again fails.
+    """
+    workers = workers or os.cpu_count() or 1
+    results: List[Optional[Dict]] = [None] * len(scenes)
+    chunks = deque(list(range(start, min(start + chunksize, len(scenes))))
+                   for start in range(0, len(scenes), chunksize))
+    while chunks:
+        running = {}
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                while chunks or running:
+                    while chunks and len(running) < workers:
+                        chunk = chunks.popleft()
+                        running[pool.submit(_analyze_chunk, task, [scenes[i] for i in chunk])] = chunk
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        records = future.result()
+                        for i, record in zip(running.pop(future), records):
+                            results[i] = record
+        except BrokenProcessPool as e:
+            suspects = [i for chunk in running.values() for i in chunk]
+            if len(suspects) == 1:
+                logger.warning("Worker died running %s", scenes[suspects[0]])
+                results[suspects[0]] = error_record(scenes[suspects[0]], e)
+            else:
+                logger.warning("A worker died; rerunning %d scenes one at a time", len(suspects))
+                _run_alone(task, scenes, suspects, results)
+    return results
+
+def _run_alone(task: Callable[[str], Dict], scenes: List[str], indices: List[int],
+               results: List[Optional[Dict]]) -> None:
+    """Run each scene by itself in a one-worker pool; a scene that kills it gets an error record"""
+    pool = None
+    for i in indices:
+        pool = pool or ProcessPoolExecutor(max_workers=1)
+        try:
+            results[i] = pool.submit(task, scenes[i]).result()
+        except BrokenProcessPool as e:
+            results[i] = error_record(scenes[i], e)
+            pool.shutdown()
+            pool = None
+    if pool is not None:
+        pool.shutdown()
+
+def run_batch(scenes: List[str], workers: Optional[int] = None, chunksize: int = 1,
+              grouping_engine: str = "reference",
+              classifier_engine: str = "reference",
+              link_engine: str = "reference",
+              include_links: bool = False, profile: bool = False,
+              cache_dir: Optional[str] = None, validate: bool = False,
+              render_dir: Optional[str] = None, prefetch: int = 0) -> Dict:
+    """
+    Analyze scenes across a pool of worker processes.
+
+    workers=None uses one process per CPU; workers=1 runs in this process.
+    Results keep the order of `scenes`. With profile=True every record
+    carries its scene's profile and the summary an aggregate under "profile".
+    cache_dir shares a SceneCache between all workers. validate rejects
+    inconsistent scenes before their analysis starts. render_dir gets one
+    SVG per analyzed scene, drawn by the worker that analyzed it. With
+    workers=1, prefetch > 0 reads that many scenes ahead in the background.
+    A worker that dies costs only the scene it was running; the rest of
+    the batch continues in a fresh pool.
+    """
+    task = partial(analyze_scene_file, grouping_engine=grouping_engine,
+                   classifier_engine=classifier_engine, link_engine=link_engine,
+                   include_links=include_links,
+                   profile=profile, cache_dir=cache_dir, validate=validate,
+                   render_dir=render_dir)
+    if workers == 1 and prefetch > 0:
+        results = []
+        runs = SceneUnderstanding.run_many(scenes, prefetch=prefetch,
+                                           grouping_engine=grouping_engine,
+                                           classifier_engine=classifier_engine,
+                                           link_engine=link_engine,
+                                           profile=profile, cache=_worker_cache(cache_dir),
+                                           validate=validate)
+        for path, pipeline in runs:
+            if isinstance(pipeline, Exception):
+                results.append(error_record(path, pipeline))
+                continue
+            results.append(pipeline.result_record(include_links=include_links))
+            if render_dir:
+                _render(pipeline, path, render_dir)
+    elif workers == 1:
+        results = [task(path) for path in scenes]
+    else:
+        results = _run_pool(task, scenes, workers, max(1, chunksize))
+
+    failed = sum(1 for r in results if r["status"] != "ok")
+    summary = {
+        "scenes": len(results),
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "results": results,
+    }
+    if profile:
+        summary["profile"] = aggregate_profiles(r.get("profile") for r in results)
+    return summary
+
+def test_worker_crash_isolation(tmp_path, monkeypatch):
+    """A worker that dies fails only the scene it was running"""
+    from synthetic_scenes import generate_scene
+    scenes = []
+    for name in ("a", "b", "crash", "c", "d", "e", "f"):
+        path = tmp_path / f"{name}.json"
+        path.write_text(json.dumps(generate_scene(num_regions=10, seed=len(scenes))))
+        scenes.append(str(path))
+    monkeypatch.setenv(TEST_EXIT_ENV, scenes[2])
+    # Alone in its chunk, and sharing one with a scene that must be rerun
+    for chunksize in (1, 2):
+        summary = run_batch(scenes, workers=2, chunksize=chunksize)
+        statuses = [record["status"] for record in summary["results"]]
+        assert statuses == ["ok", "ok", "error", "ok", "ok", "ok", "ok"], chunksize
+        assert summary["results"][2]["input"] == scenes[2]
+
+def main():
+    """Command line interface for batch scene analysis"""
+    import argparse
+    parser = argparse.ArgumentParser(description="Scene Understanding batch runner")
+    parser.add_argument('source',
+                       help='Directory of scenes, glob pattern, or manifest file')
+    parser.add_argument('--workers', '-j', type=int, default=None,
+                       help='Worker processes (default: one per CPU)')
+    parser.add_argument('--chunksize', type=int, default=1,
+                       help='Scenes handed to a worker at a time (default: 1)')
+    parser.add_argument('--output', '-o', default=None,
+                       help='Write results here (default: stdout)')
+    parser.add_argument('--format', choices=RESULT_FORMATS, default='json',
+                       help='json: one summary document; ndjson: one line per scene')
+    parser.add_argument('--links', action='store_true',
+                       help='Include region links in each result')
+    parser.add_argument('--engine', choices=ENGINE_PROFILES, default=None,
+                       help='Engine profile for all stages (default: reference); see engines.py')
+    parser.add_argument('--grouping', choices=engine_names("group"), default=None,
+                       help='Region grouping engine (default: from --engine)')
+    parser.add_argument('--classifier', choices=engine_names("classify"), default=None,
+                       help='Vertex classifier (default: from --engine)')
+    parser.add_argument('--linking', choices=engine_names("link"), default=None,
+                       help='Region linking engine (default: from --engine)')
+    parser.add_argument('--profile', metavar='FILE', default=None,
+                       help='Profile every scene and write the aggregated JSON report to FILE')
+    parser.add_argument('--cache', metavar='DIR', default=None,
+                       help='Reuse stage results of previously seen scenes from DIR')
+    parser.add_argument('--validate', action='store_true',
+                       help='Reject scenes with inconsistent KIND lists before analyzing them')
+    parser.add_argument('--render', metavar='DIR', default=None,
+                       help='Also draw every analyzed scene to DIR/<scene>.svg')
+    parser.add_argument('--prefetch', type=int, default=0, metavar='N',
+                       help='With --workers 1, read N scenes ahead while analyzing (default: off)')
+    args = parser.parse_args()
+
+    # Only warnings reach the terminal; results go to --output / stdout
+    configure_logging(-1, stream=sys.stderr)
+    scenes = collect_scenes(args.source)
+    if not scenes:
+        print(f"No scenes found for {args.source}", file=sys.stderr)
+        sys.exit(1)
+
+    engines = resolve_engines(args.engine, classify=args.classifier, link=args.linking,
+                              group=args.grouping)
+    summary = run_batch(scenes, workers=args.workers, chunksize=args.chunksize,
+                        grouping_engine=engines["group"],
+                        classifier_engine=engines["classify"],
+                        link_engine=engines["link"],
+                        include_links=args.links,
+                        profile=bool(args.profile),
+                        cache_dir=args.cache,
+                        validate=args.validate,
+                        render_dir=args.render,
+                        prefetch=args.prefetch)
+
+    write_results(summary, args.output, args.format)
+    if args.profile:
+        with open(args.profile, "w") as f:
+            json.dump(summary["profile"], f, indent=2)
+    print(f"{summary['succeeded']}/{summary['scenes']} scenes analyzed, "
+          f"{summary['failed']} failed", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Memory benchmark for region grouping.
+
+Generates scenes with synthetic_scenes.generate_scene and runs them through
+the real pipeline stages: reference classification and linking, then the
+reference GLOBAL stage over the resulting LinkIndex. Peak memory is measured
+with tracemalloc and reported per linked region pair; with sparse nucleus
+links it grows with the number of linked pairs, not with the number of
+nucleus pairs probed. Each run fails when the GLOBAL peak exceeds
+BYTES_PER_LINK_LIMIT per linked pair.
+
+Usage:
+    python3 bench_memory.py              # 250, 500, 1000 regions
+    python3 bench_memory.py 2000
+"""
+import logging
+import sys
+import time
+import tracemalloc
+
+from take_input import Scene
+from engines import get_engine
+from region_grouping import build_nuclei, global_stage, group_regions
+from region_linking import LinkIndex
+from synthetic_scenes import generate_scene
+
+# Measured peaks are ~800 bytes per linked pair; dense nucleus links would
+# grow with the pair count instead and blow well past this
+BYTES_PER_LINK_LIMIT = 2048
+
+def scene_links(num_regions: int, seed: int = 0):
+    """Generate a scene and link its regions with the reference stages"""
+    scene = Scene(generate_scene(num_regions=num_regions, seed=seed))
+    classifications = get_engine("classify", "reference")(scene)
+    return scene, get_engine("link", "reference")(classifications, scene)
+
+def measure(func, *args):
+    """Run func and return (result, seconds, peak_bytes)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def global_scan(index: LinkIndex, background: int):
+    """Build nuclei and run the reference GLOBAL stage; return stored link entries"""
+    nuclei = build_nuclei(index, background)
+    global_stage(nuclei)
+    return sum(len(n.links) for n in set(nuclei.values()))
+
+def check_peak(peak: int, index: LinkIndex) -> None:
+    """Fail when the GLOBAL peak is above BYTES_PER_LINK_LIMIT per linked pair"""
+    limit = BYTES_PER_LINK_LIMIT * max(1, len(index.support))
+    assert peak <= limit, f"GLOBAL peak {peak} bytes above {limit} for {len(index.support)} pairs"
+
+def test_global_memory_bound():
+    logging.getLogger("region_grouping").setLevel(logging.WARNING)
+    scene, index = scene_links(200)
+    _, _, peak = measure(global_scan, index, scene.background)
+    check_peak(peak, index)
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [250, 500, 1000]
+    # Per-merge progress is logged at DEBUG; keep it out of the measurements
+    logging.getLogger("region_grouping").setLevel(logging.WARNING)
+
+    print(f"{'regions':>8} {'pairs':>8} {'pairs probed':>13} {'entries':>8} "
+          f"{'GLOBAL peak':>12} {'bytes/pair':>10} {'time':>7} {'union-find peak':>16}")
+    for n in sizes:
+        scene, index = scene_links(n)
+        entries, elapsed, peak = measure(global_scan, index, scene.background)
+        _, _, uf_peak = measure(group_regions, index, scene.background, "unionfind")
+        regions = len(index.regions)
+        probed = regions * (regions - 1) // 2
+        print(f"{regions:>8} {len(index.support):>8} {probed:>13} {entries:>8} "
+              f"{peak / 1024:>10.0f}KB {peak / max(1, len(index.support)):>10.0f} "
+              f"{elapsed:>6.1f}s {uf_peak / 1024:>14.0f}KB")
+        check_peak(peak, index)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Stage benchmarks on synthetic scenes.
+
+Generates scenes of increasing size with synthetic_scenes.py and measures
+each pipeline stage: parsing, vertex classification, region linking and
+region grouping, for every engine registered in engines.py (or only those of
+one --engine profile). Wall time is the best of --repeat runs;
+peak memory is taken from a separate run under tracemalloc so tracing does
+not distort the timings (that run goes first and doubles as a warm-up). A scaling exponent (slope of log time against log
+regions) is reported per stage.
+
+Results can be saved as a baseline and later runs compared against it; a
+stage that got slower (or hungrier) than the threshold allows is reported
+as a regression and the script exits with status 1.
+
+Usage:
+    python3 benchmark.py                              # 10 .. 100k regions
+    python3 benchmark.py --sizes 100 1000 --save-baseline bench.json
+    python3 benchmark.py --sizes 100 1000 --baseline bench.json --threshold 0.25
+"""
+import json
+import math
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+from take_input import Scene
+from region_grouping import group_regions
+from engines import ENGINE_PROFILES, STAGES, engine_names, get_engine
+from synthetic_scenes import LAYOUTS, generate_scene
+
+DEFAULT_SIZES = [10, 100, 1000, 10000, 100000]
+
+# The reference grouping engine rescans all nucleus pairs after every merge
+REFERENCE_GROUPING_LIMIT = 500
+
+def best_time(func: Callable, repeat: int) -> float:
+    """Fastest of `repeat` runs, in seconds"""
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def peak_memory(func: Callable) -> int:
+    """Peak bytes allocated while func runs"""
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+def stage_runs(text: str, reference_limit: int,
+               profile: Optional[str] = None) -> List[Tuple[str, str, Callable]]:
+    """(stage, engine, callable) for every stage of one scene; profile limits the engines"""
+    if profile:
+        names = {stage: (ENGINE_PROFILES[profile][stage],) for stage in STAGES}
+    else:
+        names = {stage: engine_names(stage) for stage in STAGES}
+    scene = Scene(json.loads(text))
+    # Warm every engine up (lazy imports); the reference result is used below
+    for engine in names["classify"]:
+        get_engine("classify", engine)(scene)
+    classifications = get_engine("classify", "reference")(scene)
+    index = get_engine("link", "reference")(classifications, scene)
+
+    runs = [("parse", "json", lambda: Scene(json.loads(text)))]
+    for engine in names["classify"]:
+        runs.append(("classify", engine,
+                     lambda engine=engine: get_engine("classify", engine)(scene)))
+    # Linking uses the angular table left on the scene by classification
+    for engine in names["link"]:
+        runs.append(("link", engine,
+                     lambda engine=engine: get_engine("link", engine)(classifications, scene)))
+    for engine in names["group"]:
+        if engine == "reference" and len(index.regions) > reference_limit:
+            continue
+        runs.append(("group", engine,
+                     lambda engine=engine: get_engine("group", engine)(index, scene.background)))
+    # Per-component grouping keeps pair scans within one object
+    for engine in names["group"]:
+        runs.append(("group", f"{engine}+cc",
+                     lambda engine=engine: group_regions(index, scene.background, engine,
+                                                         split=True)))
+    return runs
+
+def run_benchmark(sizes: List[int], layout: str = "mixed", seed: int = 0, repeat: int = 3,
+                  reference_limit: int = REFERENCE_GROUPING_LIMIT,
+                  profile: Optional[str] = None) -> List[Dict]:
+    """One result row per (size, stage, engine)"""
+    rows = []
+    for size in sizes:
+        data = generate_scene(num_regions=size, layout=layout, seed=seed)
+        text = json.dumps(data)
+        regions = data["background"] - 1
+        for stage, engine, func in stage_runs(text, reference_limit, profile):
+            peak = peak_memory(func)
+            rows.append({
+                "size": size,
+                "regions": regions,
+                "vertices": len(data["vertex-data"]),
+                "stage": stage,
+                "engine": engine,
+                "seconds": best_time(func, repeat if size < 100000 else 1),
+                "peak_bytes": peak,
+            })
+            print(f"  {size:>7} {stage:<9} {engine:<12} {rows[-1]['seconds']:>9.4f}s "
+                  f"{rows[-1]['peak_bytes'] / 1024:>10.0f}KB", file=sys.stderr)
+    return rows
+
+def scaling_exponents(rows: List[Dict]) -> Dict[Tuple[str, str], float]:
+    """Least-squares slope of log(seconds) over log(regions) per stage and engine"""
+    series: Dict[Tuple[str, str], List[Tuple[float, float]]] = {}
+    for row in rows:
+        if row["seconds"] > 0 and row["regions"] > 0:
+            series.setdefault((row["stage"], row["engine"]), []).append(
+                (math.log(row["regions"]), math.log(row["seconds"])))
+    slopes = {}
+    for key, points in series.items():
+        if len(points) < 2:
+            continue
+        mx = sum(x for x, _ in points) / len(points)
+        my = sum(y for _, y in points) / len(points)
+        var = sum((x - mx) ** 2 for x, _ in points)
+        if var:
+            slopes[key] = sum((x - mx) * (y - my) for x, y in points) / var
+    return slopes
+
+def compare(rows: List[Dict], baseline: List[Dict], threshold: float,
+            min_seconds: float = 0.005) -> List[str]:
+    """Describe every stage that regressed against the baseline"""
+    previous = {(r["size"], r["stage"], r["engine"]): r for r in baseline}
+    regressions = []
+    for row in rows:
+        base = previous.get((row["size"], row["stage"], row["engine"]))
+        if base is None:
+            continue
+        name = f"{row['stage']}/{row['engine']} at {row['size']} regions"
+        slower = row["seconds"] - base["seconds"]
+        if row["seconds"] > base["seconds"] * (1 + threshold) and slower > min_seconds:
+            regressions.append(f"{name}: {base['seconds']:.4f}s -> {row['seconds']:.4f}s")
+        if row["peak_bytes"] > base["peak_bytes"] * (1 + threshold):
+            regressions.append(f"{name}: peak {base['peak_bytes'] / 1024:.0f}KB -> "
+                               f"{row['peak_bytes'] / 1024:.0f}KB")
+    return regressions
+
+def print_report(rows: List[Dict]) -> None:
+    """Timing table followed by scaling exponents"""
+    print(f"{'regions':>8} {'vertices':>9} {'stage':<9} {'engine':<12} {'time':>10} {'peak':>10}")
+    for row in rows:
+        print(f"{row['regions']:>8} {row['vertices']:>9} {row['stage']:<9} {row['engine']:<12} "
+              f"{row['seconds']:>9.4f}s {row['peak_bytes'] / 1024:>8.0f}KB")
+
+    print("\nScaling (time ~ regions^k):")
+    for (stage, engine), slope in sorted(scaling_exponents(rows).items()):
+        print(f"  {stage:<9} {engine:<12} k = {slope:.2f}")
+
+def main():
+    """Command line interface for the stage benchmarks"""
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark pipeline stages on synthetic scenes")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                       help='Region counts to generate (default: 10 .. 100000)')
+    parser.add_argument('--layout', choices=LAYOUTS, default='mixed',
+                       help='Synthetic scene layout (default: mixed)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the generator')
+    parser.add_argument('--repeat', type=int, default=3,
+                       help='Timing runs per stage; the fastest counts (default: 3)')
+    parser.add_argument('--engine', choices=ENGINE_PROFILES, default=None,
+                       help='Only measure the engines of this profile (default: every registered engine)')
+    parser.add_argument('--reference-limit', type=int, default=REFERENCE_GROUPING_LIMIT,
+                       help='Skip the reference grouping engine above this many regions')
+    parser.add_argument('--save-baseline', metavar='FILE', default=None,
+                       help='Write results to FILE for later comparison')
+    parser.add_argument('--baseline', metavar='FILE', default=None,
+                       help='Compare against a saved baseline and flag regressions')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                       help='Allowed slowdown / memory growth before flagging (default: 0.25)')
+    args = parser.parse_args()
+
+    rows = run_benchmark(args.sizes, args.layout, args.seed, args.repeat, args.reference_limit,
+                         args.engine)
+    print_report(rows)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({"layout": args.layout, "seed": args.seed, "results": rows}, f, indent=2)
+        print(f"\nBaseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(rows, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Engine conformance and speed comparison.
+
+Runs every combination of registered engines (engines.py) over the bundled
+scenes and generated ones. Each stage's output must equal what the
+reference engines produce. Classifications are compared as a dict. Links
+and bodies are compared order-normalised: links sorted, bodies as sorted
+lists of sorted regions. Every run starts from a freshly parsed scene, so
+state one engine leaves on a scene (the planar graph, the angular table)
+cannot help another.
+
+The report lists each stage's best time per engine, side by side, with the
+speedup over the reference engine. Any mismatch or error is listed
+and the script exits with status 1, so a new engine can be gated on it:
+
+    python3 conformance.py
+    python3 conformance.py --sizes 10 100 1000 --layouts mixed --repeat 5
+    python3 conformance.py drawings/*.json --json conformance.json
+"""
+import itertools
+import json
+import math
+import sys
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from take_input import Scene, load_scene
+from engines import STAGES, engine_names, get_engine, resolve_engines
+from synthetic_scenes import LAYOUTS, generate_scene
+
+BUNDLED_SCENES = ("cube.json", "one.json")
+DEFAULT_SIZES = [10, 100, 300]  # regions; the reference grouping engine is quadratic or worse
+
+SceneSource = Tuple[str, Callable[[], Scene]]
+
+def conformance_scenes(paths: Sequence[str] = BUNDLED_SCENES, sizes: Sequence[int] = DEFAULT_SIZES,
+                       layouts: Sequence[str] = LAYOUTS, seed: int = 0) -> List[SceneSource]:
+    """(name, loader) pairs; each loader call returns a freshly parsed scene"""
+    scenes: List[SceneSource] = [(path, lambda path=path: load_scene(path)) for path in paths]
+    for layout in layouts:
+        for size in sizes:
+            text = json.dumps(generate_scene(num_regions=size, layout=layout, seed=seed))
+            scenes.append((f"{layout}-{size}", lambda text=text: Scene(json.loads(text))))
+    return scenes
+
+def engine_combinations() -> List[Dict[str, str]]:
+    """Every {stage: engine} combination, the reference one first"""
+    reference = resolve_engines("reference")
+    combinations = [dict(zip(STAGES, names))
+                    for names in itertools.product(*(engine_names(stage) for stage in STAGES))]
+    combinations.sort(key=lambda engines: engines != reference)
+    return combinations
+
+def run_engines(load: Callable[[], Scene], engines: Dict[str, str],
+                repeat: int = 3) -> Tuple[Dict, Dict[str, float]]:
+    """Output of each stage and its best time over `repeat` runs"""
+    best = {stage: math.inf for stage in STAGES}
+    for _ in range(max(1, repeat)):
+        scene = load()
+        start = time.perf_counter()
+        types = get_engine("classify", engines["classify"])(scene)
+        classified = time.perf_counter()
+        index = get_engine("link", engines["link"])(types, scene)
+        linked = time.perf_counter()
+        bodies = get_engine("group", engines["group"])(index, scene.background)
+        grouped = time.perf_counter()
+        for stage, seconds in zip(STAGES, (classified - start, linked - classified, grouped - linked)):
+            best[stage] = min(best[stage], seconds)
+    return {"classify": types, "link": index.links, "group": bodies}, best
+
+def normalise(stage: str, output):
+    """Stage output in a form where equal results compare equal"""
+    if stage == "classify":
+        return dict(output)
+    if stage == "link":
+        return sorted((r1, r2, via) for r1, r2, via in output)
+    return sorted(sorted(body) for body in output)
+
+def describe_difference(stage: str, expected, actual) -> str:
+    """Short account of how normalised outputs differ"""
+    if stage == "classify":
+        differing = sorted(v for v in set(expected) | set(actual) if expected.get(v) != actual.get(v))
+        return (f"{len(differing)} vertices classified differently, e.g. "
+                + ", ".join(f"{v}: {expected.get(v)} != {actual.get(v)}" for v in differing[:3]))
+    missing = [item for item in expected if item not in actual]
+    extra = [item for item in actual if item not in expected]
+    kind = "links" if stage == "link" else "bodies"
+    return f"{len(missing)} {kind} missing, {len(extra)} extra, e.g. {(missing or extra)[:3]}"
+
+def compare_engines(scenes: List[SceneSource], repeat: int = 3) -> Dict:
+    """
+    Run every engine combination over the scenes and compare it to the
+    reference. Returns {"timings": [{"scene", "stage", "engine", "seconds"}],
+    "failures": [{"scene", "engines", "stage", "error"}], ...}.
+    """
+    combinations = engine_combinations()
+    timings: Dict[Tuple[str, str, str], float] = {}
+    failures = []
+    for name, load in scenes:
+        expected = None
+        for engines in combinations:
+            try:
+                outputs, seconds = run_engines(load, engines, repeat)
+            except Exception as e:
+                failures.append({"scene": name, "engines": engines, "stage": None,
+                                 "error": f"{type(e).__name__}: {e}"})
+                if expected is None:  # the reference itself failed: nothing to compare to
+                    break
+                continue
+            normalised = {stage: normalise(stage, outputs[stage]) for stage in STAGES}
+            if expected is None:
+                expected = normalised
+            for stage in STAGES:
+                if normalised[stage] != expected[stage]:
+                    failures.append({"scene": name, "engines": engines, "stage": stage,
+                                     "error": describe_difference(stage, expected[stage], normalised[stage])})
+                    break  # later stages got different input
+            for stage in STAGES:
+                key = (name, stage, engines[stage])
+                timings[key] = min(timings.get(key, math.inf), seconds[stage])
+    return {"scenes": [name for name, _ in scenes],
+            "combinations": combinations,
+            "timings": [{"scene": scene, "stage": stage, "engine": engine, "seconds": seconds}
+                        for (scene, stage, engine), seconds in timings.items()],
+            "failures": failures}
+
+def render_report(report: Dict) -> str:
+    """Per-scene stage times for every engine side by side, totals and failures"""
+    times: Dict[Tuple[str, str], Dict[str, float]] = {}
+    for row in report["timings"]:
+        times.setdefault((row["scene"], row["stage"]), {})[row["engine"]] = row["seconds"]
+
+    def cells(engines: Dict[str, float]) -> str:
+        reference = engines.get("reference")
+        parts = []
+        for engine, seconds in engines.items():
+            speedup = f" ({reference / seconds:5.1f}x)" if reference and seconds and engine != "reference" else ""
+            parts.append(f"{engine} {seconds:9.4f}s{speedup}")
+        return "   ".join(parts)
+
+    lines = [f"{'scene':<20} {'stage':<9} engines"]
+    totals: Dict[str, Dict[str, float]] = {}
+    for (scene, stage), engines in times.items():
+        lines.append(f"{scene:<20} {stage:<9} {cells(engines)}")
+        for engine, seconds in engines.items():
+            stage_totals = totals.setdefault(stage, {})
+            stage_totals[engine] = stage_totals.get(engine, 0.0) + seconds
+    lines.append("")
+    for stage in STAGES:
+        if stage in totals:
+            lines.append(f"{'total':<20} {stage:<9} {cells(totals[stage])}")
+
+    lines.append("")
+    checked = len(report["scenes"]) * len(report["combinations"])
+    if report["failures"]:
+        lines.append(f"{len(report['failures'])} of {checked} scene/engine runs do not conform:")
+        for failure in report["failures"]:
+            engines = "/".join(failure["engines"][stage] for stage in STAGES)
+            lines.append(f"  {failure['scene']} [{engines}] {failure['stage'] or 'error'}: {failure['error']}")
+    else:
+        lines.append(f"All {checked} scene/engine runs match the reference")
+    return "\n".join(lines)
+
+def main():
+    """Command line interface for the conformance harness"""
+    import argparse
+    parser = argparse.ArgumentParser(description="Check that all engines agree and compare their speed")
+    parser.add_argument('inputs', nargs='*', default=list(BUNDLED_SCENES),
+                       help='Scene files (.json or .scnb) to check (default: cube.json one.json)')
+    parser.add_argument('--sizes', type=int, nargs='*', default=DEFAULT_SIZES,
+                       help='Region counts of generated scenes (default: 10 100 300; none to skip)')
+    parser.add_argument('--layouts', choices=LAYOUTS, nargs='+', default=list(LAYOUTS),
+                       help='Synthetic layouts to generate (default: all)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the generator')
+    parser.add_argument('--repeat', type=int, default=3,
+                       help='Timing runs per engine combination; the fastest counts (default: 3)')
+    parser.add_argument('--json', metavar='FILE', default=None, help='Also write the report as JSON')
+    args = parser.parse_args()
+
+    report = compare_engines(conformance_scenes(args.inputs, args.sizes, args.layouts, args.seed),
+                             args.repeat)
+    print(render_report(report))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    sys.exit(1 if report["failures"] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Per-stage engine registry.
+
+Each pipeline stage can have several interchangeable implementations
+(engines). They must produce the same results; conformance.py checks that
+and compares their speed. Engine signatures per stage:
+
+    classify(scene) -> {vertex: junction type}
+    link(vertex_types, scene) -> LinkIndex
+    group(links, background, stats=None) -> [set of regions, ...]
+
+A profile names one engine per stage. "reference" is the original code
+path; "fast" selects the fastest engine of each stage:
+
+    SceneUnderstanding("big.json", engine="fast")
+    python3 scene_pipeline.py big.json --engine fast
+    python3 scene_pipeline.py big.json --engine fast --grouping reference   # per-stage override
+
+New engines are registered under a name and can then be used wherever
+an engine is chosen (--classifier, --grouping, service and stream options):
+
+    @register_engine("group", "mine")
+    def my_grouping(links, background, stats=None): ...
+"""
+from typing import Callable, Dict, Optional, Tuple
+
+from take_input import Scene
+from vertex_analysis import CLASSIFIER_ENGINES, analyze_vertices
+from region_linking import LinkIndex, build_link_index, get_vertex_regions, inline_link_index
+from region_grouping import GROUPING_ENGINES, GroupingBudget, group_regions
+
+STAGES = ("classify", "link", "group")
+STAGE_LABELS = {"classify": "classifier", "link": "linking", "group": "grouping"}
+
+ENGINE_PROFILES: Dict[str, Dict[str, str]] = {
+    "reference": {"classify": "reference", "link": "reference", "group": "reference"},
+    "fast": {"classify": "numpy", "link": "inline", "group": "unionfind"},
+}
+
+_REGISTRY: Dict[str, Dict[str, Callable]] = {stage: {} for stage in STAGES}
+
+def register_engine(stage: str, name: str, func: Optional[Callable] = None):
+    """Register func as engine `name` of `stage`; without func, use as a decorator"""
+    if stage not in _REGISTRY:
+        raise ValueError(f"Unknown stage: {stage}")
+    if func is None:
+        return lambda f: register_engine(stage, name, f)
+    _REGISTRY[stage][name] = func
+    return func
+
+def get_engine(stage: str, name: str) -> Callable:
+    """The engine function registered as `name` for `stage`"""
+    try:
+        return _REGISTRY[stage][name]
+    except KeyError:
+        raise ValueError(f"Unknown {STAGE_LABELS.get(stage, stage)} engine: {name}") from None
+
+def engine_names(stage: str) -> Tuple[str, ...]:
+    """Registered engines of a stage, in registration order"""
+    return tuple(_REGISTRY[stage])
+
+def resolve_engines(profile: Optional[str] = None, **choices: Optional[str]) -> Dict[str, str]:
+    """
+    {stage: engine} for a profile (default "reference"); choices given per
+    stage (classify=, link=, group=) and not None win over the profile.
+    """
+    if (profile or "reference") not in ENGINE_PROFILES:
+        raise ValueError(f"Unknown engine profile: {profile}")
+    engines = dict(ENGINE_PROFILES[profile or "reference"])
+    for stage, name in choices.items():
+        if stage not in engines:
+            raise ValueError(f"Unknown stage: {stage}")
+        if name is not None:
+            engines[stage] = name
+    return engines
+
+def _link_reference(vertex_types: Dict[str, str], scene: Scene) -> LinkIndex:
+    return build_link_index(vertex_types, get_vertex_regions(scene), input_file=scene)
+
+# Built-in engines; the classify and group ones are the engines the stage functions take by name
+for _name in CLASSIFIER_ENGINES:
+    register_engine("classify", _name, lambda scene, _engine=_name: analyze_vertices(scene, _engine))
+register_engine("link", "reference", _link_reference)
+register_engine("link", "inline", inline_link_index)
+for _name in GROUPING_ENGINES:
+    register_engine("group", _name, lambda links, background, stats=None, _engine=_name:
+                    group_regions(links, background, _engine, stats))
+# The merge order of budgeted grouping with no limit set, so conformance.py checks it too
+register_engine("group", "anytime", lambda links, background, stats=None:
+                group_regions(links, background, stats=stats, budget=GroupingBudget()))
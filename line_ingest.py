@@ -0,0 +1,258 @@
+"""
+Build scenes from raw line segments, as a vectoriser emits them.
+
+Input is a JSON document with a "segments" list instead of "vertex-data":
+
+    {"segments": [[x1, y1, x2, y2], ...], "tolerance": 0.5}
+
+(each segment may also be written [[x1, y1], [x2, y2]]). Endpoints are
+noisy, so junctions are recovered in three near-linear passes:
+
+1. Snap: endpoints within `tolerance` of an existing junction join it. In
+   a grid hash with cells twice the tolerance wide, each endpoint only
+   looks at the 2x2 cells nearest to it. A junction sits at the mean of
+   its endpoints.
+2. Split: an endpoint that no other segment shares and that lies on the
+   interior of another segment (the stem of a T) splits that segment.
+   Stems go into a second grid, and each segment only visits the cells
+   it passes through.
+3. Trace: duplicate and zero-length edges are dropped, neighbours are
+   sorted counter-clockwise and faces are traced into regions by
+   synthetic_scenes.scene_from_drawing, the same as for generated scenes.
+
+Segments that cross without sharing an endpoint are not intersected.
+
+get_data runs this automatically on files with a "segments" key, so such
+files go straight into the pipeline.
+
+Usage:
+    python3 scene_pipeline.py traced.json
+    python3 line_ingest.py traced.json -o scene.json --tolerance 0.5
+"""
+import json
+import logging
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from synthetic_scenes import Drawing, scene_from_drawing
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOLERANCE = 0.5  # drawing units
+
+Point = Tuple[float, float]
+
+def is_segment_data(data) -> bool:
+    """True for raw segment input rather than a scene"""
+    return isinstance(data, dict) and "segments" in data and "vertex-data" not in data
+
+def _endpoints(segment: Sequence) -> Tuple[float, float, float, float]:
+    if len(segment) == 2:
+        (x1, y1), (x2, y2) = segment
+    else:
+        x1, y1, x2, y2 = segment
+    return float(x1), float(y1), float(x2), float(y2)
+
+class _JunctionGrid:
+    """
+    Endpoint clusters in a grid hash. Cells are twice the tolerance wide, so
+    every junction in range of a point lies in the 2x2 block of cells
+    nearest to it.
+    """
+    def __init__(self, tolerance: float):
+        self.tolerance = tolerance
+        self.scale = 1 / (2 * tolerance)
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+        self.anchors: List[Point] = []  # first endpoint of each junction, used for lookups
+        self.sums: List[List[float]] = []  # [sum x, sum y, endpoints] per junction
+
+    def snap(self, x: float, y: float) -> int:
+        """Junction index for an endpoint, creating a junction if none is in range"""
+        gx, gy = x * self.scale, y * self.scale
+        cx, cy = math.floor(gx), math.floor(gy)
+        # The neighbouring column and row on the side of the cell the point is in
+        nx = cx + 1 if gx - cx >= 0.5 else cx - 1
+        ny = cy + 1 if gy - cy >= 0.5 else cy - 1
+        best, best_distance = -1, self.tolerance ** 2
+        cells, anchors = self.cells, self.anchors
+        for key in ((cx, cy), (nx, cy), (cx, ny), (nx, ny)):
+            for j in cells.get(key, ()):
+                ax, ay = anchors[j]
+                distance = (ax - x) ** 2 + (ay - y) ** 2
+                if distance <= best_distance:
+                    best, best_distance = j, distance
+        if best < 0:
+            best = len(anchors)
+            anchors.append((x, y))
+            self.sums.append([x, y, 1])
+            cells.setdefault((cx, cy), []).append(best)
+        else:
+            total = self.sums[best]
+            total[0] += x
+            total[1] += y
+            total[2] += 1
+        return best
+
+    def points(self) -> List[Point]:
+        return [(sx / n, sy / n) for sx, sy, n in self.sums]
+
+def _split_at_stems(points: List[Point], edges: List[Tuple[int, int]],
+                    tolerance: float) -> Tuple[List[Tuple[int, int]], int]:
+    """
+    Split edges whose interior passes within `tolerance` of a junction used
+    by only one edge. Returns the new edge list and the number of splits.
+    """
+    degree = [0] * len(points)
+    for a, b in edges:
+        degree[a] += 1
+        degree[b] += 1
+    stems = [j for j, d in enumerate(degree) if d == 1]
+    if not stems or not edges:
+        return edges, 0
+
+    # Stems are few next to edges, so the grid holds stems: each under the
+    # cells within tolerance of it (at most four, as cells are at least
+    # 4 * tolerance). Every edge then visits only the cells it passes
+    # through, so a long diagonal costs cells in proportion to its length
+    # rather than its bounding box. About one stem per cell keeps both the
+    # walks and the candidates per cell short.
+    xs = [x for x, _ in points]
+    ys = [y for _, y in points]
+    size = max(math.sqrt((max(xs) - min(xs)) * (max(ys) - min(ys)) / len(stems)), 4 * tolerance)
+    floor = math.floor
+    near: Dict[Tuple[int, int], List[int]] = {}
+    for j in stems:
+        x, y = points[j]
+        for gx in range(floor((x - tolerance) / size), floor((x + tolerance) / size) + 1):
+            for gy in range(floor((y - tolerance) / size), floor((y + tolerance) / size) + 1):
+                near.setdefault((gx, gy), []).append(j)
+
+    best: Dict[int, Tuple[float, int, float]] = {}  # {stem: (distance, edge, position along it)}
+    for e, (a, b) in enumerate(edges):
+        (x1, y1), (x2, y2) = points[a], points[b]
+        lx, ly, rx, ry = (x1, y1, x2, y2) if x1 <= x2 else (x2, y2, x1, y1)
+        first, last = floor(lx / size), floor(rx / size)
+        if first == last:  # most edges stay within one column, and most within one cell
+            low, high = floor(min(ly, ry) / size), floor(max(ly, ry) / size)
+            if low == high:
+                candidates = near.get((first, low))
+            else:
+                candidates = [j for gy in range(low, high + 1) for j in near.get((first, gy), ())]
+        else:
+            # Column by column: the cells covering the edge's y range there
+            slope = (ry - ly) / (rx - lx)
+            candidates = []
+            for gx in range(first, last + 1):
+                ya = ly + slope * (max(lx, gx * size) - lx)
+                yb = ly + slope * (min(rx, (gx + 1) * size) - lx)
+                for gy in range(floor(min(ya, yb) / size), floor(max(ya, yb) / size) + 1):
+                    candidates.extend(near.get((gx, gy), ()))
+        if not candidates:
+            continue
+        dx, dy = x2 - x1, y2 - y1
+        length2 = dx * dx + dy * dy
+        length = math.sqrt(length2)
+        for j in candidates:
+            if j == a or j == b:
+                continue
+            x, y = points[j]
+            t = ((x - x1) * dx + (y - y1) * dy) / length2
+            if t <= 0 or t >= 1:
+                continue
+            distance = abs(dx * (y - y1) - dy * (x - x1)) / length
+            # Stay clear of the edge's own ends, which snapping already covered.
+            # Edges come in order, so on a tie the later edge wins.
+            if distance <= tolerance and min(t, 1 - t) * length > tolerance:
+                current = best.get(j)
+                if current is None or distance <= current[0]:
+                    best[j] = (distance, e, t)
+
+    cuts: Dict[int, List[Tuple[float, int]]] = {}  # {edge: [(position along it, junction)]}
+    for j, (_, e, t) in best.items():
+        cuts.setdefault(e, []).append((t, j))
+    if not cuts:
+        return edges, 0
+    split_edges = []
+    for e, (a, b) in enumerate(edges):
+        if e not in cuts:
+            split_edges.append((a, b))
+            continue
+        chain = [a] + [j for _, j in sorted(cuts[e])] + [b]
+        split_edges.extend(zip(chain, chain[1:]))
+    return split_edges, sum(len(c) for c in cuts.values())
+
+def ingest_segments(segments: Sequence, tolerance: float = DEFAULT_TOLERANCE) -> Dict:
+    """Turn raw line segments into scene data ({"vertex-data": [...], "background": n})"""
+    if tolerance <= 0:
+        raise ValueError(f"Tolerance must be positive, got {tolerance}")
+    grid = _JunctionGrid(tolerance)
+    snap = grid.snap
+    edges = []
+    for segment in segments:
+        x1, y1, x2, y2 = _endpoints(segment)
+        edges.append((snap(x1, y1), snap(x2, y2)))
+    points = grid.points()
+
+    # Drop repeats first, so a stem splits the only copy of an edge
+    unique = sorted({(a, b) if a < b else (b, a) for a, b in edges if a != b})
+    edges, splits = _split_at_stems(points, unique, tolerance)
+    unique = {(a, b) if a < b else (b, a) for a, b in edges}
+
+    drawing = Drawing()
+    drawing.points = points
+    drawing.edges = sorted(unique)
+    logger.debug("%d segments -> %d junctions, %d T-splits, %d edges",
+                 len(segments), len(points), splits, len(unique))
+    return scene_from_drawing(drawing)
+
+def ingest_data(data: Dict, tolerance: Optional[float] = None) -> Dict:
+    """Scene data for a {"segments": [...], "tolerance": t} document"""
+    if tolerance is None:
+        tolerance = data.get("tolerance", DEFAULT_TOLERANCE)
+    return ingest_segments(data["segments"], tolerance)
+
+def test_ingest_segments():
+    """A noisy square split by a T stem at both ends becomes six junctions and seven edges"""
+    segments = [[0, 0, 10, 0.1], [10.2, 0, 10, 10], [[10, 10.1], [0, 10]], [0, 10, 0.1, 0.2],
+                [5, 0.3, 5, 9.8]]  # the stem ends on the bottom and top sides, off their ends
+    data = ingest_segments(segments, tolerance=0.5)
+    coords = {v["id"]: tuple(round(c) for c in v["coords"]) for v in data["vertex-data"]}
+    assert sorted(coords.values()) == [(0, 0), (0, 10), (5, 0), (5, 10), (10, 0), (10, 10)]
+    edges = {frozenset((coords[v["id"]], coords[n])) for v in data["vertex-data"]
+             for n in v["kind-list"][0::2]}
+    assert edges == {frozenset(edge) for edge in [
+        ((0, 0), (5, 0)), ((5, 0), (10, 0)), ((10, 0), (10, 10)), ((10, 10), (5, 10)),
+        ((5, 10), (0, 10)), ((0, 10), (0, 0)), ((5, 0), (5, 10))]}
+    # Two faces plus the background
+    assert data["background"] == 3
+
+    from scene_validation import validate_scene_data
+    from vertex_analysis import analyze_vertices
+    from take_input import Scene
+    assert validate_scene_data(data).ok
+    types = analyze_vertices(Scene(data))
+    assert sorted(t for t in types.values()) == ["L", "L", "L", "L", "T", "T"]
+
+def main():
+    """Command line interface: convert a segment file into a scene file"""
+    import argparse
+    parser = argparse.ArgumentParser(description="Build a scene from raw line segments")
+    parser.add_argument('input', help='JSON file with a "segments" list')
+    parser.add_argument('--tolerance', '-t', type=float, default=None,
+                       help=f'Endpoint snapping distance (default: the file\'s "tolerance" or {DEFAULT_TOLERANCE})')
+    parser.add_argument('--output', '-o', default=None, help='Output JSON file (default: stdout)')
+    args = parser.parse_args()
+
+    with open(args.input) as f:
+        data = json.load(f)
+    if not is_segment_data(data):
+        parser.error(f'{args.input} has no "segments" list')
+    text = json.dumps(ingest_data(data, args.tolerance))
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,21 @@
-from region_grouping import *
+from region_grouping import format_body_output, group_regions, validate_input
+from region_linking import get_vertex_regions, link_regions
+from take_input import load_scene
+from vertex_analysis import analyze_vertices
 
 def main():
     """Main execution flow"""
     import sys
     input_file = "one.json"
     
-    # Load input data
-    with open(input_file) as f:
-        data = json.load(f)
-        background = data["background"]
+    # Load input data once and share it between stages
+    scene = load_scene(input_file)
+    background = scene.background
     
     # Get region links from region_linking 
-    vertex_types = load_vertex_analysis()
-    regions = get_vertex_regions(input_file)
-    links = link_regions(vertex_types, regions)
+    vertex_types = analyze_vertices(scene)
+    regions = get_vertex_regions(scene)
+    links = link_regions(vertex_types, regions, input_file=scene)
     
     # Validate input
     validate_input(links, background)
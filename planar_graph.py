@@ -0,0 +1,239 @@
+"""
+Half-edge (DCEL-style) view of a scene, built once from the KIND lists.
+
+Every line between vertices u and v is a pair of half-edges u->v and v->u.
+The half-edges leaving a vertex are stored contiguously in counter-clockwise
+order, so all topology queries are index arithmetic on flat lists:
+
+    x[v], y[v]                     vertex coordinates
+    offsets[v] .. offsets[v + 1]   half-edges leaving vertex v, counter-clockwise
+    origin[h], target[h]           vertices h leaves and points to
+    angle[h]                       direction of h in degrees (-180, 180]
+    gap[h]                         sweep from h to the next half-edge around its origin
+    left[h]                        region in that sector, i.e. left of h (None if
+                                   the KIND list does not say)
+    twin[h]                        the opposite half-edge, -1 if the neighbour
+                                   does not list the origin back
+    region_offsets / kind_regions  each vertex's regions in KIND-list order
+
+Regions (faces) are numbered by first appearance in `regions`, and
+face_edge[f] is one half-edge with face f on its left. origin, twin and
+face_edge are only needed for walking faces and are built on first use,
+so classification and linking pay for none of them. The graph
+is immutable: Scene.set_vertex and remove_vertex drop the cached copy.
+"""
+import math
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from take_input import Scene
+from scene_binary import BinaryScene
+
+class PlanarGraph:
+    """Integer-indexed half-edge structure over the vertices of a scene"""
+    def __init__(self, vertex_ids: List[str], background: Optional[int] = None):
+        self.vertex_ids = vertex_ids
+        self.index: Dict[str, int] = {vid: v for v, vid in enumerate(vertex_ids)}
+        self.background = background
+        self.x: List[float] = []
+        self.y: List[float] = []
+        self.offsets: List[int] = [0]
+        self.target: List[int] = []
+        self.angle: List[float] = []
+        self.gap: List[float] = []
+        self.left: List[Optional[int]] = []
+        self.region_offsets: List[int] = [0]
+        self.kind_regions: List[int] = []
+        self.regions: Dict[int, int] = {}  # {region: face index} in order of first appearance
+        # Face topology is only needed by boundary walks; built on first use
+        self._origin: Optional[List[int]] = None
+        self._twin: Optional[List[int]] = None
+        self._face_edge: Optional[List[int]] = None
+
+    @property
+    def vertex_count(self) -> int:
+        return len(self.vertex_ids)
+
+    @property
+    def half_edge_count(self) -> int:
+        return len(self.target)
+
+    def _add_vertex(self, x: float, y: float, spokes: List[Tuple[float, int]],
+                    between: Dict[tuple, int], kind_regions: List[int]) -> None:
+        """
+        Append the next vertex. spokes are (angle, neighbour index) sorted
+        counter-clockwise; between is {(neighbour, next_neighbour): region}
+        from the KIND list, keyed the same way as the spokes' neighbours.
+        """
+        self.x.append(x)
+        self.y.append(y)
+        count = len(spokes)
+        left, gap = self.left, self.gap
+        for k in range(count):
+            a, n = spokes[k]
+            b, m = spokes[(k + 1) % count]
+            gap.append((b - a) % 360)
+            left.append(between.get((n, m), between.get((m, n))))
+        self.target.extend([n for _, n in spokes])
+        self.angle.extend([a for a, _ in spokes])
+        self.offsets.append(len(self.target))
+        self.kind_regions.extend(kind_regions)
+        self.region_offsets.append(len(self.kind_regions))
+        regions = self.regions
+        for r in kind_regions:
+            if r not in regions:
+                regions[r] = len(regions)
+
+    @classmethod
+    def from_scene(cls, scene: Union[Scene, BinaryScene]) -> "PlanarGraph":
+        """Build from a Scene, or from a BinaryScene's arrays without string lookups"""
+        if isinstance(scene, BinaryScene):
+            return cls._from_binary(scene)
+        graph = cls(list(scene.vertex_ids), scene.background)
+        index, coords, kind_lists, all_regions = graph.index, scene.coords, scene.kind_lists, scene.regions
+        atan2, degrees = math.atan2, math.degrees
+        for vid in graph.vertex_ids:
+            x1, y1 = coords[vid]
+            kind = kind_lists[vid]
+            # Same spoke order as classify_vertex: by angle, then by vertex id
+            spokes = sorted((degrees(atan2(coords[n][1] - y1, coords[n][0] - x1)), n)
+                            for n in {x for x in kind if isinstance(x, str)})
+            between = {}
+            for k in range(0, len(kind) - 2, 2):
+                if isinstance(kind[k], str) and isinstance(kind[k + 2], str) and isinstance(kind[k + 1], int):
+                    between[(index[kind[k]], index[kind[k + 2]])] = kind[k + 1]
+            graph._add_vertex(x1, y1, [(a, index[n]) for a, n in spokes], between, all_regions[vid])
+        return graph
+
+    @classmethod
+    def _from_binary(cls, scene: BinaryScene) -> "PlanarGraph":
+        graph = cls(scene.vertex_ids, scene.background)
+        xy = scene.xy
+        atan2, degrees = math.atan2, math.degrees
+        for v in range(scene.vertex_count):
+            row, kind_regions = scene.neighbors_of(v).tolist(), scene.regions_of(v).tolist()
+            x1, y1 = xy[2 * v], xy[2 * v + 1]
+            spokes = sorted((degrees(atan2(xy[2 * n + 1] - y1, xy[2 * n] - x1)), n) for n in set(row))
+            between = {(row[k], row[k + 1]): kind_regions[k]
+                       for k in range(min(len(kind_regions), len(row) - 1))}
+            graph._add_vertex(x1, y1, spokes, between, kind_regions)
+        return graph
+
+    @property
+    def origin(self) -> List[int]:
+        """Vertex each half-edge leaves"""
+        if self._origin is None:
+            offsets = self.offsets
+            self._origin = [v for v in range(self.vertex_count)
+                            for _ in range(offsets[v + 1] - offsets[v])]
+        return self._origin
+
+    @property
+    def twin(self) -> List[int]:
+        """Opposite half-edge of each half-edge, -1 if the neighbour does not list it back"""
+        if self._twin is None:
+            origin, target, count = self.origin, self.target, self.vertex_count
+            by_ends = {u * count + v: h for h, (u, v) in enumerate(zip(origin, target))}
+            self._twin = [by_ends.get(v * count + u, -1) for u, v in zip(origin, target)]
+        return self._twin
+
+    @property
+    def face_edge(self) -> List[int]:
+        """Per face: its first half-edge, i.e. the first with the face on its left"""
+        if self._face_edge is None:
+            # Iterating backwards leaves each region's first half-edge in the dict
+            last = len(self.left) - 1
+            first = dict(zip(reversed(self.left), range(last, -1, -1)))
+            self._face_edge = [first.get(region, -1) for region in self.regions]
+        return self._face_edge
+
+    # --- Queries ---
+
+    def half_edges(self, v: int) -> range:
+        """Half-edges leaving v, counter-clockwise"""
+        return range(self.offsets[v], self.offsets[v + 1])
+
+    def degree(self, v: int) -> int:
+        return self.offsets[v + 1] - self.offsets[v]
+
+    def neighbors(self, v: int) -> List[int]:
+        """Neighbouring vertices of v in counter-clockwise order"""
+        return self.target[self.offsets[v]:self.offsets[v + 1]]
+
+    def regions_around(self, v: int) -> List[Optional[int]]:
+        """Regions around v in counter-clockwise order, one per sector"""
+        return self.left[self.offsets[v]:self.offsets[v + 1]]
+
+    def gaps(self, v: int) -> List[float]:
+        """Angular width of each sector around v, matching regions_around"""
+        return self.gap[self.offsets[v]:self.offsets[v + 1]]
+
+    def sectors(self, v: int) -> List[Tuple[Optional[int], float]]:
+        """(region, sector_degrees) around v counter-clockwise, as in Scene.angular_table"""
+        start, end = self.offsets[v], self.offsets[v + 1]
+        return list(zip(self.left[start:end], self.gap[start:end]))
+
+    def vertex_regions(self, v: int) -> List[int]:
+        """v's regions in KIND-list order"""
+        return self.kind_regions[self.region_offsets[v]:self.region_offsets[v + 1]]
+
+    def sector_table(self) -> Dict[str, List[Tuple[Optional[int], float]]]:
+        """{vertex id: sectors} for every vertex"""
+        return {vid: self.sectors(v) for v, vid in enumerate(self.vertex_ids)}
+
+    def next_in_face(self, h: int) -> int:
+        """
+        Next half-edge along the boundary of the face left of h: turn at
+        h's target to the half-edge just before h's twin (clockwise).
+        -1 when h has no twin.
+        """
+        t = self.twin[h]
+        if t < 0:
+            return -1
+        v = self.target[h]
+        start = self.offsets[v]
+        return start + (t - start - 1) % (self.offsets[v + 1] - start)
+
+    def face_boundary(self, h: int) -> Iterator[int]:
+        """Half-edges around the face left of h, starting at h; stops at a missing twin"""
+        current = h
+        for _ in range(self.half_edge_count):
+            yield current
+            current = self.next_in_face(current)
+            if current < 0 or current == h:
+                return
+
+def planar_graph(scene) -> PlanarGraph:
+    """The scene's half-edge graph, built on first use and kept on the scene"""
+    graph = getattr(scene, "graph", None)
+    if graph is None:
+        graph = PlanarGraph.from_scene(scene)
+        scene.graph = graph
+    return graph
+
+def test_half_edge_invariants():
+    """Twins pair up, faces stay on the left of their boundary and gaps close the circle"""
+    import json
+    from pathlib import Path
+    from synthetic_scenes import LAYOUTS, generate_scene
+    from take_input import load_scene
+    scenes = [load_scene(str(Path(__file__).parent / "cube.json"))]  # one.json has a self-loop
+    scenes += [Scene(json.loads(json.dumps(generate_scene(num_regions=60, layout=layout, seed=seed))))
+               for layout in LAYOUTS for seed in range(3)]
+    for scene in scenes:
+        graph = PlanarGraph.from_scene(scene)
+        origin, target, twin = graph.origin, graph.target, graph.twin
+        for h in range(graph.half_edge_count):
+            t = twin[h]
+            assert t >= 0, (scene.name, h)
+            assert twin[t] == h and origin[t] == target[h] and target[t] == origin[h]
+            following = graph.next_in_face(h)
+            assert origin[following] == target[h]
+            assert graph.left[following] == graph.left[h], (scene.name, h)
+        for v in range(graph.vertex_count):
+            if graph.degree(v) > 1:
+                assert abs(sum(graph.gaps(v)) - 360) < 1e-9
+        for face, h in enumerate(graph.face_edge):
+            boundary = list(graph.face_boundary(h))
+            assert all(graph.left[e] == graph.left[h] for e in boundary)
+            assert graph.next_in_face(boundary[-1]) == h
+
@@ -0,0 +1,126 @@
+"""
+Per-stage timing and counters for the scene pipeline.
+
+A SceneProfile records wall and CPU time for every stage it wraps and a
+flat set of integer counters filled in by the stages themselves:
+
+    junction_L / junction_Fork / junction_Arrow / junction_T
+    links_created, links_duplicate
+    global_iterations, global_merges, global_pairs_scanned
+    singlebody_iterations, singlebody_merges, singlebody_pairs_scanned
+
+Hooks registered with add_hook are called as hook(profile, stage) after
+every stage, e.g. to stream progress or abort pathological scenes.
+Reports are plain dicts; aggregate_profiles folds many into one.
+"""
+import json
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional
+
+Hook = Callable[['SceneProfile', str], None]
+
+class SceneProfile:
+    """Stage timings and counters for one pipeline run"""
+    def __init__(self, source: Optional[str] = None, hooks: Optional[List[Hook]] = None):
+        self.source = source
+        self.stages: Dict[str, Dict[str, float]] = {}  # {stage: {"wall_seconds", "cpu_seconds"}}
+        self.counters: Dict[str, int] = {}
+        self.hooks: List[Hook] = list(hooks or [])
+
+    def add_hook(self, hook: Hook) -> None:
+        """Call hook(profile, stage) after every stage"""
+        self.hooks.append(hook)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the enclosed block as stage `name`; repeated stages accumulate"""
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield self
+        finally:
+            record = self.stages.setdefault(name, {"wall_seconds": 0.0, "cpu_seconds": 0.0})
+            record["wall_seconds"] += time.perf_counter() - wall
+            record["cpu_seconds"] += time.process_time() - cpu
+        for hook in self.hooks:
+            hook(self, name)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """Add to a counter"""
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def update(self, counters: Dict[str, int]) -> None:
+        """Add every counter in `counters`"""
+        for name, amount in counters.items():
+            self.count(name, amount)
+
+    @property
+    def wall_seconds(self) -> float:
+        return sum(s["wall_seconds"] for s in self.stages.values())
+
+    @property
+    def cpu_seconds(self) -> float:
+        return sum(s["cpu_seconds"] for s in self.stages.values())
+
+    def to_dict(self) -> Dict:
+        """JSON-ready report"""
+        return {
+            "input": self.source,
+            "wall_seconds": self.wall_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "stages": {name: dict(record) for name, record in self.stages.items()},
+            "counters": dict(self.counters),
+        }
+
+    def write_report(self, output_file: str) -> None:
+        """Write the report as JSON"""
+        with open(output_file, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+def aggregate_profiles(reports: Iterable[Dict], slowest: int = 5) -> Dict:
+    """
+    Fold per-scene reports into batch totals.
+
+    Stage times are summed and their per-scene maximum kept; counters are
+    summed. The slowest scenes and the scene that scanned the most GLOBAL
+    pairs are listed so pathological inputs stand out.
+    """
+    reports = [r for r in reports if r]
+    stages: Dict[str, Dict[str, float]] = {}
+    counters: Dict[str, int] = {}
+    for report in reports:
+        for name, record in report["stages"].items():
+            total = stages.setdefault(name, {"wall_seconds": 0.0, "cpu_seconds": 0.0,
+                                             "max_wall_seconds": 0.0})
+            total["wall_seconds"] += record["wall_seconds"]
+            total["cpu_seconds"] += record["cpu_seconds"]
+            total["max_wall_seconds"] = max(total["max_wall_seconds"], record["wall_seconds"])
+        for name, amount in report["counters"].items():
+            counters[name] = counters.get(name, 0) + amount
+
+    by_time = sorted(reports, key=lambda r: r["wall_seconds"], reverse=True)
+    most_scanned = max(reports, key=lambda r: r["counters"].get("global_pairs_scanned", 0),
+                       default=None)
+    return {
+        "scenes": len(reports),
+        "wall_seconds": sum(r["wall_seconds"] for r in reports),
+        "cpu_seconds": sum(r["cpu_seconds"] for r in reports),
+        "stages": stages,
+        "counters": counters,
+        "slowest": [{"input": r["input"], "wall_seconds": r["wall_seconds"]}
+                    for r in by_time[:slowest]],
+        "most_global_pairs_scanned": most_scanned and {
+            "input": most_scanned["input"],
+            "global_pairs_scanned": most_scanned["counters"].get("global_pairs_scanned", 0),
+        },
+    }
+
+def render_profile(report: Dict) -> str:
+    """Stage table and counters as text"""
+    lines = ["Profile:", f"  {'stage':<10} {'wall':>10} {'cpu':>10}"]
+    for name, record in report["stages"].items():
+        lines.append(f"  {name:<10} {record['wall_seconds']:>9.4f}s {record['cpu_seconds']:>9.4f}s")
+    lines.append(f"  {'total':<10} {report['wall_seconds']:>9.4f}s {report['cpu_seconds']:>9.4f}s")
+    for name, amount in sorted(report["counters"].items()):
+        lines.append(f"  {name}: {amount}")
+    return "\n".join(lines)
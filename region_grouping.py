@@ -1,51 +1,93 @@
-from typing import Dict, List, Set, Tuple
-from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import heapq
 import json
-from region_linking import load_vertex_analysis, get_vertex_regions, link_regions
+import logging
+import time
+from take_input import Scene
+from region_linking import LinkIndex, load_vertex_analysis, get_vertex_regions, link_regions
+
+Links = Union[List[Tuple[int, int, str]], LinkIndex]
+
+logger = logging.getLogger(__name__)
 
 class Nucleus:
     """A group of regions that may form part of the same 3D body"""
+    __slots__ = ("regions", "links")
+
     def __init__(self, regions: Set[int]):
         self.regions = set(regions)
-        self.links = defaultdict(int)  # {nucleus: link_count}
+        self.links: Dict['Nucleus', int] = {}  # {nucleus: link_count}, linked nuclei only
     
     def __str__(self) -> str:
         """String representation of nucleus"""
         return f"Nucleus(regions={sorted(self.regions)})"
+
+    def link_count(self, other: 'Nucleus') -> int:
+        """Number of links to another nucleus; probing never adds an entry"""
+        return self.links.get(other, 0)
+
+    def add_link(self, other: 'Nucleus') -> None:
+        """Record one more link in both directions"""
+        count = self.links.get(other, 0) + 1
+        self.links[other] = count
+        other.links[self] = count
     
     def merge_with(self, other: 'Nucleus') -> None:
         """Merge another nucleus into this one and update all links"""
-        # Save regions before merging
-        other_regions = sorted(other.regions)
-        self_regions = sorted(self.regions)
+        if logger.isEnabledFor(logging.DEBUG):
+            # Regions are only sorted for the log line when it will be shown
+            logger.debug("  Merged regions %s into %s", sorted(other.regions), sorted(self.regions))
         
         # Merge regions
         self.regions.update(other.regions)
         
         # Update links, excluding the nucleus being merged
-        for nucleus, count in list(other.links.items()):
-            if nucleus != self:
-                self.links[nucleus] += count
-                nucleus.links[self] = self.links[nucleus]
+        for nucleus, count in other.links.items():
+            if nucleus is not self:
+                total = self.links.get(nucleus, 0) + count
+                self.links[nucleus] = total
+                nucleus.links[self] = total
                 # Clean up old links
-                if other in nucleus.links:
-                    del nucleus.links[other]
-        
-        print(f"  Merged regions {other_regions} into {self_regions}")
+                nucleus.links.pop(other, None)
+
+        # Nothing may keep pointing at the absorbed nucleus
+        self.links.pop(other, None)
+        other.links = {}
+
+def _add_stats(stats: Optional[Dict[str, int]], **counts: int) -> None:
+    """Accumulate counters into an optional stats dict"""
+    if stats is not None:
+        for name, amount in counts.items():
+            stats[name] = stats.get(name, 0) + amount
 
-def global_stage(nuclei: Dict[int, Nucleus]) -> None:
-    """GLOBAL stage: Merge nuclei with ≥2 strong links"""
-    print("\nGLOBAL Stage:")
+def global_stage(nuclei: Dict[int, Nucleus], stats: Optional[Dict[str, int]] = None) -> None:
+    """
+    GLOBAL stage: Merge nuclei with ≥2 strong links
+
+    stats, if given, accumulates global_iterations (full or partial scans),
+    global_merges and global_pairs_scanned.
+    """
+    logger.debug("GLOBAL Stage:")
+    iterations = merges = scanned = 0
     while True:
         merged = False
         nucleus_list = list(nuclei.values())
+        iterations += 1
         
         # Look for nuclei pairs with ≥2 links
         for i, n1 in enumerate(nucleus_list):
             for n2 in nucleus_list[i+1:]:
-                if n1.links[n2] >= 2:
-                    print(f"Found {n1.links[n2]} links between nuclei:")
+                count = n1.link_count(n2)
+                if count >= 2:
+                    logger.debug("Found %d links between nuclei:", count)
+                    if stats is not None:
+                        # Pairs in earlier rows plus this row up to n2
+                        m = len(nucleus_list)
+                        scanned += i * (m - 1) - i * (i - 1) // 2 + nucleus_list.index(n2, i + 1) - i
                     n1.merge_with(n2)
+                    merges += 1
                     
                     # Update nuclei dictionary
                     for region in n2.regions:
@@ -57,55 +99,410 @@ def global_stage(nuclei: Dict[int, Nucleus]) -> None:
                 break
                 
         if not merged:
+            m = len(nucleus_list)
+            scanned += m * (m - 1) // 2
             break
 
-def singlebody_stage(nuclei: Dict[int, Nucleus]) -> None:
-    """SINGLEBODY stage: Merge single regions with one link to multi-region nuclei"""
-    print("\nSINGLEBODY Stage:")
+    _add_stats(stats, global_iterations=iterations, global_merges=merges,
+               global_pairs_scanned=scanned)
+
+def singlebody_stage(nuclei: Dict[int, Nucleus], stats: Optional[Dict[str, int]] = None) -> None:
+    """
+    SINGLEBODY stage: Merge single regions with one link to multi-region nuclei
+
+    stats, if given, accumulates singlebody_iterations, singlebody_merges
+    and singlebody_pairs_scanned (single pairs compared plus links examined).
+    """
+    logger.debug("SINGLEBODY Stage:")
+    iterations = merges = scanned = 0
     while True:
         merged = False
-        unique_nuclei = list(set(nuclei.values()))
+        iterations += 1
+        # Unique nuclei in order of their first region, so scans are deterministic
+        unique_nuclei = list(dict.fromkeys(nuclei.values()))
         
         # First, find pairs of single-region nuclei that should merge
         single_region_pairs = []
         for i, n1 in enumerate(unique_nuclei):
             if len(n1.regions) == 1:
+                scanned += len(unique_nuclei) - i - 1
                 for n2 in unique_nuclei[i+1:]:
-                    if len(n2.regions) == 1 and n1.links[n2] > 0:
+                    if len(n2.regions) == 1 and n1.link_count(n2) > 0:
                         single_region_pairs.append((n1, n2))
         
         # Merge pairs of single regions first
         if single_region_pairs:
             n1, n2 = single_region_pairs[0]
-            print(f"Merging single regions {sorted(n1.regions)} and {sorted(n2.regions)}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Merging single regions %s and %s", sorted(n1.regions), sorted(n2.regions))
             n1.merge_with(n2)
             for region in n2.regions:
                 nuclei[region] = n1
+            merges += 1
             merged = True
         
         # Then handle single regions connecting to multi-region nuclei
         if not merged:
             for nucleus in unique_nuclei:
                 if len(nucleus.regions) == 1:
+                    scanned += len(nucleus.links)
                     # Find connected multi-region nuclei
-                    connected = [n for n in nucleus.links.keys() 
-                               if nucleus.links[n] > 0 and len(n.regions) > 1]
+                    connected = [n for n, count in nucleus.links.items()
+                               if count > 0 and len(n.regions) > 1]
                     
                     if len(connected) == 1:
                         target = connected[0]
-                        print(f"Merging single region {sorted(nucleus.regions)} "
-                              f"into {sorted(target.regions)}")
+                        if logger.isEnabledFor(logging.DEBUG):
+                            logger.debug("Merging single region %s into %s",
+                                         sorted(nucleus.regions), sorted(target.regions))
                         target.merge_with(nucleus)
                         
                         for region in nucleus.regions:
                             nuclei[region] = target
                         
+                        merges += 1
                         merged = True
                         break
         
         if not merged:
             break
 
+    _add_stats(stats, singlebody_iterations=iterations, singlebody_merges=merges,
+               singlebody_pairs_scanned=scanned)
+
+class DisjointSet:
+    """Union-find over integer ids; the caller decides which root survives"""
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]  # path halving
+            x = parent[x]
+        return x
+
+    def is_root(self, x: int) -> bool:
+        return self.parent[x] == x
+
+class GroupingBudget:
+    """
+    Time and/or work limit for one grouping run. Work is counted in steps:
+    one per queue pop, nucleus visited or link read, plus one per adjacency
+    entry read, copied or moved. The clock starts when the budget is created
+    and is read on the first spend, then every CLOCK_EVERY steps. Once
+    either limit is reached the budget stays exhausted.
+    """
+    CLOCK_EVERY = 64  # steps between clock reads
+
+    def __init__(self, seconds: Optional[float] = None, steps: Optional[int] = None):
+        self.seconds = seconds
+        self.max_steps = steps
+        self.deadline = None if seconds is None else time.monotonic() + seconds
+        self.steps = 0
+        self.exhausted = False
+        self._next_check = 0
+
+    def spend(self, steps: int = 1) -> bool:
+        """Charge work; False once the budget has run out"""
+        if self.exhausted:
+            return False
+        self.steps += steps
+        if self.max_steps is not None and self.steps > self.max_steps:
+            self.exhausted = True
+        elif self.deadline is not None and self.steps >= self._next_check:
+            self._next_check = self.steps + self.CLOCK_EVERY
+            self.exhausted = time.monotonic() >= self.deadline
+        return not self.exhausted
+
+def unionfind_grouping(links: Links, background: int,
+                       stats: Optional[Dict[str, int]] = None) -> List[Set[int]]:
+    """
+    Group regions with a disjoint-set and priority queues instead of rescans.
+
+    Produces the same bodies, in the same order, as the reference
+    global_stage/singlebody_stage pair. Nuclei are integer ids; a nucleus'
+    rank is the first-appearance position of its earliest region, which is
+    exactly the order the reference scans in. Each merge only revisits the
+    neighbours of the absorbed nucleus.
+
+    stats takes the same counters as the reference stages; here an
+    iteration is one queue pop and pairs scanned are adjacency entries read.
+    """
+    # Regions in order of first appearance; index doubles as initial rank
+    regions, region_links = _region_adjacency(links, background)
+    index = {region: i for i, region in enumerate(regions)}  # {region_number: nucleus_id}
+    n = len(regions)
+
+    # Sparse link counts between live nuclei: adjacency[a][b] == adjacency[b][a]
+    adjacency: List[Dict[int, int]] = [
+        {index[nb]: count for nb, count in region_links.get(region, {}).items()}
+        for region in regions
+    ]
+
+    sets = DisjointSet(n)
+    size = [1] * n           # regions per nucleus (valid for roots)
+    rank = list(range(n))    # earliest region position (valid for roots)
+
+    def absorb(keep: int, gone: int) -> List[Tuple[int, int, int]]:
+        """Merge nucleus `gone` into `keep`; return (neighbour, old, new) counts"""
+        sets.parent[gone] = keep
+        size[keep] += size[gone]
+        rank[keep] = min(rank[keep], rank[gone])
+        keep_links = adjacency[keep]
+        keep_links.pop(gone, None)
+        changed = []
+        for nb, count in adjacency[gone].items():
+            if nb == keep:
+                continue
+            old = keep_links.get(nb, 0)
+            keep_links[nb] = old + count
+            nb_links = adjacency[nb]
+            del nb_links[gone]
+            nb_links[keep] = old + count
+            changed.append((nb, old, old + count))
+        adjacency[gone] = {}
+        return changed
+
+    def pair_entry(a: int, b: int) -> Tuple[int, int, int, int]:
+        if rank[a] < rank[b]:
+            return (rank[a], rank[b], a, b)
+        return (rank[b], rank[a], b, a)
+
+    # GLOBAL: always merge the qualifying pair the reference scan would hit first
+    logger.debug("GLOBAL Stage (union-find):")
+    heap = [pair_entry(a, b) for a in range(n)
+            for b, count in adjacency[a].items() if a < b and count >= 2]
+    heapq.heapify(heap)
+    iterations = merges = 0
+    scanned = sum(len(row) for row in adjacency) // 2
+    while heap:
+        _, _, a, b = heapq.heappop(heap)
+        iterations += 1
+        if not (sets.is_root(a) and sets.is_root(b)):
+            continue  # one side was absorbed since this entry was pushed
+        changed = absorb(a, b)
+        scanned += len(changed)
+        for nb, old, new in changed:
+            if old < 2 <= new:
+                heapq.heappush(heap, pair_entry(a, nb))
+        merges += 1
+    logger.debug("  %d merges", merges)
+    _add_stats(stats, global_iterations=iterations, global_merges=merges,
+               global_pairs_scanned=scanned)
+
+    # SINGLEBODY, part 1: pair up linked single-region nuclei in scan order
+    logger.debug("SINGLEBODY Stage (union-find):")
+    iterations = merges = scanned = 0
+    for a in range(n):
+        if not sets.is_root(a) or size[a] != 1:
+            continue
+        scanned += len(adjacency[a])
+        partners = [b for b in adjacency[a] if size[b] == 1 and rank[b] > rank[a]]
+        if partners:
+            absorb(a, min(partners, key=rank.__getitem__))
+            merges += 1
+
+    # SINGLEBODY, part 2: singles with exactly one multi-region neighbour,
+    # lowest rank first; only neighbours of an absorbed single are re-queued
+    queue = [a for a in range(n) if sets.is_root(a) and size[a] == 1]
+    heapq.heapify(queue)
+    while queue:
+        a = heapq.heappop(queue)
+        iterations += 1
+        if not sets.is_root(a) or size[a] != 1:
+            continue
+        scanned += len(adjacency[a])
+        connected = [b for b in adjacency[a] if size[b] > 1]
+        if len(connected) != 1:
+            continue
+        singles = [b for b in adjacency[a] if size[b] == 1]
+        absorb(connected[0], a)
+        merges += 1
+        for b in singles:
+            heapq.heappush(queue, b)
+    logger.debug("  %d merges", merges)
+    _add_stats(stats, singlebody_iterations=iterations, singlebody_merges=merges,
+               singlebody_pairs_scanned=scanned)
+
+    # Bodies in order of their earliest region, matching group_regions
+    bodies: Dict[int, Set[int]] = {}
+    for i, region in enumerate(regions):
+        bodies.setdefault(sets.find(i), set()).add(region)
+    return list(bodies.values())
+
+def anytime_grouping(links: Links, background: int, budget: GroupingBudget,
+                     stats: Optional[Dict[str, int]] = None) -> List[Set[int]]:
+    """
+    Group regions under a budget, the most certain merges first.
+
+    GLOBAL merges the most-linked pair queued so far. Link counts add up
+    when nuclei merge, so a pair that qualifies once keeps qualifying and
+    GLOBAL reaches the same partition in any order. SINGLEBODY then runs as
+    in unionfind_grouping, so a run that completes returns the same bodies
+    in the same order.
+
+    No grouping work happens outside the budget: a LinkIndex's adjacency
+    is read in place and a row is only copied when a merge changes it, and
+    rows are queued one per pop in scan order rather than all up front.
+    When the budget runs out budget.exhausted is set; if that happens during
+    GLOBAL, SINGLEBODY is skipped. A partial result is still a partition of
+    every region, in the same order as a complete one: regions not merged
+    yet are bodies of their own.
+    """
+    if isinstance(links, LinkIndex):
+        base, source = links.adjacency, iter(links.regions)
+    else:
+        order_list, base = _region_adjacency(links, background, budget)
+        source = iter(order_list)
+
+    rows: Dict[int, Dict[int, int]] = {}      # {nucleus: {nucleus: link count}} once changed
+    members: Dict[int, List[int]] = {}        # regions of nuclei holding two or more
+    absorbed: Set[int] = set()
+    rank: Dict[int, int] = {}                 # {region: position of first appearance}
+    order: List[int] = []
+
+    def row(r: int) -> Dict[int, int]:
+        return rows[r] if r in rows else base.get(r, {})
+
+    def own_row(r: int) -> Dict[int, int]:
+        """r's row, copied out of the shared adjacency the first time it changes"""
+        r_links = rows.get(r)
+        if r_links is None:
+            r_links = rows[r] = {nb: c for nb, c in base.get(r, {}).items() if nb != background}
+            budget.spend(len(r_links))
+        return r_links
+
+    def absorb(keep: int, gone: int) -> List[Tuple[int, int]]:
+        """Merge nucleus `gone` into `keep`; return (neighbour, new count) pairs"""
+        absorbed.add(gone)
+        kept, moved = members.pop(keep, None) or [keep], members.pop(gone, None) or [gone]
+        if len(kept) < len(moved):
+            kept, moved = moved, kept
+        kept.extend(moved)
+        members[keep] = kept
+        keep_links = own_row(keep)
+        keep_links.pop(gone, None)
+        changed = []
+        for nb, count in row(gone).items():
+            if nb == keep or nb == background:
+                continue
+            new = keep_links.get(nb, 0) + count
+            keep_links[nb] = new
+            nb_links = own_row(nb)
+            del nb_links[gone]
+            nb_links[keep] = new
+            changed.append((nb, new))
+        rows[gone] = {}
+        budget.spend(len(moved) + len(changed))
+        return changed
+
+    # GLOBAL: read one more row per pop, merge the most-linked queued pair
+    logger.debug("GLOBAL Stage (anytime):")
+    heap: List[Tuple[int, int, int]] = []
+    iterations = merges = scanned = 0
+    reading = True
+    while budget.spend():
+        if reading:
+            region = next(source, None)
+            if region is None:
+                reading = False
+            elif region != background:
+                rank[region] = len(order)
+                order.append(region)
+                if region not in absorbed:
+                    r_links = row(region)
+                    budget.spend(len(r_links))
+                    scanned += len(r_links)
+                    for nb, count in r_links.items():
+                        # Pairs with a row read earlier are queued already (or when their count grew)
+                        if count >= 2 and nb not in rank and nb != background:
+                            heapq.heappush(heap, (-count, min(region, nb), max(region, nb)))
+        if not heap:
+            if reading:
+                continue
+            break
+        _, a, b = heapq.heappop(heap)
+        iterations += 1
+        if a in absorbed or b in absorbed:
+            continue  # one side was absorbed since this entry was pushed
+        if len(row(a)) < len(row(b)):
+            a, b = b, a  # fold the shorter row into the longer one
+        for nb, new in absorb(a, b):
+            # Requeued whenever the count grows, so the priority stays current
+            if new >= 2:
+                heapq.heappush(heap, (-new, min(a, nb), max(a, nb)))
+        merges += 1
+    logger.debug("  %d merges", merges)
+    _add_stats(stats, global_iterations=iterations, global_merges=merges,
+               global_pairs_scanned=scanned)
+
+    # SINGLEBODY, as in unionfind_grouping; every region has its rank by now
+    logger.debug("SINGLEBODY Stage (anytime):")
+    iterations = merges = scanned = 0
+    if not budget.exhausted:
+        for a in order:
+            if not budget.spend():
+                break
+            if a in absorbed or a in members:
+                continue
+            a_links = row(a)
+            budget.spend(len(a_links))
+            scanned += len(a_links)
+            partners = [b for b in a_links if b not in members and b != background and rank[b] > rank[a]]
+            if partners:
+                absorb(a, min(partners, key=rank.__getitem__))
+                merges += 1
+
+    # Part 2 walks the ranks in order; absorbed singles' single neighbours are re-queued
+    queue: List[int] = []
+    position = 0
+    while not budget.exhausted and budget.spend():
+        if queue and (position >= len(order) or queue[0] <= position):
+            x = heapq.heappop(queue)
+            if x == position:
+                position += 1
+        elif position < len(order):
+            x = position
+            position += 1
+        else:
+            break
+        iterations += 1
+        a = order[x]
+        if a in absorbed or a in members:
+            continue
+        a_links = row(a)
+        budget.spend(len(a_links))
+        scanned += len(a_links)
+        connected = [b for b in a_links if b in members]
+        if len(connected) != 1:
+            continue
+        singles = [b for b in a_links if b not in members and b != background]
+        absorb(connected[0], a)
+        merges += 1
+        for b in singles:
+            heapq.heappush(queue, rank[b])
+    logger.debug("  %d merges", merges)
+    _add_stats(stats, singlebody_iterations=iterations, singlebody_merges=merges,
+               singlebody_pairs_scanned=scanned, budget_steps=budget.steps,
+               grouping_partial=int(budget.exhausted))
+
+    if budget.exhausted:
+        logger.debug("  Budget exhausted after %d steps", budget.steps)
+        # Regions whose links were not read yet still belong to the partition
+        if isinstance(links, LinkIndex):
+            order.extend(r for r in source if r != background)
+        else:
+            order = [r for r in dict.fromkeys(r for r1, r2, _ in links for r in (r1, r2))
+                     if r != background]
+
+    # Bodies in order of their earliest region, matching group_regions
+    label = {r: root for root, body in members.items() for r in body}
+    complete: Dict[int, Set[int]] = {}
+    for region in order:
+        complete.setdefault(label.get(region, region), set()).add(region)
+    return list(complete.values())
+
 def validate_input(links: List[Tuple[int, int, str]], background: int) -> None:
     """Validate input data before processing"""
     if not links:
@@ -114,41 +511,225 @@ def validate_input(links: List[Tuple[int, int, str]], background: int) -> None:
         raise ValueError("Background region not specified")
 
 def print_link_summary(links: List[Tuple[int, int, str]]) -> None:
-    """Print all links for debugging"""
-    print("\n=== LINK SUMMARY ===")
-    for r1, r2, via in links:
-        print(f"  {r1} <-> {r2} via vertex {via}")
-    print("=====================")
-
-def group_regions(links: List[Tuple[int, int, str]], background: int) -> List[Set[int]]:
-    """Group regions into bodies using GLOBAL and SINGLEBODY stages"""
-    # Initialize one nucleus per region (excluding background)
-    nuclei = {}  # {region_number: Nucleus}
+    """Log all links at DEBUG level; nothing is formatted otherwise"""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    lines = ["=== LINK SUMMARY ==="]
+    lines.extend(f"  {r1} <-> {r2} via vertex {via}" for r1, r2, via in links)
+    lines.append("=====================")
+    logger.debug("\n".join(lines))
+
+def _region_adjacency(links: Links, background: int,
+                      budget: Optional[GroupingBudget] = None) -> Tuple[List[int], Dict[int, Dict[int, int]]]:
+    """
+    Regions in order of first appearance (excluding background) and link
+    counts between them. A LinkIndex already holds both, so it is used as-is.
+    A link list is read one link per budget step, stopping when it runs out.
+    """
+    if isinstance(links, LinkIndex):
+        regions = [r for r in links.regions if r != background]
+        if links.background == background:
+            return regions, links.adjacency
+        return regions, {r: {nb: c for nb, c in row.items() if nb != background}
+                         for r, row in links.adjacency.items() if r != background}
+
+    order: Dict[int, None] = {}
+    adjacency: Dict[int, Dict[int, int]] = {}
     for r1, r2, _ in links:
-        if r1 != background and r1 not in nuclei:
-            nuclei[r1] = Nucleus({r1})
-        if r2 != background and r2 not in nuclei:
-            nuclei[r2] = Nucleus({r2})
-    
+        if budget is not None and not budget.spend():
+            break
+        if r1 != background:
+            order.setdefault(r1)
+        if r2 != background:
+            order.setdefault(r2)
+        if r1 != background and r2 != background and r1 != r2:
+            row1 = adjacency.setdefault(r1, {})
+            row1[r2] = row1.get(r2, 0) + 1
+            row2 = adjacency.setdefault(r2, {})
+            row2[r1] = row2.get(r1, 0) + 1
+    return list(order), adjacency
+
+def build_nuclei(links: Links, background: int) -> Dict[int, Nucleus]:
+    """Create one nucleus per region and record the links between them"""
+    regions, adjacency = _region_adjacency(links, background)
+
+    # Initialize one nucleus per region (excluding background)
+    nuclei = {region: Nucleus({region}) for region in regions}  # {region_number: Nucleus}
+
     # Record links between nuclei (excluding background)
+    for r1, row in adjacency.items():
+        n1 = nuclei[r1]
+        for r2, count in row.items():
+            n1.links[nuclei[r2]] = count
+    return nuclei
+
+def split_components(links: Links, background: int) -> Tuple[List[List[Tuple[int, int, str]]], List[int]]:
+    """
+    Partition links into the connected components of the region graph.
+
+    Returns (components, regions): each component is its links in their
+    original order, components come in order of their earliest region, and
+    regions lists every region in order of first appearance. Merges only
+    ever happen along links, so grouping each component alone gives the
+    same bodies as grouping the whole graph.
+    """
+    index: Dict[int, int] = {}  # {region: id in order of first appearance}
+    for r1, r2, _ in links:
+        if r1 != background and r1 not in index:
+            index[r1] = len(index)
+        if r2 != background and r2 not in index:
+            index[r2] = len(index)
+
+    sets = DisjointSet(len(index))
     for r1, r2, _ in links:
         if r1 != background and r2 != background:
-            n1, n2 = nuclei[r1], nuclei[r2]
-            if n1 != n2:
-                n1.links[n2] += 1
-                n2.links[n1] += 1
-    
+            a, b = sets.find(index[r1]), sets.find(index[r2])
+            if a != b:
+                # Keep the earlier region as root so roots order components
+                sets.parent[max(a, b)] = min(a, b)
+
+    components: Dict[int, List[Tuple[int, int, str]]] = {}
+    for link in links:
+        region = link[0] if link[0] != background else link[1]
+        if region != background:
+            components.setdefault(sets.find(index[region]), []).append(link)
+    return [components[root] for root in sorted(components)], list(index)
+
+def _group_component(links: List[Tuple[int, int, str]], background: int,
+                     engine: str) -> Tuple[List[Set[int]], Dict[str, int]]:
+    """Bodies and counters for one component; runs in worker processes"""
+    stats: Dict[str, int] = {}
+    return group_regions(links, background, engine, stats), stats
+
+# Below this many links a process pool costs more than it saves
+PARALLEL_MIN_LINKS = 5000
+
+def group_components(links: Links, background: int, engine: str = "reference",
+                     stats: Optional[Dict[str, int]] = None,
+                     workers: Optional[int] = None) -> List[Set[int]]:
+    """
+    Group each connected component of the region graph independently.
+
+    Pair scans become quadratic in the component size instead of the scene
+    size. With workers > 1, scenes of at least PARALLEL_MIN_LINKS links are
+    spread over a process pool. Bodies come back in the same order as
+    group_regions would return them.
+    """
+    components, regions = split_components(links, background)
+    task = partial(_group_component, background=background, engine=engine)
+    if workers and workers > 1 and len(components) > 1 and len(links) >= PARALLEL_MIN_LINKS:
+        chunksize = max(1, len(components) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(task, components, chunksize=chunksize))
+    else:
+        results = [task(component) for component in components]
+
+    bodies = []
+    for component_bodies, component_stats in results:
+        bodies.extend(component_bodies)
+        _add_stats(stats, **component_stats)
+    _add_stats(stats, components=len(components))
+
+    # Interleave components' bodies by their earliest region, as one pass would
+    rank = {region: i for i, region in enumerate(regions)}
+    bodies.sort(key=lambda body: min(rank[r] for r in body))
+    return bodies
+
+GROUPING_ENGINES = ("reference", "unionfind")
+
+def group_regions(links: Links,
+                  background: Union[int, Scene],
+                  engine: str = "reference",
+                  stats: Optional[Dict[str, int]] = None,
+                  split: bool = False,
+                  workers: Optional[int] = None,
+                  budget: Optional[GroupingBudget] = None) -> List[Set[int]]:
+    """
+    Group regions into bodies using GLOBAL and SINGLEBODY stages.
+
+    links may be the (r1, r2, via) list or a LinkIndex from build_link_index,
+    whose adjacency is used directly.
+    engine selects the implementation: "reference" rescans nucleus pairs
+    after every merge, "unionfind" uses unionfind_grouping. Both return the
+    same bodies in the same order. Other names are looked up in the
+    engines.py registry.
+    stats, if given, collects iteration, merge and pair-scan counters.
+    split (or workers) groups each connected component on its own, see
+    group_components.
+    budget (a GroupingBudget) bounds the work: whatever the engine, regions
+    are grouped by anytime_grouping with the most-linked merges first, and
+    the bodies formed when the budget runs out are returned (partial when
+    budget.exhausted is set). Completed runs give the same bodies as
+    without a budget. split and workers are ignored.
+    """
+    if isinstance(background, Scene):
+        background = background.background
+    if budget is not None:
+        return anytime_grouping(links, background, budget, stats)
+    if split or workers:
+        return group_components(links, background, engine, stats, workers)
+    if engine == "unionfind":
+        return unionfind_grouping(links, background, stats)
+    if engine != "reference":
+        # An engine registered in engines.py (raises ValueError for unknown names)
+        from engines import get_engine
+        return get_engine("group", engine)(links, background, stats)
+
+    nuclei = build_nuclei(links, background)
+
     # Run grouping stages
-    global_stage(nuclei)
-    singlebody_stage(nuclei)
+    global_stage(nuclei, stats)
+    singlebody_stage(nuclei, stats)
     
-    # Return unique sets of regions forming bodies
-    return [n.regions for n in set(nuclei.values())]
+    # Return unique sets of regions forming bodies, ordered by earliest region
+    return [n.regions for n in dict.fromkeys(nuclei.values())]
 
-def format_body_output(bodies: List[Set[int]]) -> None:
-    print("\nScene Analysis Results:")
-    print("----------------------")
+def render_body_output(bodies: List[Set[int]]) -> str:
+    """Body table as text, one line per body"""
+    lines = ["Scene Analysis Results:", "----------------------"]
     for i, regions in enumerate(bodies, 1):
         sorted_regions = sorted(regions)
-        print(f"BODY {i}: regions {sorted_regions}")
-    print("----------------------")
\ No newline at end of file
+        lines.append(f"BODY {i}: regions {sorted_regions}")
+    lines.append("----------------------")
+    return "\n".join(lines)
+
+def format_body_output(bodies: List[Set[int]]) -> None:
+    print("\n" + render_body_output(bodies))
+
+def test_unionfind_matches_reference():
+    """Fuzz: unionfind_grouping gives the reference bodies in the same order"""
+    import random
+    rnd = random.Random(0)
+    for _ in range(300):
+        regions = rnd.randint(2, 25)
+        background = rnd.choice([0, 1])
+        links = [(rnd.randint(0, regions), rnd.randint(0, regions), f"V{rnd.randint(1, 60)}")
+                 for _ in range(rnd.randint(1, 4 * regions))]
+        links = [(r1, r2, via) for r1, r2, via in links if r1 != r2]
+        expected = group_regions(links, background, "reference")
+        assert group_regions(links, background, "unionfind") == expected, links
+        assert group_regions(links, background, budget=GroupingBudget()) == expected, links
+
+def test_partial_grouping_is_a_partition():
+    """A run stopped by its budget still lists every region exactly once"""
+    import random
+    rnd = random.Random(1)
+    for trial in range(200):
+        regions = rnd.randint(2, 30)
+        background = rnd.choice([0, 1])
+        links = [(rnd.randint(0, regions), rnd.randint(0, regions), f"V{rnd.randint(1, 80)}")
+                 for _ in range(rnd.randint(1, 5 * regions))]
+        links = [(r1, r2, via) for r1, r2, via in links if r1 != r2]
+        index = LinkIndex(background)
+        for link in links:
+            index.add(*link)
+        # A LinkIndex drops links to the background, and with them regions linked only there
+        for source, expected in ((links, {r for r1, r2, _ in links for r in (r1, r2)}),
+                                 (index, set(index.regions))):
+            expected.discard(background)
+            budget = GroupingBudget(steps=trial % 12)
+            bodies = group_regions(source, background, budget=budget)
+            listed = [r for body in bodies for r in body]
+            assert len(listed) == len(set(listed)) and set(listed) == expected, (trial, bodies)
+            first = [min(body, key=listed.index) for body in bodies]
+            assert first == sorted(first, key=listed.index)
@@ -1,6 +1,11 @@
 import json
+import logging
+from operator import itemgetter
 from pathlib import Path
-from typing import Dict, List, Tuple, Set
+from typing import Dict, Iterable, List, Optional, Tuple, Set, Union
+from take_input import Scene, load_scene
+
+logger = logging.getLogger(__name__)
 
 # Each vertex connects certain regions (from the KIND list)
 vertex_regions = {
@@ -20,14 +25,77 @@ def all_unique_pairs(regions):
             pairs.append((regions[i], regions[j]))
     return pairs
 
+class LinkIndex:
+    """
+    Region links with constant-time duplicate checks.
+
+    Keeps the (r1, r2, via) list that callers have always received, plus:
+      support:   {(low, high): number of vertices linking the pair}
+      adjacency: {region: {neighbour_region: link_count}}
+      regions:   regions in order of first appearance in the link list
+    A link is a duplicate when the same vertex already linked the same pair.
+    """
+    def __init__(self, background: int = None):
+        self.background = background
+        self.links: List[Tuple[int, int, str]] = []
+        self.support: Dict[Tuple[int, int], int] = {}
+        self.adjacency: Dict[int, Dict[int, int]] = {}
+        self.regions: Dict[int, None] = {}  # ordered set
+        self.duplicates = 0
+        self._seen: Set[Tuple[int, int, str]] = set()
+
+    def __len__(self) -> int:
+        return len(self.links)
+
+    def __iter__(self):
+        return iter(self.links)
+
+    def add(self, r1: int, r2: int, via: str) -> bool:
+        """Record a bidirectional region link, avoiding background; True if added"""
+        return bool(self.add_many(((r1, r2),), via))
+
+    def add_many(self, pairs: Iterable[Tuple[int, int]], via: str) -> List[Tuple[int, int]]:
+        """Record links made by one vertex, as add does for each pair; returns the pairs added"""
+        background, seen, support, adjacency, order = (self.background, self._seen, self.support,
+                                                        self.adjacency, self.regions)
+        added = []
+        for r1, r2 in pairs:
+            if r1 == background or r2 == background:
+                continue
+            pair = (r1, r2) if r1 <= r2 else (r2, r1)
+            key = (pair[0], pair[1], via)
+            if key in seen:
+                self.duplicates += 1
+                continue
+            seen.add(key)
+            self.links.append((r1, r2, via))
+            order.setdefault(r1)
+            order.setdefault(r2)
+            if r1 != r2:
+                support[pair] = support.get(pair, 0) + 1
+                row1 = adjacency.setdefault(r1, {})
+                row1[r2] = row1.get(r2, 0) + 1
+                row2 = adjacency.setdefault(r2, {})
+                row2[r1] = row2.get(r1, 0) + 1
+            added.append((r1, r2))
+        return added
+
+    def neighbors(self, region: int) -> Dict[int, int]:
+        """Linked regions and how many links join them to `region`"""
+        return self.adjacency.get(region, {})
+
 def add_link(links, r1, r2, via):
     """Record a bidirectional region link"""
+    if isinstance(links, LinkIndex):
+        return links.add(r1, r2, via)
     if (r1, r2) not in links and (r2, r1) not in links:
         links.append((r1, r2, via))
 
 def load_vertex_analysis(filename: str = "vertex_analysis_output.json") -> Dict[str, str]:
     """
-    Load vertex analysis results from a JSON file.
+    Load vertex analysis results from a JSON file written by write_analysis.
+    Relative names resolve next to this module; absolute paths are used as-is.
+    The pipeline itself passes classifications in memory and never calls this.
     Expected format from vertex_analysis.py:
     {
         "A": "L",
@@ -64,14 +132,16 @@ def process_arrow_vertex(regions: List[int], angles: List[float]) -> Tuple[int,
     return (r1, r2)
 
 def log_vertex_processing(vertex_id, vtype, links_made):
-    """Log vertex processing details"""
-    print(f"\nProcessing vertex {vertex_id} ({vtype}):")
+    """Log vertex processing details (DEBUG level)"""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    lines = [f"Processing vertex {vertex_id} ({vtype}):"]
     if links_made:
-        print("Links created:")
-        for r1, r2 in links_made:
-            print(f"  Region {r1} <-> Region {r2}")
+        lines.append("Links created:")
+        lines.extend(f"  Region {r1} <-> Region {r2}" for r1, r2 in links_made)
     else:
-        print("  No links created")
+        lines.append("  No links created")
+    logger.debug("\n".join(lines))
 
 def validate_vertex_data(vertex_types, vertex_regions):
     """Validate vertex input data"""
@@ -85,76 +155,141 @@ def validate_vertex_data(vertex_types, vertex_regions):
 
 # --- Main linking function ---
 
+MIN_REGIONS = {"L": 2, "Fork": 3, "Arrow": 3, "T": 3}
+
+def vertex_links(vtype: str, regions: List[int],
+                 sectors: Optional[List[Tuple[int, float]]] = None) -> List[Tuple[int, int]]:
+    """
+    Region pairs one vertex links, before background and duplicate filtering.
+
+    Depends only on the vertex's own type, regions and sectors, so an edit
+    elsewhere in the scene never changes it.
+    """
+    if len(regions) < MIN_REGIONS.get(vtype, 0):
+        return []
+
+    if vtype == "Fork":
+        # Link all region pairs (they share a 3-way connection)
+        return all_unique_pairs(regions)
+
+    if vtype == "Arrow":
+        if sectors and all(r is not None for r, _ in sectors):
+            # Real sector widths: the two narrow sectors flank the shaft
+            return [process_arrow_vertex([r for r, _ in sectors], [a for _, a in sectors])]
+        # No geometry for this vertex: fall back to KIND-list order
+        angles = [i * 120 for i in range(len(regions))]
+        return [process_arrow_vertex(regions, angles)]
+
+    # L: two regions meet — typically a boundary, not a shared surface
+    # T: occlusion — typically no region linking
+    return []
+
 def link_regions(vertex_types: Dict[str, str], 
                 vertex_regions: Dict[str, List[int]], 
-                input_file: str = "cube.json") -> List[Tuple[int, int, str]]:
+                input_file: Union[str, Scene] = "cube.json") -> List[Tuple[int, int, str]]:
     """
     Link regions based on vertex types and their connecting regions.
     
     Args:
         vertex_types: Dictionary mapping vertex IDs to their types
         vertex_regions: Dictionary mapping vertex IDs to lists of regions
-        input_file: Path to input JSON file (for background region)
+        input_file: Parsed Scene or BinaryScene, or path to an input file (for background region)
     
     Returns:
         List of tuples (region1, region2, vertex) representing linked regions
     """
-    links = []
-    
+    return build_link_index(vertex_types, vertex_regions, input_file).links
+
+def build_link_index(vertex_types: Dict[str, str],
+                     vertex_regions: Dict[str, List[int]],
+                     input_file: Union[str, Scene] = "cube.json") -> LinkIndex:
+    """Same as link_regions, but return the full LinkIndex"""
     # Get background region and vertex coordinates
-    try:
-        with open(input_file) as f:
-            data = json.load(f)
-            background = data.get("background", None)
-            vertex_coords = {v["id"]: v["coords"] for v in data["vertex-data"]}
-    except (FileNotFoundError, json.JSONDecodeError, KeyError) as e:
-        print(f"Warning: Error loading data from {input_file}: {e}")
-        return []
+    if not isinstance(input_file, (str, Path)):
+        scene = input_file  # Scene or BinaryScene
+    else:
+        try:
+            scene = load_scene(input_file)
+        except (FileNotFoundError, json.JSONDecodeError, KeyError) as e:
+            logger.warning("Error loading data from %s: %s", input_file, e)
+            return LinkIndex()
+    background = scene.background
+    links = LinkIndex(background)
 
-    def add_link(links, r1, r2, via):
-        """Record a bidirectional region link, avoiding background"""
-        if r1 == background or r2 == background:
-            return False  # Return False if link wasn't added
-        if (r1, r2) not in links and (r2, r1) not in links:
-            links.append((r1, r2, via))
-            return True  # Return True if link was added
-        return False
+    # Per-vertex sectors in angular order: from the scene's planar graph,
+    # else the table the numpy classifier leaves
+    graph = getattr(scene, "graph", None)
+    angular_table = scene.angular_table or {}
+    if graph is None and not angular_table and set(vertex_types) <= set(scene.coords):
+        from planar_graph import planar_graph
+        graph = planar_graph(scene)
+    debug = logger.isEnabledFor(logging.DEBUG)
 
     for vertex, vtype in vertex_types.items():
         regions = vertex_regions.get(vertex, [])
         
         # Validate minimum regions for each type
-        min_regions = {"L": 2, "Fork": 3, "Arrow": 3, "T": 3}
-        if len(regions) < min_regions[vtype]:
-            print(f"Warning: Vertex {vertex} has fewer regions than expected for type {vtype}")
+        if len(regions) < MIN_REGIONS[vtype]:
+            logger.warning("Vertex %s has fewer regions than expected for type %s", vertex, vtype)
             continue
 
-        links_made = []
+        sectors = None
+        if vtype == "Arrow":  # the only junction whose links depend on sector geometry
+            if graph is not None and vertex in graph.index:
+                sectors = graph.sectors(graph.index[vertex])
+            else:
+                sectors = angular_table.get(vertex)
+        links_made = [(r1, r2) for r1, r2 in vertex_links(vtype, regions, sectors)
+                      if links.add(r1, r2, vertex)]
 
-        if vtype == "L":
-            # Two regions meet — typically a boundary, not a shared surface
-            continue
+        if debug and vtype in ("Fork", "Arrow"):
+            log_vertex_processing(vertex, vtype, links_made)
 
-        elif vtype == "Fork":
-            # Link all region pairs (they share a 3-way connection)
-            for (r1, r2) in all_unique_pairs(regions):
-                add_link(links, r1, r2, vertex)
-                links_made.append((r1, r2))
+    return links
 
+def inline_link_index(vertex_types: Dict[str, str], scene) -> LinkIndex:
+    """
+    Same LinkIndex as build_link_index(vertex_types, scene.regions, scene),
+    with Fork and Arrow pairs worked out inline and each vertex's links
+    recorded in one LinkIndex.add_many call instead of one add per link.
+    """
+    background = scene.background
+    links = LinkIndex(background)
+    graph = getattr(scene, "graph", None)
+    angular_table = scene.angular_table or {}
+    if graph is None and not angular_table and set(vertex_types) <= set(scene.coords):
+        from planar_graph import planar_graph
+        graph = planar_graph(scene)
+    index = graph.index if graph is not None else {}
+    vertex_regions = scene.regions
+    add_many = links.add_many
+    debug = logger.isEnabledFor(logging.DEBUG)
+
+    for vertex, vtype in vertex_types.items():
+        regions = vertex_regions.get(vertex, [])
+        if len(regions) < MIN_REGIONS[vtype]:
+            logger.warning("Vertex %s has fewer regions than expected for type %s", vertex, vtype)
+            continue
+        if vtype == "Fork":
+            count = len(regions)
+            pairs = [(regions[i], regions[j]) for i in range(count) for j in range(i + 1, count)]
         elif vtype == "Arrow":
-            if len(regions) >= 3:
-                # Use evenly spaced angles for simplicity
-                angles = [i * 120 for i in range(len(regions))]
-                
-                r1, r2 = process_arrow_vertex(regions, angles)
-                if add_link(links, r1, r2, vertex):
-                    links_made.append((r1, r2))
-
-        elif vtype == "T":
-            # Occlusion — typically no region linking
+            if vertex in index:
+                sectors = graph.sectors(index[vertex])
+            else:
+                sectors = angular_table.get(vertex)
+            if sectors and len(sectors) >= 3 and all(r is not None for r, _ in sectors):
+                # process_arrow_vertex: the two narrowest sectors, ties in order
+                narrow = sorted(sectors, key=itemgetter(1))
+                pairs = [(narrow[0][0], narrow[1][0])]
+            else:
+                pairs = vertex_links(vtype, regions, sectors)
+        else:
             continue
 
-        log_vertex_processing(vertex, vtype, links_made)
+        links_made = add_many(pairs, vertex)
+        if debug:
+            log_vertex_processing(vertex, vtype, links_made)
 
     return links
 
@@ -180,7 +315,7 @@ def visualize_region_graph(links: List[Tuple[int, int, str]]) -> None:
         import networkx as nx
         import matplotlib.pyplot as plt
     except ImportError:
-        print("Warning: networkx or matplotlib not installed. Skipping graph visualization.")
+        logger.warning("networkx or matplotlib not installed. Skipping graph visualization.")
         return
         
     G = nx.Graph()
@@ -216,28 +351,26 @@ def test_link_regions():
     links = link_regions(test_types, test_regions)
     assert len(links) > 0, "Should create at least one link"
 
-def get_vertex_regions(filename: str) -> Dict[str, List[int]]:
-    """Extract regions from KIND lists in input file"""
+def get_vertex_regions(filename: Union[str, Scene]) -> Dict[str, List[int]]:
+    """Extract regions from KIND lists in a parsed Scene or input file"""
+    if not isinstance(filename, (str, Path)):
+        return filename.regions
     try:
-        with open(filename) as f:
-            data = json.load(f)
-        
-        vertex_regions = {}
-        for vertex in data['vertex-data']:
-            regions = [x for x in vertex['kind-list'] if isinstance(x, int)]
-            vertex_regions[vertex['id']] = regions
-        return vertex_regions
+        return load_scene(filename).regions
     except FileNotFoundError:
-        print(f"Warning: Could not find {filename}, using test data instead")
+        logger.warning("Could not find %s, using test data instead", filename)
         return vertex_regions  # Fall back to test data
 
 if __name__ == "__main__":
     # Load data from files
     input_file = "cube.json"  # or "one.json"
-    vertex_classifications = load_vertex_analysis("vertex_analysis_output.json")
-    regions = get_vertex_regions(input_file)
+    from vertex_analysis import analyze_vertices
+
+    scene = load_scene(input_file)
+    vertex_classifications = analyze_vertices(scene)
+    regions = get_vertex_regions(scene)
     
     # Run region linking
-    linked_regions = link_regions(vertex_classifications, regions)
+    linked_regions = link_regions(vertex_classifications, regions, input_file=scene)
     visualize_links(linked_regions)
     visualize_region_graph(linked_regions)  # Optional graph visualization... it makes a triangle rn which stresses me out 😭😭✨
@@ -0,0 +1,233 @@
+"""
+Headless rendering of analyzed scenes to SVG or PNG.
+
+The interactive views (SceneUnderstanding.visualize_results) lay the region
+graph out with a force simulation and open a window, which takes minutes
+for a few thousand regions and needs a display. Here every region is
+placed at the centroid of the vertices around it, so the drawing's own
+coordinates are the layout and nothing is simulated. Regions are coloured
+by body, links are drawn between region centroids, and the line drawing
+itself is drawn underneath.
+
+Each layer is written in bulk: one SVG <path> for all scene lines, one for
+all links and one per body for its nodes, or one LineCollection / scatter
+call per layer for PNG (matplotlib, optional). Region numbers are only
+labelled on small scenes.
+
+Usage:
+    python3 render.py cube.json -o cube.svg
+    python3 render.py big.json --grouping unionfind -o big.png
+    python3 batch.py scenes/ --render renders/      # one SVG per scene
+"""
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from take_input import Scene
+from scene_binary import BinaryScene
+from planar_graph import PlanarGraph, planar_graph
+
+logger = logging.getLogger(__name__)
+
+RENDER_FORMATS = (".svg", ".png")
+MAX_LABELS = 500  # region numbers are drawn for scenes with at most this many regions
+CANVAS = 1000.0   # longest side of the output, in pixels
+PALETTE = ("#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd",
+           "#8c564b", "#e377c2", "#bcbd22", "#17becf", "#7f7f7f")
+LINE_COLOR = "#c8c8c8"
+LINK_COLOR = "#555555"
+UNGROUPED_COLOR = "#ffffff"
+
+Point = Tuple[float, float]
+
+def region_positions(scene: Union[Scene, BinaryScene],
+                     background: Optional[int] = None) -> Dict[int, Point]:
+    """Centroid of the vertices around each region, in drawing coordinates"""
+    sums: Dict[int, List[float]] = {}
+    coords = scene.coords
+    for vid, regions in scene.regions.items():
+        x, y = coords[vid]
+        for r in set(regions):
+            total = sums.get(r)
+            if total is None:
+                sums[r] = [x, y, 1]
+            else:
+                total[0] += x
+                total[1] += y
+                total[2] += 1
+    sums.pop(background, None)
+    return {r: (sx / n, sy / n) for r, (sx, sy, n) in sums.items()}
+
+def scene_segments(scene: Union[Scene, BinaryScene]) -> List[Tuple[int, int]]:
+    """Every line of the drawing once, as vertex index pairs into the scene's planar graph"""
+    graph = planar_graph(scene)
+    # A line listed by only one of its ends has no twin and is drawn from that end
+    return [(u, v) for u, v, t in zip(graph.origin, graph.target, graph.twin) if u < v or t < 0]
+
+def body_colors(bodies: Iterable[Set[int]]) -> Dict[int, str]:
+    """{region: colour}, bodies ordered by smallest region so colours are stable"""
+    colors = {}
+    for k, body in enumerate(sorted(bodies, key=min)):
+        for r in body:
+            colors[r] = PALETTE[k % len(PALETTE)]
+    return colors
+
+class _Frame:
+    """Maps drawing coordinates (y up) onto a canvas (y down) with a margin"""
+    def __init__(self, xs: List[float], ys: List[float], size: float = CANVAS, margin: float = 20.0):
+        xs, ys = xs or [0.0], ys or [0.0]
+        self.x0, self.y1 = min(xs), max(ys)
+        width, height = max(xs) - self.x0, self.y1 - min(ys)
+        self.scale = (size - 2 * margin) / (max(width, height) or 1.0)
+        self.margin = margin
+        self.width = width * self.scale + 2 * margin
+        self.height = height * self.scale + 2 * margin
+
+    def __call__(self, point: Point) -> Point:
+        return ((point[0] - self.x0) * self.scale + self.margin,
+                (self.y1 - point[1]) * self.scale + self.margin)
+
+    def format(self, xs: List[float], ys: List[float]) -> List[str]:
+        """Canvas coordinates as "x y" path strings, formatted once per point"""
+        x0, y1, scale, margin = self.x0, self.y1, self.scale, self.margin
+        return [f"{(x - x0) * scale + margin:.1f} {(y1 - y) * scale + margin:.1f}"
+                for x, y in zip(xs, ys)]
+
+def render_scene(scene: Union[Scene, BinaryScene], bodies: List[Set[int]],
+                 links: Iterable[Tuple[int, int, str]], output: str,
+                 title: Optional[str] = None) -> str:
+    """
+    Render a scene's lines, region links and bodies to `output` (.svg or
+    .png). PNG needs matplotlib; without it an SVG is written next to the
+    requested file instead. Returns the path written.
+    """
+    suffix = Path(output).suffix.lower()
+    if suffix not in RENDER_FORMATS:
+        raise ValueError(f"Unsupported render format {suffix!r}; use one of {', '.join(RENDER_FORMATS)}")
+    graph = planar_graph(scene)
+    positions = region_positions(scene, scene.background)
+    segments = scene_segments(scene)
+    edges = [(r1, r2) for r1, r2, _ in links if r1 in positions and r2 in positions]
+    colors = body_colors(bodies)
+    title = title or scene.name
+
+    Path(output).parent.mkdir(parents=True, exist_ok=True)
+    if suffix == ".png":
+        try:
+            _render_png(graph, positions, segments, edges, colors, output, title)
+            return output
+        except ImportError:
+            output = str(Path(output).with_suffix(".svg"))
+            logger.warning("PNG rendering requires matplotlib. Writing %s instead.", output)
+    _render_svg(graph, positions, segments, edges, colors, output, title)
+    return output
+
+def _render_svg(graph: PlanarGraph, positions: Dict[int, Point], segments: List[Tuple[int, int]],
+                edges: List[Tuple[int, int]], colors: Dict[int, str],
+                output: str, title: str) -> None:
+    regions = list(positions)
+    region_xs = [positions[r][0] for r in regions]
+    region_ys = [positions[r][1] for r in regions]
+    frame = _Frame(graph.x or region_xs, graph.y or region_ys)
+    points = frame.format(graph.x, graph.y)
+    centres = dict(zip(regions, frame.format(region_xs, region_ys)))
+    labelled = len(regions) <= MAX_LABELS
+    radius = 6 if labelled else 2
+
+    # Nodes grouped by colour: each group is a single path of circles
+    circle = f"m{-radius} 0a{radius} {radius} 0 1 0 {2 * radius} 0a{radius} {radius} 0 1 0 {-2 * radius} 0"
+    groups: Dict[str, List[str]] = {}
+    for r in regions:
+        groups.setdefault(colors.get(r, UNGROUPED_COLOR), []).append(f"M{centres[r]}{circle}")
+
+    lines = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{frame.width:.0f}" '
+             f'height="{frame.height:.0f}" viewBox="0 0 {frame.width:.1f} {frame.height:.1f}">',
+             f"<title>{_escape(title)}</title>",
+             '<rect width="100%" height="100%" fill="white"/>',
+             '<path d="%s" stroke="%s" stroke-width="1" fill="none"/>'
+             % ("".join([f"M{points[u]}L{points[v]}" for u, v in segments]), LINE_COLOR),
+             '<path d="%s" stroke="%s" stroke-width="0.8" fill="none"/>'
+             % ("".join([f"M{centres[a]}L{centres[b]}" for a, b in edges]), LINK_COLOR)]
+    lines.extend(f'<path d="{"".join(circles)}" fill="{color}" stroke="black" stroke-width="0.5"/>'
+                 for color, circles in groups.items())
+    if labelled:
+        lines.append('<g font-family="sans-serif" font-size="8" text-anchor="middle">')
+        for r in regions:
+            x, y = frame(positions[r])
+            lines.append(f'<text x="{x:.1f}" y="{y + 3:.1f}">{r}</text>')
+        lines.append("</g>")
+    lines.append("</svg>\n")
+
+    with open(output, "w") as f:
+        f.write("\n".join(lines))
+
+def _escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+def _render_png(graph: PlanarGraph, positions: Dict[int, Point], segments: List[Tuple[int, int]],
+                edges: List[Tuple[int, int]], colors: Dict[int, str],
+                output: str, title: str) -> None:
+    import matplotlib
+    matplotlib.use("Agg")  # no display needed
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import LineCollection
+
+    x, y = graph.x, graph.y
+    fig, ax = plt.subplots(figsize=(10, 10))
+    ax.add_collection(LineCollection([((x[u], y[u]), (x[v], y[v])) for u, v in segments],
+                                     colors=LINE_COLOR, linewidths=0.6))
+    ax.add_collection(LineCollection([(positions[a], positions[b]) for a, b in edges],
+                                     colors=LINK_COLOR, linewidths=0.5))
+    regions = list(positions)
+    labelled = len(regions) <= MAX_LABELS
+    ax.scatter([positions[r][0] for r in regions], [positions[r][1] for r in regions],
+               c=[colors.get(r, UNGROUPED_COLOR) for r in regions],
+               s=40 if labelled else 4, edgecolors="black", linewidths=0.3, zorder=3)
+    if labelled:
+        for r in regions:
+            ax.annotate(str(r), positions[r], ha="center", va="center", fontsize=6, zorder=4)
+    ax.autoscale()
+    ax.set_aspect("equal")
+    ax.set_axis_off()
+    ax.set_title(title)
+    fig.savefig(output, dpi=150, bbox_inches="tight")
+    plt.close(fig)
+
+def render_pipeline(pipeline, output: str) -> str:
+    """Render a SceneUnderstanding after run_pipeline"""
+    return render_scene(pipeline.scene, pipeline.bodies, pipeline.region_links, output)
+
+def main():
+    """Command line interface: analyze scenes and render them"""
+    import argparse
+    from scene_pipeline import SceneUnderstanding, configure_logging
+    from engines import ENGINE_PROFILES, engine_names
+    parser = argparse.ArgumentParser(description="Render analyzed scenes to SVG or PNG")
+    parser.add_argument('inputs', nargs='+', help='Scene files (.json or .scnb)')
+    parser.add_argument('--output', '-o', metavar='FILE', default=None,
+                       help='Output file (single input only; default: input name with .svg)')
+    parser.add_argument('--format', choices=[s.lstrip('.') for s in RENDER_FORMATS], default='svg',
+                       help='Format when --output is not given (default: svg)')
+    parser.add_argument('--engine', choices=ENGINE_PROFILES, default=None,
+                       help='Engine profile for all stages (default: reference); see engines.py')
+    parser.add_argument('--grouping', choices=engine_names("group"), default=None,
+                       help='Region grouping engine (default: from --engine)')
+    parser.add_argument('--classifier', choices=engine_names("classify"), default=None,
+                       help='Vertex classifier (default: from --engine)')
+    parser.add_argument('--linking', choices=engine_names("link"), default=None,
+                       help='Region linking engine (default: from --engine)')
+    args = parser.parse_args()
+    if args.output and len(args.inputs) > 1:
+        parser.error("--output needs a single input")
+
+    configure_logging(-1)
+    for path in args.inputs:
+        pipeline = SceneUnderstanding(path, engine=args.engine, grouping_engine=args.grouping,
+                                      classifier_engine=args.classifier,
+                                      link_engine=args.linking)
+        pipeline.run_pipeline()
+        output = args.output or str(Path(path).with_suffix(f".{args.format}"))
+        print(f"{path} -> {render_pipeline(pipeline, output)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Machine-readable results for scenes: JSON or NDJSON, written in bulk.
+
+A result record is a plain dict:
+    {"input": "one.json", "status": "ok",
+     "bodies": [[1, 2], [3, 4, 5]],
+     "links": [[1, 2, "A"], ...]}        # only when requested
+Failed scenes carry "status": "error" and an "error" message instead, plus
+the structured "issues" when they failed validation (scene_validation.py).
+Scenes grouped under a budget carry "complete": false when it ran out and
+the bodies are partial (true otherwise).
+"""
+import json
+import os
+import sys
+import tempfile
+from typing import Dict, IO, Iterable, List, Optional, Set, Tuple, Union
+
+RESULT_FORMATS = ("json", "ndjson")
+
+def scene_record(source: Optional[str], bodies: List[Set[int]],
+                 links: Optional[Iterable[Tuple[int, int, str]]] = None) -> Dict:
+    """Result record for a successfully analyzed scene"""
+    record = {
+        "input": source,
+        "status": "ok",
+        "bodies": [sorted(body) for body in bodies],
+    }
+    if links is not None:
+        record["links"] = [[r1, r2, via] for r1, r2, via in links]
+    return record
+
+def error_record(source: Optional[str], error: BaseException) -> Dict:
+    """Result record for a scene that failed, with validation issues if any"""
+    record = {"input": source, "status": "error",
+              "error": f"{type(error).__name__}: {error}"}
+    issues = getattr(error, "issues", None)
+    if issues:
+        record["issues"] = issues
+    return record
+
+def dumps_ndjson(records: Iterable[Dict]) -> str:
+    """One compact JSON document per line"""
+    return "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records)
+
+def write_results(records: Union[List[Dict], Dict], output: Union[str, IO, None] = None,
+                  fmt: str = "json") -> None:
+    """
+    Write records to a path or stream (default stdout) in a single write.
+
+    fmt="json" writes `records` as one indented document (a list or a batch
+    summary dict); fmt="ndjson" writes one line per record. A path is
+    written to a temporary name and renamed into place, so readers never
+    see a partial file.
+    """
+    if fmt == "ndjson":
+        if isinstance(records, dict):
+            records = records.get("results", [records])
+        text = dumps_ndjson(records)
+    elif fmt == "json":
+        text = json.dumps(records, indent=2) + "\n"
+    else:
+        raise ValueError(f"Unknown result format: {fmt}")
+
+    if output is None:
+        sys.stdout.write(text)
+    elif isinstance(output, str):
+        directory = os.path.dirname(os.path.abspath(output))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(text)
+            os.replace(tmp_path, output)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    else:
+        output.write(text)
+
+def test_write_results(tmp_path):
+    """JSON and NDJSON round-trip the records; a path is replaced whole, leaving no temporary file"""
+    records = [scene_record("a.json", [{3, 1}, {2}], [(1, 3, "V")]),
+               error_record("b.json", ValueError("bad"))]
+    assert records[0] == {"input": "a.json", "status": "ok", "bodies": [[1, 3], [2]],
+                          "links": [[1, 3, "V"]]}
+    assert records[1] == {"input": "b.json", "status": "error", "error": "ValueError: bad"}
+
+    path = str(tmp_path / "out.json")
+    write_results(records, path)
+    with open(path) as f:
+        assert json.load(f) == records
+    summary = {"scenes": 2, "results": records}
+    write_results(summary, path, "ndjson")
+    with open(path) as f:
+        assert [json.loads(line) for line in f] == records
+    assert os.listdir(tmp_path) == ["out.json"]
+
+    # A record that cannot be written leaves the previous file as it was
+    try:
+        write_results([{"input": object()}], path)
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("an unserialisable record was written")
+    with open(path) as f:
+        assert [json.loads(line) for line in f] == records
+    assert os.listdir(tmp_path) == ["out.json"]
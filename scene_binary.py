@@ -0,0 +1,330 @@
+"""
+Compact columnar scene format (.scnb) with memory-mapped loading.
+
+The JSON input keeps string vertex ids and mixes neighbour ids with region
+numbers in each KIND list, so every stage re-parses strings and sorts the
+two apart with isinstance checks. The binary format stores the same scene
+as flat little-endian arrays, each starting on an 8-byte boundary:
+
+    header          magic b"SCNB", version, flags, vertex / neighbour /
+                    region / id-byte counts, background
+    coords          float64[2 * vertices]        x0, y0, x1, y1, ...
+    neighbor_offsets int64[vertices + 1]          CSR over `neighbors`
+    neighbors       int32[neighbor entries]      KIND-list neighbours as vertex indices
+    region_offsets  int64[vertices + 1]          CSR over `regions`
+    regions         int32[region entries]        KIND-list regions in order
+    id_offsets      int64[vertices + 1]          CSR over the id bytes
+    ids             UTF-8 vertex ids, interned once per vertex
+
+A KIND list [n0, r0, n1, r1, ..., n0] is its neighbour row interleaved
+with its region row, so region k lies between neighbours k and k + 1.
+Lists that do not alternate this way cannot be stored.
+
+load_binary maps the file and exposes the arrays as memoryviews without
+copying; analyze_vertices and link_regions run on them directly.
+
+Usage:
+    python3 scene_binary.py cube.json one.json      # writes cube.scnb, one.scnb
+    python3 scene_pipeline.py cube.scnb
+"""
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+from take_input import Scene, as_scene
+
+logger = logging.getLogger(__name__)
+
+BINARY_SUFFIX = ".scnb"
+MAGIC = b"SCNB"
+VERSION = 1
+HAS_BACKGROUND = 1  # header flag
+
+# magic, version, flags, vertices, neighbour entries, region entries, id bytes, background
+HEADER = struct.Struct("<4sHHqqqqq")
+
+def _padding(size: int) -> int:
+    return -size % 8
+
+def _encode(vertex_ids: List[str], vertices: Iterator[tuple], background: Optional[int]) -> bytes:
+    """Columnar layout for (vertex id, coords, KIND list) in vertex_ids order"""
+    index = {vid: i for i, vid in enumerate(vertex_ids)}
+    coords = array("d")
+    neighbor_offsets, neighbors = array("q", [0]), array("i")
+    region_offsets, regions = array("q", [0]), array("i")
+    id_offsets, ids = array("q", [0]), bytearray()
+
+    lookup = index.__getitem__
+    for vid, xy, kind in vertices:
+        coords.extend(xy)
+        # Ids are strings and regions ints, so a list that does not alternate
+        # fails one of these two bulk conversions
+        try:
+            neighbors.extend(map(lookup, kind[0::2]))
+            regions.extend(kind[1::2])
+        except (KeyError, TypeError) as e:
+            if isinstance(e, KeyError) and isinstance(e.args[0], str):
+                raise ValueError(f"Vertex {vid}: unknown neighbour {e.args[0]}") from None
+            raise ValueError(f"Vertex {vid}: KIND list does not alternate neighbours and regions") from None
+        neighbor_offsets.append(len(neighbors))
+        region_offsets.append(len(regions))
+        ids += vid.encode("utf-8")
+        id_offsets.append(len(ids))
+
+    header = HEADER.pack(MAGIC, VERSION, HAS_BACKGROUND if background is not None else 0,
+                         len(vertex_ids), len(neighbors), len(regions), len(ids),
+                         background if background is not None else 0)
+    out = bytearray(header)
+    for column in (coords, neighbor_offsets, neighbors, region_offsets, regions, id_offsets):
+        if sys.byteorder != "little":
+            column.byteswap()
+        out += column.tobytes()
+        out += bytes(_padding(len(out)))
+    out += ids
+    return bytes(out)
+
+def encode_scene(scene: Scene) -> bytes:
+    """Serialise a parsed Scene into the columnar layout"""
+    coords, kind_lists = scene.coords, scene.kind_lists
+    return _encode(scene.vertex_ids, ((vid, coords[vid], kind_lists[vid]) for vid in scene.vertex_ids),
+                   scene.background)
+
+def encode_data(data: dict) -> bytes:
+    """
+    Serialise raw input-file data without building a Scene first. Data that
+    Scene() would not parse the same way (missing keys, duplicate ids,
+    coordinates that are not two numbers) raises ValueError.
+    """
+    try:
+        vertices = data["vertex-data"]
+        rows = [(v["id"], v["coords"], v["kind-list"]) for v in vertices]
+        background = data.get("background")
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"Malformed vertex-data ({type(e).__name__}: {e})") from None
+    ids = [vid for vid, _, _ in rows]
+    if len(set(ids)) != len(ids) or not all(isinstance(vid, str) for vid in ids):
+        raise ValueError("Vertex ids are not unique strings")
+    if not all(type(xy) is list and len(xy) == 2 and type(xy[0]) in (int, float)
+               and type(xy[1]) in (int, float) for _, xy, _ in rows):
+        raise ValueError("Vertex coords are not [x, y] number pairs")
+    if background is not None and (type(background) is not int):
+        raise ValueError(f"Background {background!r} is not a region number")
+    return _encode(ids, iter(rows), background)
+
+def write_binary(source: Union[str, Scene], output: str) -> str:
+    """Convert a scene (or JSON file) to a .scnb file, written atomically"""
+    data = encode_scene(as_scene(source))
+    directory = os.path.dirname(os.path.abspath(output))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, output)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return output
+
+class _VertexView(Mapping):
+    """Read-only {vertex id: value} view computed from the arrays on access"""
+    def __init__(self, scene: "BinaryScene", getter):
+        self._scene = scene
+        self._getter = getter
+
+    def __getitem__(self, vid: str):
+        return self._getter(self._scene.index[vid])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._scene.vertex_ids)
+
+    def __len__(self) -> int:
+        return self._scene.vertex_count
+
+    def __contains__(self, vid) -> bool:
+        return vid in self._scene.index
+
+class BinaryScene:
+    """
+    A .scnb scene over a buffer (normally a read-only mmap).
+
+    The arrays are memoryviews into the buffer. coords, kind_lists and
+    regions are Scene-compatible views rebuilt per vertex on access, so code
+    written for Scene keeps working; the hot paths use the arrays instead.
+    """
+    def __init__(self, buffer, source: Optional[str] = None):
+        self.source = source
+        self._buffer = buffer
+        view = memoryview(buffer)
+        if len(view) < HEADER.size:
+            raise ValueError(f"{source or 'buffer'}: too short for a scene")
+        magic, version, flags, vertices, neighbor_count, region_count, id_bytes, background = \
+            HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError(f"{source or 'buffer'}: not a binary scene")
+        if version != VERSION:
+            raise ValueError(f"{source or 'buffer'}: unsupported version {version}")
+        self.vertex_count = vertices
+        self.background = background if flags & HAS_BACKGROUND else None
+        # {vertex: [(region, sector_degrees), ...]} counter-clockwise; filled by analyze_vertices
+        self.angular_table: Optional[Dict[str, List[tuple]]] = None
+        self.graph = None  # PlanarGraph, built on first use by planar_graph.planar_graph
+
+        offset = HEADER.size
+        columns = []
+        for fmt, count in (("d", 2 * vertices), ("q", vertices + 1), ("i", neighbor_count),
+                           ("q", vertices + 1), ("i", region_count), ("q", vertices + 1)):
+            size = count * struct.calcsize(fmt)
+            if offset + size > len(view):
+                raise ValueError(f"{source or 'buffer'}: truncated")
+            columns.append(self._column(view, offset, size, fmt))
+            offset += size + _padding(size)
+        if offset + id_bytes > len(view):
+            raise ValueError(f"{source or 'buffer'}: truncated")
+        (self.xy, self.neighbor_offsets, self.neighbors,
+         self.region_offsets, self.region_values, self._id_offsets) = columns
+        self._ids = view[offset:offset + id_bytes]
+        self._views = columns + [self._ids, view]
+        self._vertex_ids: Optional[List[str]] = None
+        self._index: Optional[Dict[str, int]] = None
+
+        self.coords = _VertexView(self, lambda i: [self.xy[2 * i], self.xy[2 * i + 1]])
+        self.kind_lists = _VertexView(self, self.kind_list)
+        self.regions = _VertexView(self, lambda i: self.regions_of(i).tolist())
+
+    @staticmethod
+    def _column(view: memoryview, offset: int, size: int, fmt: str):
+        column = view[offset:offset + size]
+        if sys.byteorder == "little":
+            return column.cast(fmt)
+        swapped = array(fmt, column.tobytes())  # big-endian hosts pay for a copy
+        swapped.byteswap()
+        return memoryview(swapped)
+
+    @property
+    def vertex_ids(self) -> List[str]:
+        """Vertex ids in file order, decoded on first use"""
+        if self._vertex_ids is None:
+            ids, offsets = bytes(self._ids), self._id_offsets
+            self._vertex_ids = [ids[offsets[i]:offsets[i + 1]].decode("utf-8")
+                                for i in range(self.vertex_count)]
+        return self._vertex_ids
+
+    @property
+    def index(self) -> Dict[str, int]:
+        """{vertex id: position in the arrays}"""
+        if self._index is None:
+            self._index = {vid: i for i, vid in enumerate(self.vertex_ids)}
+        return self._index
+
+    @property
+    def name(self) -> str:
+        """Short name used in banners and plot titles"""
+        return Path(self.source).stem if self.source else "scene"
+
+    def neighbors_of(self, i: int) -> memoryview:
+        """KIND-list neighbours of vertex i as vertex indices, without copying"""
+        return self.neighbors[self.neighbor_offsets[i]:self.neighbor_offsets[i + 1]]
+
+    def regions_of(self, i: int) -> memoryview:
+        """KIND-list regions of vertex i, without copying"""
+        return self.region_values[self.region_offsets[i]:self.region_offsets[i + 1]]
+
+    def kind_list(self, i: int) -> list:
+        """Vertex i's KIND list in input-file form"""
+        ids = self.vertex_ids
+        kind = []
+        regions = self.regions_of(i)
+        for k, n in enumerate(self.neighbors_of(i)):
+            kind.append(ids[n])
+            if k < len(regions):
+                kind.append(regions[k])
+        return kind
+
+    def to_data(self) -> dict:
+        """The scene in input-file form"""
+        return {
+            "vertex-data": [{"id": vid, "coords": self.coords[vid], "kind-list": self.kind_list(i)}
+                            for i, vid in enumerate(self.vertex_ids)],
+            "background": self.background,
+        }
+
+    def to_scene(self) -> Scene:
+        """An editable Scene with the same content (and angular table, if any)"""
+        scene = Scene(self.to_data(), source=self.source)
+        if self.angular_table is not None:
+            scene.angular_table = dict(self.angular_table)
+        return scene
+
+    def close(self) -> None:
+        """Release the arrays and unmap the file"""
+        for view in self._views:
+            view.release()
+        self._views = []
+        if isinstance(self._buffer, mmap.mmap):
+            try:
+                self._buffer.close()
+            except BufferError:
+                pass  # a caller still holds a slice; unmapped when it is dropped
+
+    def __enter__(self) -> "BinaryScene":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def load_binary(filename: str) -> BinaryScene:
+    """Memory-map a .scnb file"""
+    logger.debug("Mapping %s...", filename)
+    with open(filename, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return BinaryScene(buffer, source=filename)
+
+def is_binary_path(filename) -> bool:
+    return str(filename).endswith(BINARY_SUFFIX)
+
+def test_round_trip(tmp_path):
+    """.scnb files and in-memory encodings read back as the JSON scene they came from"""
+    import json
+    from take_input import load_scene
+    from vertex_analysis import analyze_vertices
+    for name in ("cube.json", "one.json"):
+        path = str(Path(__file__).parent / name)
+        scene = load_scene(path)
+        output = write_binary(path, str(tmp_path / (Path(name).stem + BINARY_SUFFIX)))
+        with open(path) as f:
+            encoded = BinaryScene(encode_data(json.load(f)))
+        for binary in (load_binary(output), encoded):
+            with binary:
+                assert binary.vertex_ids == scene.vertex_ids
+                assert binary.background == scene.background
+                assert binary.to_data() == scene.to_data()
+                assert {vid: binary.regions[vid] for vid in binary.vertex_ids} == scene.regions
+                assert analyze_vertices(binary) == analyze_vertices(load_scene(path))
+        assert load_scene(output).to_data() == scene.to_data()
+
+def main():
+    """Command line converter from JSON scenes to .scnb"""
+    import argparse
+    parser = argparse.ArgumentParser(description="Convert JSON scenes to the binary scene format")
+    parser.add_argument('inputs', nargs='+', help='Input JSON files')
+    parser.add_argument('--output', '-o', metavar='FILE', default=None,
+                       help='Output file (single input only; default: input name with .scnb)')
+    args = parser.parse_args()
+    if args.output and len(args.inputs) > 1:
+        parser.error("--output needs a single input")
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    for path in args.inputs:
+        output = args.output or str(Path(path).with_suffix(BINARY_SUFFIX))
+        write_binary(path, output)
+        logger.info("%s -> %s (%d bytes)", path, output, os.path.getsize(output))
+
+if __name__ == "__main__":
+    main()
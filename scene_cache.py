@@ -0,0 +1,192 @@
+"""
+Content-addressed on-disk cache for pipeline results.
+
+A scene's key is the SHA-256 of its normalised content (vertex ids, float
+coordinates and KIND lists in file order, plus the background) together
+with ALGORITHM_VERSION and the run's options: the engine of each stage
+(which covers the profile), the grouping budget and the validate flag.
+Formatting, key order and int/float spelling in the input file do not
+change the key; anything that can change a result does. Runs cut short by
+their budget are never stored.
+
+Each key is one small JSON file holding whichever stage outputs are known:
+
+    {"classify": {"A": "L", ...},
+     "link": {"links": [[1, 2, "B"], ...], "duplicates": 0},
+     "group": [[1, 2, 3], ...]}
+
+so a repeated scene costs one hash and one read. Files are written to a
+temporary name and renamed into place, so concurrent writers (batch
+workers) never expose a torn entry. Reads refresh the file's mtime and
+eviction drops the least recently used entries until the cache fits its
+byte and entry limits.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+from take_input import Scene
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever a change alters any stage's output for the same scene
+ALGORITHM_VERSION = "2"
+
+CACHE_STAGES = ("classify", "link", "group")
+
+def scene_key(scene: Scene, version: str = ALGORITHM_VERSION,
+              options: Optional[Dict] = None) -> str:
+    """
+    Hex digest identifying the scene's content, the algorithm version and
+    the run options (JSON-serialisable, e.g. {"engines": ..., "budget": ...})
+    """
+    normalised = [
+        version,
+        options or {},
+        scene.background,
+        [[vid, [float(c) for c in scene.coords[vid]], scene.kind_lists[vid]]
+         for vid in scene.vertex_ids],
+    ]
+    text = json.dumps(normalised, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class SceneCache:
+    """Size-bounded LRU cache of per-stage results, one file per scene"""
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024,
+                 max_entries: int = 100000, evict_every: int = 64):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.evict_every = evict_every  # writes between eviction sweeps
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, key: str) -> str:
+        """Entries are sharded by the first two hex digits"""
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Cached stage outputs for key, or None"""
+        path = self.path_for(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Discarding unreadable cache entry %s: %s", path, e)
+            self._remove(path)
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, entry: Dict) -> None:
+        """Atomically store the stage outputs for key"""
+        path = self.path_for(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry, f, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+        self._writes += 1
+        if self._writes % self.evict_every == 0:
+            self.evict()
+
+    def entries(self) -> List[Tuple[float, int, str]]:
+        """(mtime, size, path) for every entry"""
+        found = []
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for item in os.scandir(shard.path):
+                if not item.name.endswith(".json"):
+                    continue
+                try:
+                    stat = item.stat()
+                except FileNotFoundError:
+                    continue  # evicted by another process meanwhile
+                found.append((stat.st_mtime, stat.st_size, item.path))
+        return found
+
+    def evict(self) -> int:
+        """Drop least recently used entries until within limits; return the number removed"""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        count = len(entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes and count <= self.max_entries:
+                break
+            self._remove(path)
+            total -= size
+            count -= 1
+            removed += 1
+        if removed:
+            logger.debug("Evicted %d cache entries from %s", removed, self.directory)
+        return removed
+
+    def clear(self) -> None:
+        """Remove every entry"""
+        for _, _, path in self.entries():
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+def test_scene_cache(tmp_path):
+    """Hits give the same results; other options miss; partial runs and old entries go"""
+    import json
+    from scene_pipeline import SceneUnderstanding
+    from synthetic_scenes import generate_scene
+    text = json.dumps(generate_scene(num_regions=60, seed=3))
+    cache = SceneCache(str(tmp_path / "cache"))
+
+    def run(**options):
+        pipeline = SceneUnderstanding(Scene(json.loads(text)), cache=cache, **options)
+        pipeline.run_pipeline()
+        return pipeline
+
+    first = run()
+    again = run()
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert again.vertex_types == first.vertex_types and again.region_links == first.region_links
+    assert again.bodies == first.bodies
+
+    # Other engines, a budget or validation make another entry
+    for options in ({"engine": "fast"}, {"budget_steps": 10 ** 9}, {"validate": True}):
+        run(**options)
+        assert cache.hits == 1, options
+    assert len(cache.entries()) == 4
+
+    # A run stopped by its budget stores nothing
+    assert not run(budget_steps=5).complete
+    assert len(cache.entries()) == 4
+    assert run(budget_steps=5).complete is False and cache.hits == 1
+
+    # Eviction drops the least recently used entries first
+    entries = sorted(cache.entries())
+    for age, (_, _, path) in enumerate(entries):
+        os.utime(path, (1000 + age, 1000 + age))
+    cache.max_entries = 2
+    assert cache.evict() == 2
+    assert sorted(path for _, _, path in cache.entries()) == sorted(path for _, _, path in entries[2:])
@@ -1,58 +1,396 @@
 import json
+import logging
 import sys
+from collections import Counter
+from contextlib import nullcontext
 from pathlib import Path
-from typing import Dict, List, Set, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
-from vertex_analysis import analyze_vertices, write_analysis
-from region_linking import link_regions, get_vertex_regions
-from region_grouping import group_regions, format_body_output
+from take_input import Scene, as_scene, get_data
+from vertex_analysis import (analyze_vertices, build_angular_table, classify_vertex,
+                             get_neighbors, write_analysis)
+from region_linking import LinkIndex, vertex_links
+from region_grouping import GroupingBudget, group_regions, render_body_output
+from engines import ENGINE_PROFILES, engine_names, get_engine, resolve_engines
+from result_writer import RESULT_FORMATS, error_record, scene_record, write_results
+from profiling import Hook, SceneProfile, render_profile
+from scene_cache import SceneCache, scene_key
+from scene_binary import is_binary_path
+from scene_validation import SceneValidationError, ValidationReport, check_scene
+
+logger = logging.getLogger(__name__)
+
+def configure_logging(verbosity: int = 0, stream=None) -> None:
+    """
+    Route pipeline logging to `stream` (default stdout).
+
+    verbosity -1: warnings only, 0: stage progress and results,
+    1: per-vertex and per-merge detail.
+    """
+    level = {-1: logging.WARNING, 0: logging.INFO}.get(verbosity, logging.DEBUG)
+    logging.basicConfig(level=level, format="%(message)s",
+                        stream=stream or sys.stdout, force=True)
 
 class SceneUnderstanding:
     """Pipeline for scene understanding process"""
-    def __init__(self, input_file: str = "cube.json"):
+    def __init__(self, input_file: Union[str, Scene] = "cube.json",
+                 artifact_dir: Optional[str] = None,
+                 grouping_engine: Optional[str] = None,
+                 classifier_engine: Optional[str] = None,
+                 profile: bool = False,
+                 hooks: Optional[List[Hook]] = None,
+                 cache: Optional[SceneCache] = None,
+                 split_components: bool = False,
+                 group_workers: Optional[int] = None,
+                 validate: bool = False,
+                 engine: Optional[str] = None,
+                 link_engine: Optional[str] = None,
+                 budget: Optional[float] = None,
+                 budget_steps: Optional[int] = None):
         self.input_file = input_file
+        # Stage engines (engines.py): the `engine` profile, overridden per stage
+        engines = resolve_engines(engine, classify=classifier_engine, link=link_engine,
+                                  group=grouping_engine)
+        self.classifier_engine = engines["classify"]
+        self.link_engine = engines["link"]
+        self.grouping_engine = engines["group"]
+        # Group connected components separately, optionally in worker processes
+        self.split_components = split_components
+        self.group_workers = group_workers
+        # Grouping limits (seconds, work steps); past them bodies are partial
+        self.budget = budget
+        self.budget_steps = budget_steps
+        self.complete = True  # False when the last grouping ran out of budget
+        self.artifact_dir = artifact_dir  # opt-in: write intermediate results here
+        self.scene: Optional[Scene] = None
         self.background = None
         self.vertex_types = {}
         self.region_links = []
+        self.link_index = None
         self.bodies = []
+        # Timings and counters for the last run; hooks imply profiling
+        self.profiling = profile or bool(hooks)
+        self.hooks = list(hooks or [])
+        self.profile: Optional[SceneProfile] = None
+        self.cache = cache  # reuse stage outputs of identical scenes
+        # Reject inconsistent input before any stage runs
+        self.validate = validate
+        self.validation: Optional[ValidationReport] = None
+        # Built on the first apply_edits: {vertex: vertices listing it}, {vertex: linked pairs}
+        self._referrers: Optional[Dict[str, Set[str]]] = None
+        self._vertex_pairs: Optional[Dict[str, List[Tuple[int, int]]]] = None
+
+    @classmethod
+    def run_many(cls, inputs: Iterable[str], prefetch: int = 8, read_concurrency: int = 4,
+                 **options) -> Iterator[Tuple[str, Union["SceneUnderstanding", Exception]]]:
+        """
+        Run the pipeline over many scene files in turn, reading the next ones
+        in the background while the current one is analyzed (async_loader).
+
+        Yields (path, pipeline) after each run, or (path, exception) for a
+        scene that failed to load or analyze. options go to the constructor.
+        """
+        from async_loader import prefetch_scenes
+        for path, scene in prefetch_scenes(inputs, depth=prefetch, concurrency=read_concurrency):
+            if isinstance(scene, Exception):
+                yield path, scene
+                continue
+            pipeline = cls(scene, **options)
+            try:
+                pipeline.run_pipeline()
+            except Exception as e:
+                yield path, e
+                continue
+            yield path, pipeline
+
+    def _stage(self, name: str):
+        """Profile the enclosed stage when profiling is on"""
+        return self.profile.stage(name) if self.profile else nullcontext()
 
     def run_pipeline(self, visualize: bool = False) -> None:
         """Execute full scene analysis pipeline"""
-        print(f"\nProcessing {self.input_file}...")
-        print("=" * 50)
+        self.profile = SceneProfile(hooks=self.hooks) if self.profiling else None
+        self._referrers = self._vertex_pairs = None
+
+        # Parse once; every stage below shares the same Scene
+        self._parse()
+        self.background = self.scene.background
+        if self.profile:
+            self.profile.source = self.scene.source or self.scene.name
+
+        # Stage outputs already known for this exact scene content
+        cached, key = {}, None
+        if self.cache:
+            with self._stage("cache"):
+                key = scene_key(self.scene, options=self._cache_options())
+                cached = self.cache.get(key) or {}
+        stored = dict(cached)
+
+        logger.info("\nProcessing %s...\n%s", self.scene.source or self.scene.name, "=" * 50)
 
         # Vertex Analysis
-        print("\n Analyzing vertices...")
-        self.vertex_types = analyze_vertices(self.input_file)
-        write_analysis(self.vertex_types)
-        print("✓ Vertex analysis complete")
+        logger.info("\n Analyzing vertices...")
+        if "classify" in cached:
+            self.vertex_types = cached["classify"]
+        else:
+            with self._stage("classify"):
+                self.vertex_types = analyze_vertices(self.scene, engine=self.classifier_engine)
+            stored["classify"] = self.vertex_types
+        if self.profile:
+            self.profile.update({f"junction_{vtype}": count for vtype, count
+                                 in Counter(self.vertex_types.values()).items()})
+        if self.artifact_dir:
+            self.write_artifacts()
+        logger.info("✓ Vertex analysis complete%s", " (cached)" if "classify" in cached else "")
 
         # Region Linking
-        print("\n Linking regions...")
-        regions = get_vertex_regions(self.input_file)
-        self.region_links = link_regions(
-            self.vertex_types, 
-            regions,
-            input_file=self.input_file
-        )
-        print("✓ Region linking complete")
+        logger.info("\n Linking regions...")
+        if "link" in cached:
+            self.link_index = LinkIndex(self.background)
+            for r1, r2, via in cached["link"]["links"]:
+                self.link_index.add(r1, r2, via)
+            self.link_index.duplicates = cached["link"]["duplicates"]
+        else:
+            with self._stage("link"):
+                self.link_index = get_engine("link", self.link_engine)(self.vertex_types, self.scene)
+            stored["link"] = {"links": self.link_index.links,
+                              "duplicates": self.link_index.duplicates}
+        self.region_links = self.link_index.links
+        if self.profile:
+            self.profile.update({"links_created": len(self.link_index),
+                                 "links_duplicate": self.link_index.duplicates})
+        logger.info("✓ Region linking complete%s", " (cached)" if "link" in cached else "")
 
         # Region Grouping and Output
-        print("\n Grouping regions and generating output...")
-        with open(self.input_file) as f:
-            self.background = json.load(f)["background"]
-        self.bodies = group_regions(self.region_links, self.background)
-        format_body_output(self.bodies)
-        print("✓ Region grouping complete")
+        logger.info("\n Grouping regions and generating output...")
+        self.complete = True
+        if "group" in cached:
+            self.bodies = [set(body) for body in cached["group"]]
+        else:
+            budget = None
+            if self.budget is not None or self.budget_steps is not None:
+                budget = GroupingBudget(self.budget, self.budget_steps)
+            with self._stage("group"):
+                self.bodies = group_regions(self.link_index, self.background,
+                                            engine=self.grouping_engine,
+                                            stats=self.profile.counters if self.profile else None,
+                                            split=self.split_components,
+                                            workers=self.group_workers,
+                                            budget=budget)
+            if budget is not None and budget.exhausted:
+                self.complete = False
+                logger.warning("%s: grouping budget ran out after %d steps; bodies are partial",
+                               self.scene.source or self.scene.name, budget.steps)
+            else:
+                stored["group"] = [sorted(body) for body in self.bodies]
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("\n%s", render_body_output(self.bodies))
+        logger.info("✓ Region grouping %s%s", "complete" if self.complete else "stopped by its budget",
+                    " (cached)" if "group" in cached else "")
+
+        if self.cache:
+            if self.profile:
+                self.profile.update({"cache_hits": len(cached), "cache_misses": len(stored) - len(cached)})
+            # A partial run stores nothing, not even its complete earlier stages
+            if self.complete and len(stored) > len(cached):
+                with self._stage("cache"):
+                    self.cache.put(key, stored)
+
+        if self.profile and logger.isEnabledFor(logging.INFO):
+            logger.info("\n%s", render_profile(self.profile.to_dict()))
 
         if visualize:
             self.visualize_results()
 
+    def _cache_options(self) -> Dict:
+        """The options that go into the cache key next to the scene content"""
+        return {"engines": [self.classifier_engine, self.link_engine, self.grouping_engine],
+                "budget": self.budget, "budget_steps": self.budget_steps,
+                "validate": self.validate}
+
+    def _parse(self) -> None:
+        """Parse the input, checking it with scene_validation first when asked"""
+        source = self.input_file
+        if not self.validate:
+            with self._stage("parse"):
+                self.scene = as_scene(source)
+            return
+        name = None
+        with self._stage("parse"):
+            # Read JSON files raw, so validation sees what Scene() would trip over
+            if isinstance(source, (str, Path)) and not is_binary_path(source):
+                name, source = str(source), get_data(source)
+        with self._stage("validate"):
+            self.validation = check_scene(source, name)
+        if self.profile:
+            self.profile.update({"validation_warnings": len(self.validation.warnings)})
+        with self._stage("parse"):
+            self.scene = Scene(source, source=name) if isinstance(source, dict) else as_scene(source)
+
+    def apply_edits(self, edits: List[Dict]) -> List[Set[int]]:
+        """
+        Apply vertex edits to the analyzed scene and bring the results up to date.
+
+        Each edit is a dict:
+            {"op": "move",   "id": "A", "coords": [x, y]}
+            {"op": "update", "id": "A", "kind-list": [...]}   (coords optional)
+            {"op": "add",    "id": "X", "coords": [x, y], "kind-list": [...]}
+            {"op": "remove", "id": "A"}
+        Only the edited vertices and the vertices listing them as neighbours
+        are reclassified. Only their links are recomputed, and only the
+        connected components of the region graph that those links touch are
+        regrouped. The results equal run_pipeline on the edited scene.
+        Returns the new bodies.
+        """
+        if self.scene is None:
+            raise RuntimeError("run_pipeline must run before apply_edits")
+        if not isinstance(self.scene, Scene):
+            # A memory-mapped BinaryScene is read-only; edit a parsed copy
+            self.scene = self.scene.to_scene()
+        scene = self.scene
+        self.profile = SceneProfile(scene.source or scene.name, self.hooks) if self.profiling else None
+        referrers, pairs = self._incremental_state()
+
+        # Apply the edits; every vertex whose neighbourhood changed is touched
+        touched: Set[str] = set()
+        for edit in edits:
+            op, vid = edit.get("op"), edit.get("id")
+            if op == "add":
+                if vid in scene.coords:
+                    raise ValueError(f"Vertex {vid} already exists")
+                scene.set_vertex(vid, edit["coords"], edit["kind-list"])
+                self._index_neighbors(vid, add=True)
+                touched |= referrers.get(vid, set())
+            elif op in ("move", "update", "remove"):
+                if vid not in scene.coords:
+                    raise KeyError(f"Unknown vertex: {vid}")
+                if op == "move":
+                    scene.set_vertex(vid, edit["coords"], scene.kind_lists[vid])
+                    touched |= referrers.get(vid, set())
+                elif op == "update":
+                    if "coords" in edit:
+                        touched |= referrers.get(vid, set())
+                    self._index_neighbors(vid, add=False)
+                    scene.set_vertex(vid, edit.get("coords", scene.coords[vid]), edit["kind-list"])
+                    self._index_neighbors(vid, add=True)
+                else:
+                    self._index_neighbors(vid, add=False)
+                    scene.remove_vertex(vid)
+                    touched |= referrers.get(vid, set())
+            else:
+                raise ValueError(f"Unknown edit op: {op}")
+            touched.add(vid)
+
+        # Reclassify touched vertices and recompute the pairs they link
+        affected: Set[int] = set()
+        with self._stage("classify"):
+            types = self.vertex_types
+            before = set(types)
+            for vid in touched:
+                affected.update(r for pair in pairs.pop(vid, ()) for r in pair)
+                if vid not in scene.coords:
+                    types.pop(vid, None)
+                    continue
+                label, scene.angular_table[vid] = classify_vertex(scene, vid)
+                if label is None:
+                    types.pop(vid, None)
+                    continue
+                types[vid] = label
+                pairs[vid] = vertex_links(label, scene.regions[vid], scene.angular_table[vid])
+                affected.update(r for pair in pairs[vid] for r in pair)
+            if set(types) != before:
+                # Keep classifications in scene order, as a full run returns them
+                self.vertex_types = {vid: types[vid] for vid in scene.vertex_ids if vid in types}
+
+        # Links come out in vertex order, exactly as build_link_index adds them
+        with self._stage("link"):
+            index = LinkIndex(scene.background)
+            for vid in self.vertex_types:
+                for r1, r2 in pairs.get(vid, ()):
+                    index.add(r1, r2, vid)
+        self.link_index = index
+        self.region_links = index.links
+
+        # Regroup the components holding affected regions; keep every other body.
+        # Bodies cut short by a budget are all regrouped, without a budget.
+        if not self.complete:
+            affected.update(index.regions)
+            self.complete = True
+        with self._stage("group"):
+            component = set()
+            frontier = [r for r in affected if r in index.regions]
+            while frontier:
+                region = frontier.pop()
+                if region in component:
+                    continue
+                component.add(region)
+                frontier.extend(index.neighbors(region))
+            kept = [body for body in self.bodies if not (body & affected or body & component)]
+            sub_links = [link for link in index.links if link[0] in component]
+            regrouped = group_regions(sub_links, scene.background, engine=self.grouping_engine,
+                                      stats=self.profile.counters if self.profile else None)
+            rank = {region: i for i, region in enumerate(index.regions)}
+            self.bodies = sorted(kept + regrouped, key=lambda body: min(rank[r] for r in body))
+
+        if self.profile:
+            self.profile.update({"vertices_reclassified": len(touched),
+                                 "regions_regrouped": len(component)})
+        logger.info("✓ Applied %d edit(s): %d vertices reclassified, %d regions regrouped",
+                    len(edits), len(touched), len(component))
+        # A later run_pipeline starts from the edited scene, not the original file
+        self.input_file = scene
+        return self.bodies
+
+    def _incremental_state(self) -> Tuple[Dict[str, Set[str]], Dict[str, List[Tuple[int, int]]]]:
+        """Neighbour back-references and per-vertex link pairs for apply_edits"""
+        if self._referrers is None:
+            scene = self.scene
+            if scene.angular_table is None:
+                build_angular_table(scene)
+            self._referrers = {}
+            for vid in scene.vertex_ids:
+                self._index_neighbors(vid, add=True)
+            table = scene.angular_table
+            self._vertex_pairs = {vid: vertex_links(vtype, scene.regions[vid], table.get(vid))
+                                  for vid, vtype in self.vertex_types.items()}
+        return self._referrers, self._vertex_pairs
+
+    def _index_neighbors(self, vid: str, add: bool) -> None:
+        """Add or drop vid from the back-references of the vertices it lists"""
+        for n in get_neighbors(self.scene.kind_lists[vid]):
+            if add:
+                self._referrers.setdefault(n, set()).add(vid)
+            else:
+                self._referrers.get(n, set()).discard(vid)
+
+    def result_record(self, include_links: bool = False) -> Dict:
+        """Bodies (and optionally links) as a JSON-ready record, plus the profile if any"""
+        record = scene_record(self.scene.source if self.scene else None, self.bodies,
+                              self.region_links if include_links else None)
+        if self.budget is not None or self.budget_steps is not None:
+            record["complete"] = self.complete
+        if self.profile:
+            record["profile"] = self.profile.to_dict()
+        return record
+
+    def write_artifacts(self) -> str:
+        """Write vertex classifications to `<artifact_dir>/<scene>.vertex_analysis.json`"""
+        Path(self.artifact_dir).mkdir(parents=True, exist_ok=True)
+        output_file = str(Path(self.artifact_dir) / f"{self.scene.name}.vertex_analysis.json")
+        write_analysis(self.vertex_types, output_file)
+        return output_file
+
+    def render(self, output: str) -> str:
+        """Write the analyzed scene to an SVG or PNG file without a display (see render.py)"""
+        from render import render_scene
+        return render_scene(self.scene, self.bodies, self.region_links, output)
+
     def visualize_results(self) -> None:
         """Generate visualizations if networkx is available"""
         try:
             import networkx as nx
             import matplotlib.pyplot as plt
+            from render import body_colors, region_positions
 
             # Create graph
             G = nx.Graph()
@@ -60,22 +398,78 @@ class SceneUnderstanding:
                 if r1 != self.background and r2 != self.background:
                     G.add_edge(r1, r2, label=via)
 
-            # Draw graph
+            # Draw graph at region centroids in the drawing; no force layout
             plt.figure(figsize=(10, 8))
-            pos = nx.spring_layout(G)
-            nx.draw(G, pos, with_labels=True, node_color='lightblue',
+            pos = region_positions(self.scene, self.background)
+            colors = body_colors(self.bodies)
+            nx.draw(G, pos, with_labels=True,
+                   node_color=[colors.get(r, 'lightblue') for r in G.nodes],
                    font_weight='bold', node_size=1000)
 
             # Add edge labels
             edge_labels = nx.get_edge_attributes(G, 'label')
             nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels)
 
-            plt.title(f"Region Connections - {Path(self.input_file).stem}")
+            plt.title(f"Region Connections - {self.scene.name}")
             plt.show()
 
         except ImportError:
-            print("\n  Visualization requires networkx and matplotlib")
-            print("   Install with: pip install networkx matplotlib")
+            logger.warning("Visualization requires networkx and matplotlib\n"
+                           "   Install with: pip install networkx matplotlib")
+
+def test_incremental_matches_full_run():
+    """Fuzz: apply_edits gives what run_pipeline gives on the edited scene"""
+    import random
+    from synthetic_scenes import LAYOUTS, generate_scene
+
+    def swap(kind, old, new):
+        return [new if x == old else x for x in kind]
+
+    def random_edit(scene, rnd):
+        vid = rnd.choice(scene.vertex_ids)
+        kind = scene.kind_lists[vid]
+        op = rnd.choice(["move", "update", "add", "remove"])
+        if op == "move":
+            x, y = scene.coords[vid]
+            return [{"op": "move", "id": vid, "coords": [x + rnd.uniform(-4, 4), y + rnd.uniform(-4, 4)]}]
+        if op == "update":
+            kind = [rnd.randint(1, scene.background) if type(x) is int and rnd.random() < 0.5 else x
+                    for x in kind]
+            return [{"op": "update", "id": vid, "kind-list": kind}]
+        if op == "add":
+            # A new vertex splitting the line to the first neighbour
+            n = kind[0]
+            new = f"N{rnd.randrange(10 ** 9)}"
+            (x1, y1), (x2, y2) = scene.coords[vid], scene.coords[n]
+            inside, outside = kind[1], kind[-2]
+            return [{"op": "add", "id": new, "coords": [(x1 + x2) / 2, (y1 + y2) / 2],
+                     "kind-list": [vid, inside, n, outside, vid]},
+                    {"op": "update", "id": vid, "kind-list": swap(kind, n, new)},
+                    {"op": "update", "id": n, "kind-list": swap(scene.kind_lists[n], vid, new)}]
+        # Remove a corner, joining its two neighbours
+        neighbours = sorted({x for x in kind if type(x) is str})
+        if len(neighbours) != 2:
+            return []
+        a, b = neighbours
+        if b in scene.kind_lists[a]:
+            return []
+        return [{"op": "update", "id": a, "kind-list": swap(scene.kind_lists[a], vid, b)},
+                {"op": "update", "id": b, "kind-list": swap(scene.kind_lists[b], vid, a)},
+                {"op": "remove", "id": vid}]
+
+    rnd = random.Random(0)
+    for seed in range(30):
+        data = generate_scene(num_regions=40, layout=LAYOUTS[seed % len(LAYOUTS)], seed=seed)
+        for engine in ENGINE_PROFILES:
+            pipeline = SceneUnderstanding(Scene(json.loads(json.dumps(data))), engine=engine)
+            pipeline.run_pipeline()
+            for _ in range(4):
+                pipeline.apply_edits(random_edit(pipeline.scene, rnd))
+                full = SceneUnderstanding(Scene(pipeline.scene.to_data()), engine=engine)
+                full.run_pipeline()
+                assert pipeline.vertex_types == full.vertex_types, (seed, engine)
+                assert sorted(pipeline.region_links) == sorted(full.region_links), (seed, engine)
+                assert pipeline.bodies == full.bodies, (seed, engine)
 
 def main():
     """Command line interface for scene understanding pipeline"""
@@ -86,15 +480,105 @@ def main():
                        help='Input JSON file (default: cube.json)')
     parser.add_argument('--visualize', '-v', action='store_true',
                        help='Show region graph visualization')
+    parser.add_argument('--render', metavar='FILE', default=None,
+                       help='Draw lines, links and bodies to FILE (.svg, or .png with matplotlib)')
+    parser.add_argument('--artifacts', metavar='DIR', default=None,
+                       help='Also write vertex analysis JSON into DIR')
+    parser.add_argument('--engine', choices=ENGINE_PROFILES, default=None,
+                       help='Engine profile for all stages (default: reference); see engines.py')
+    parser.add_argument('--grouping', choices=engine_names("group"), default=None,
+                       help='Region grouping engine (default: from --engine)')
+    parser.add_argument('--classifier', choices=engine_names("classify"), default=None,
+                       help='Vertex classifier (default: from --engine)')
+    parser.add_argument('--linking', choices=engine_names("link"), default=None,
+                       help='Region linking engine (default: from --engine)')
+    parser.add_argument('--components', action='store_true',
+                       help='Group each connected component of the region graph separately')
+    parser.add_argument('--group-workers', type=int, default=None, metavar='N',
+                       help='Group components across N worker processes (implies --components)')
+    parser.add_argument('--budget', type=float, default=None, metavar='SECONDS',
+                       help='Stop grouping after SECONDS and keep the bodies found so far')
+    parser.add_argument('--budget-steps', type=int, default=None, metavar='N',
+                       help='Stop grouping after N work steps (queue pops and links read)')
+    parser.add_argument('--output', '-o', metavar='FILE', default=None,
+                       help='Write bodies as machine-readable results to FILE ("-" for stdout)')
+    parser.add_argument('--format', choices=RESULT_FORMATS, default='json',
+                       help='Result format for --output (default: json)')
+    parser.add_argument('--links', action='store_true',
+                       help='Include region links in --output results')
+    parser.add_argument('--profile', metavar='FILE', default=None,
+                       help='Time each stage, count work done and write the JSON report to FILE')
+    parser.add_argument('--cache', metavar='DIR', default=None,
+                       help='Reuse stage results of previously seen scenes from DIR')
+    parser.add_argument('--validate', action='store_true',
+                       help='Check KIND lists for consistency first and reject inconsistent scenes')
+    parser.add_argument('--stream', action='store_true',
+                       help='Read one scene per line from input ("-" for stdin) and write NDJSON results')
+    parser.add_argument('--workers', '-j', type=int, default=1, metavar='N',
+                       help='With --stream, analyze scenes in N worker processes (default: 1)')
+    parser.add_argument('--unordered', action='store_true',
+                       help='With --stream and --workers, write results as they complete')
+    parser.add_argument('--shared-memory', action='store_true',
+                       help='With --stream and --workers, hand scenes to workers in shared memory instead of pickling them')
+    verbosity = parser.add_mutually_exclusive_group()
+    verbosity.add_argument('--verbose', action='store_true',
+                       help='Log every vertex and merge')
+    verbosity.add_argument('--quiet', '-q', action='store_true',
+                       help='Only log warnings and errors')
     args = parser.parse_args()
 
+    if args.stream:
+        # Results go to stdout by default, so progress stays quiet and on stderr
+        configure_logging(1 if args.verbose else -1, stream=sys.stderr)
+        from scene_stream import run_stream
+        engines = resolve_engines(args.engine, classify=args.classifier, link=args.linking,
+                                  group=args.grouping)
+        defaults = {"grouping": engines["group"], "classifier": engines["classify"],
+                    "link": engines["link"],
+                    "links": args.links, "components": args.components,
+                    "validate": args.validate, "budget": args.budget,
+                    "budget_steps": args.budget_steps}
+        _, failed = run_stream(args.input, args.output, defaults,
+                               workers=args.workers, ordered=not args.unordered,
+                               shared_memory=args.shared_memory)
+        sys.exit(1 if failed else 0)
+
+    # Results on stdout must not be interleaved with progress messages
+    quiet = args.quiet or args.output == '-'
+    configure_logging(-1 if quiet else (1 if args.verbose else 0),
+                      stream=sys.stderr if args.output == '-' else None)
+
     # Run pipeline
-    pipeline = SceneUnderstanding(args.input)
+    pipeline = SceneUnderstanding(args.input, artifact_dir=args.artifacts,
+                                  engine=args.engine,
+                                  grouping_engine=args.grouping,
+                                  classifier_engine=args.classifier,
+                                  link_engine=args.linking,
+                                  profile=bool(args.profile),
+                                  cache=SceneCache(args.cache) if args.cache else None,
+                                  split_components=args.components,
+                                  group_workers=args.group_workers,
+                                  validate=args.validate,
+                                  budget=args.budget,
+                                  budget_steps=args.budget_steps)
     try:
         pipeline.run_pipeline(args.visualize)
     except Exception as e:
-        print(f"\n Error: {e}")
+        logger.error("\n Error: %s", e)
+        if isinstance(e, SceneValidationError):
+            logger.error("%s", e.report.render())
+        if args.output:
+            write_results([error_record(args.input, e)],
+                          None if args.output == '-' else args.output, args.format)
         sys.exit(1)
 
+    if args.output:
+        write_results([pipeline.result_record(include_links=args.links)],
+                      None if args.output == '-' else args.output, args.format)
+    if args.render:
+        logger.info("Rendered %s", pipeline.render(args.render))
+    if args.profile:
+        pipeline.profile.write_report(args.profile)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
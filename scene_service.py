@@ -0,0 +1,410 @@
+"""
+Long-lived scene analysis service.
+
+Serves the pipeline over HTTP on localhost so producers stop paying
+interpreter start-up, imports and argument parsing per drawing. Scenes are
+handed to a pool of worker processes that are started and warmed up once.
+
+    POST /analyze   body: a scene ({"vertex-data": ..., "background": ...}) or
+                    {"scene": {...}, "name": "x", "timings": true, "links": true,
+                     "engine": "fast", "grouping": "unionfind", "classifier": "numpy", "link": "inline",
+                     "components": true, "budget": 0.5}
+                    -> a result record (see result_writer.py); with timings it
+                       also carries the pipeline profile and queue/service times
+    GET  /health    -> {"status": "ok", "in_flight": n, "restarts": n, ...}
+
+With --validate (or "validate": true in a request) scenes are checked
+for consistent KIND lists in the request thread; inconsistent ones get 422
+and their issues without taking a worker.
+
+Requests that arrive while the workers are busy are sent to the pool as
+one batch (--batch-size, --batch-wait-ms). At most --max-in-flight scenes are accepted
+at once; beyond that the service answers 503 with Retry-After instead of
+queueing without bound.
+
+--budget SECONDS caps grouping per scene (unless a request sets its own
+"budget"). Past it a scene is answered with the bodies found so far and
+"complete": false, so one pathological drawing cannot hold a worker.
+
+A worker that dies fails only the batch it was running: those requests get
+error records, and the pool is replaced before the next batch. If a new pool
+cannot be started, /health answers 503 with "status": "unhealthy".
+
+With --shared-memory scenes reach the workers as shared memory segments
+(shared_scene.py) rather than being pickled into each task.
+
+Usage:
+    python3 scene_service.py --port 8765 --workers 4
+    curl -s --data @one.json http://127.0.0.1:8765/analyze
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from scene_pipeline import configure_logging
+from result_writer import error_record
+from batch import analyze_scene_data
+from scene_validation import SceneValidationError, validate_scene_data
+from shared_scene import SharedScene, analyze_shared, is_shared, start_tracking
+
+logger = logging.getLogger(__name__)
+
+# Smallest valid drawing, run once per worker so the first real request is warm
+WARMUP_SCENE = {
+    "vertex-data": [
+        {"id": "A", "coords": [0, 0], "kind-list": ["B", 1, "C", 2, "B"]},
+        {"id": "B", "coords": [1, 0], "kind-list": ["C", 1, "A", 2, "C"]},
+        {"id": "C", "coords": [0, 1], "kind-list": ["A", 1, "B", 2, "A"]},
+    ],
+    "background": 2,
+}
+
+class Overloaded(Exception):
+    """Raised when the service already holds max_in_flight scenes"""
+
+def analyze_batch(items: List[Tuple[Dict, Dict]]) -> List[Dict]:
+    """Worker entry point: analyze several scenes (or shared scenes) in one round trip"""
+    return [analyze_shared(data, options) if is_shared(data) else analyze_scene_data(data, options)
+            for data, options in items]
+
+def _warm_up(_: int = 0) -> bool:
+    """Import and exercise the whole pipeline once in a worker"""
+    return analyze_scene_data(WARMUP_SCENE, {})["status"] == "ok"
+
+class SceneService:
+    """Micro-batching dispatcher in front of a warm process pool"""
+    def __init__(self, workers: Optional[int] = None, max_in_flight: int = 64,
+                 batch_size: int = 8, batch_wait: float = 0.005, validate: bool = False,
+                 shared_memory: bool = False, budget: Optional[float] = None):
+        self.workers = os.cpu_count() if workers is None else workers  # 0: in the dispatcher thread
+        self.max_in_flight = max_in_flight
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.validate = validate  # check scenes in the request thread, before queueing
+        self.shared_memory = shared_memory  # hand scenes to the workers in shared memory
+        self.budget = budget  # default grouping budget per scene, in seconds
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.restarts = 0
+        self.healthy = True
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_broken = False  # set when a batch failed because a worker died
+        self._dispatcher: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start and warm the workers, then the dispatcher"""
+        if self.workers:
+            if self.shared_memory:
+                start_tracking()  # before the workers, so they share this tracker
+            self._start_pool()
+        else:
+            _warm_up()
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self._dispatcher.start()
+
+    def stop(self) -> None:
+        """Stop dispatching and shut the pool down"""
+        self._queue.put(None)
+        if self._dispatcher:
+            self._dispatcher.join()
+        if self._pool:
+            self._pool.shutdown()
+
+    def _start_pool(self) -> None:
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        # One warm-up task per worker makes the pool spawn all of them now
+        list(self._pool.map(_warm_up, range(self.workers)))
+
+    def _restart_pool(self) -> None:
+        """Replace a broken pool; the service is unhealthy until that works"""
+        logger.warning("A worker died; starting a new pool")
+        self._pool.shutdown(wait=False)
+        self.restarts += 1
+        try:
+            self._start_pool()
+        except Exception as e:
+            logger.error("Could not start a new pool: %s", e)
+            self.healthy = False
+            return
+        self._pool_broken = False
+        self.healthy = True
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def submit(self, data: Dict, options: Optional[Dict] = None) -> Future:
+        """Queue one scene; raises Overloaded when max_in_flight is reached"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise Overloaded(f"{self.max_in_flight} scenes already in flight")
+        with self._lock:
+            self._in_flight += 1
+        future: Future = Future()
+        self._queue.put((data, options or {}, future, time.perf_counter()))
+        return future
+
+    def _dispatch_loop(self) -> None:
+        """
+        Collect up to batch_size requests per pool task. Queued requests are
+        always taken; while earlier scenes are still being analyzed the
+        dispatcher also waits up to batch_wait for more.
+        """
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.perf_counter() + self.batch_wait
+            while len(batch) < self.batch_size:
+                # Only wait for company while other scenes keep the workers busy
+                busy = self._in_flight > len(batch)
+                remaining = deadline - time.perf_counter() if busy else 0
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)  # finish this batch, then stop
+                    break
+                batch.append(item)
+
+            dispatched = time.perf_counter()
+            items = [(data, options) for data, options, _, _ in batch]
+            if self._pool:
+                shared: List[Optional[SharedScene]] = []
+                try:
+                    for data, options in items:
+                        shared.append(self._share(data, options))
+                    items = [(scene.descriptor, options) if scene else (data, options)
+                             for scene, (data, options) in zip(shared, items)]
+                    pool_future = self._submit(items)
+                except Exception as e:
+                    # Fail this batch only; _complete releases its slots and segments
+                    logger.error("Could not dispatch %d scenes: %s", len(batch), e)
+                    pool_future = Future()
+                    pool_future.set_exception(e)
+                    self._complete(batch, dispatched, pool_future, shared)
+                else:
+                    pool_future.add_done_callback(partial(self._complete, batch, dispatched, shared=shared))
+            else:
+                done: Future = Future()
+                done.set_result(analyze_batch(items))
+                self._complete(batch, dispatched, done)
+
+    def _submit(self, items: List[Tuple[Dict, Dict]]) -> Future:
+        """Send a batch to the pool, replacing the pool first if a worker died"""
+        if self._pool_broken or not self.healthy:
+            self._restart_pool()
+        try:
+            return self._pool.submit(analyze_batch, items)
+        except BrokenProcessPool:  # died while idle: nothing was lost yet
+            self._restart_pool()
+            return self._pool.submit(analyze_batch, items)
+
+    def _share(self, data: Dict, options: Dict) -> Optional[SharedScene]:
+        """The scene in a shared memory segment, or None to pickle it"""
+        if not self.shared_memory:
+            return None
+        try:
+            return SharedScene.from_data(data, options.get("name"))
+        except ValueError:  # malformed: the worker reports it from the data
+            return None
+
+    def _complete(self, batch: List[tuple], dispatched: float, pool_future: Future,
+                  shared: Optional[List[Optional[SharedScene]]] = None) -> None:
+        """Hand each record to its request and free its slot"""
+        finished = time.perf_counter()
+        try:
+            records = pool_future.result()
+        except Exception as e:  # e.g. a worker died
+            if isinstance(e, BrokenProcessPool):
+                self._pool_broken = True
+            records = [error_record(options.get("name"), e) for _, options, _, _ in batch]
+        for k, scene in enumerate(shared or ()):
+            if scene is not None:
+                with scene:
+                    records[k] = scene.collect(records[k])
+        for (_, options, future, queued), record in zip(batch, records):
+            if options.get("timings"):
+                record["timings"] = {"queue_seconds": dispatched - queued,
+                                     "service_seconds": finished - queued,
+                                     "batch_size": len(batch)}
+            with self._lock:
+                self._in_flight -= 1
+                self.completed += 1
+            self._slots.release()
+            future.set_result(record)
+
+    def health(self) -> Dict:
+        return {"status": "ok" if self.healthy else "unhealthy", "workers": self.workers,
+                "in_flight": self.in_flight, "max_in_flight": self.max_in_flight,
+                "completed": self.completed, "rejected": self.rejected, "restarts": self.restarts}
+
+class SceneRequestHandler(BaseHTTPRequestHandler):
+    """HTTP front end; self.server.service is the SceneService"""
+    server_version = "SceneService/1.0"
+    request_timeout = 60.0
+
+    def do_GET(self):
+        if self.path == "/health":
+            health = self.server.service.health()
+            self._reply(200 if health["status"] == "ok" else 503, health)
+        else:
+            self._reply(404, {"error": f"Unknown path: {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/analyze":
+            self._reply(404, {"error": f"Unknown path: {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length))
+        except (ValueError, json.JSONDecodeError) as e:
+            self._reply(400, {"error": f"Invalid JSON: {e}"})
+            return
+        if not isinstance(body, dict):
+            self._reply(400, {"error": "Expected a JSON object"})
+            return
+
+        # A bare scene, or a scene wrapped with options
+        data = body if "vertex-data" in body else body.get("scene")
+        if not isinstance(data, dict):
+            self._reply(400, {"error": "Missing scene"})
+            return
+        options = {} if data is body else {k: v for k, v in body.items() if k != "scene"}
+
+        if self.server.service.budget is not None:
+            options.setdefault("budget", self.server.service.budget)
+
+        if self.server.service.validate or options.get("validate"):
+            report = validate_scene_data(data, options.get("name"))
+            if not report.ok:
+                self._reply(422, error_record(options.get("name"), SceneValidationError(report)))
+                return
+            options["validate"] = False
+
+        try:
+            future = self.server.service.submit(data, options)
+        except Overloaded as e:
+            self._reply(503, {"error": str(e)}, {"Retry-After": "1"})
+            return
+        try:
+            record = future.result(timeout=self.request_timeout)
+        except FutureTimeout:
+            self._reply(504, {"error": "Analysis timed out"})
+            return
+        self._reply(200 if record["status"] == "ok" else 422, record)
+
+    def _reply(self, status: int, payload: Dict, headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+def make_server(service: SceneService, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    """HTTP server bound to host:port (port 0 picks a free one) serving `service`"""
+    server = ThreadingHTTPServer((host, port), SceneRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+def post_scene(url: str, data: Dict, timeout: float = 60.0, **options) -> Dict:
+    """Client helper: POST a scene to a running service and return its record"""
+    import urllib.error
+    import urllib.request
+    body = json.dumps(dict(options, scene=data) if options else data).encode("utf-8")
+    request = urllib.request.Request(url.rstrip("/") + "/analyze", data=body,
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        if e.code == 422:  # the scene itself failed; the body is its error record
+            return json.loads(e.read())
+        raise
+
+def test_worker_crash_recovery(monkeypatch):
+    """A worker that dies fails only its own scene; the service keeps serving"""
+    from batch import TEST_EXIT_ENV
+    monkeypatch.setenv(TEST_EXIT_ENV, "crash")  # before the workers start, so they see it
+    service = SceneService(workers=1, max_in_flight=4, shared_memory=True)
+    service.start()
+    try:
+        for _ in range(2):
+            record = service.submit(WARMUP_SCENE, {"name": "crash"}).result(timeout=60)
+            assert record["status"] == "error" and record["input"] == "crash"
+            # The next scene goes to a new pool
+            assert service.submit(WARMUP_SCENE).result(timeout=60)["status"] == "ok"
+
+        health = service.health()
+        assert health["status"] == "ok" and health["restarts"] == 2
+        assert health["in_flight"] == 0 and health["completed"] == 4
+    finally:
+        service.stop()
+
+def main():
+    """Command line interface for the scene analysis service"""
+    import argparse
+    parser = argparse.ArgumentParser(description="Scene Understanding service")
+    parser.add_argument('--host', default='127.0.0.1', help='Address to bind (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on (default: 8765)')
+    parser.add_argument('--workers', '-j', type=int, default=None,
+                       help='Worker processes (default: one per CPU; 0 = in-process)')
+    parser.add_argument('--max-in-flight', type=int, default=64,
+                       help='Scenes accepted at once before answering 503 (default: 64)')
+    parser.add_argument('--batch-size', type=int, default=8,
+                       help='Most scenes sent to a worker in one task (default: 8)')
+    parser.add_argument('--batch-wait-ms', type=float, default=5.0,
+                       help='How long to wait to fill a batch (default: 5ms)')
+    parser.add_argument('--validate', action='store_true',
+                       help='Reject scenes with inconsistent KIND lists before queueing them')
+    parser.add_argument('--budget', type=float, default=None, metavar='SECONDS',
+                       help='Grouping budget per scene; past it partial bodies are returned')
+    parser.add_argument('--shared-memory', action='store_true',
+                       help='Hand scenes to the workers in shared memory instead of pickling them')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+    args = parser.parse_args()
+
+    # Per-scene pipeline progress would swamp the log; workers inherit this setup
+    configure_logging(1 if args.verbose else -1)
+    if not args.verbose:
+        logger.setLevel(logging.INFO)
+    service = SceneService(args.workers, args.max_in_flight, args.batch_size,
+                           args.batch_wait_ms / 1000, validate=args.validate,
+                           shared_memory=args.shared_memory, budget=args.budget)
+    service.start()
+    server = make_server(service, args.host, args.port)
+    logger.info("Serving on http://%s:%d (%s workers)", *server.server_address[:2],
+                service.health()["workers"] or "in-process")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+Streaming mode: newline-delimited scenes in, NDJSON results out.
+
+Each input line is one scene, either bare ({"vertex-data": ..., "background": ...})
+or wrapped with per-scene options ({"scene": {...}, "name": "x", "links": true}).
+Lines are read lazily and results are written as soon as they are ready,
+so memory stays flat however long the stream is. Every result record gets
+the input line number under "line".
+
+With workers > 1 scenes run in a process pool with at most `window` of them
+in flight. Output keeps input order unless ordered=False, in which case
+records are written as they complete. With shared_memory=True scenes go to
+the workers through shared memory instead of being pickled (shared_scene.py).
+When a worker dies, the stream carries on in a new pool and the scenes
+that were in flight are rerun one at a time, so only a scene that kills
+its worker again gets an error record.
+
+Usage:
+    exporter | python3 scene_pipeline.py --stream - > bodies.ndjson
+    python3 scene_pipeline.py --stream drawings.ndjson --workers 8 --unordered
+    python3 scene_pipeline.py --stream big.ndjson --workers 8 --shared-memory
+"""
+import json
+import sys
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from batch import analyze_scene_data
+from result_writer import dumps_ndjson, error_record
+from scene_validation import SceneValidationError, validate_scene_data
+from shared_scene import SharedScene, analyze_shared, is_shared, start_tracking
+
+def read_ndjson_scenes(stream: IO[str], source: str = "<stdin>") -> Iterator[Tuple[int, Dict, Dict]]:
+    """
+    Yield (line, scene_data, options) for every non-blank line, lazily.
+
+    A line that is not a scene yields (line, None, {"error": ...}).
+    """
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        name = f"{source}:{line_number}"
+        try:
+            body = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, None, {"name": name, "error": e}
+            continue
+        if isinstance(body, dict) and "vertex-data" in body:
+            yield line_number, body, {"name": name}
+        elif isinstance(body, dict) and isinstance(body.get("scene"), dict):
+            options = {k: v for k, v in body.items() if k != "scene"}
+            options.setdefault("name", name)
+            yield line_number, body["scene"], options
+        else:
+            yield line_number, None, {"name": name, "error": ValueError("Line is not a scene")}
+
+def _preflight(line: int, data: Optional[Dict], options: Dict) -> Tuple[int, Optional[Dict], Dict]:
+    """Validate here, before the scene is handed to a worker"""
+    if data is None or not options.get("validate"):
+        return line, data, options
+    options = dict(options, validate=False)
+    report = validate_scene_data(data, options["name"])
+    if report.ok:
+        return line, data, options
+    return line, None, dict(options, error=SceneValidationError(report))
+
+def _analyze_line(line: int, data: Optional[Dict], options: Dict) -> Dict:
+    """Result record for one parsed line (or shared scene), tagged with its line number"""
+    if data is None:
+        record = error_record(options["name"], options["error"])
+    elif is_shared(data):
+        record = analyze_shared(data, options)
+    else:
+        record = analyze_scene_data(data, options)
+    record["line"] = line
+    return record
+
+def analyze_stream(scenes: Iterable[Tuple[int, Optional[Dict], Dict]],
+                   defaults: Optional[Dict] = None, workers: int = 1,
+                   ordered: bool = True, window: Optional[int] = None,
+                   shared_memory: bool = False) -> Iterator[Dict]:
+    """
+    Analyze (line, data, options) items lazily and yield result records.
+
+    defaults are options applied to every scene (per-line options win).
+    With the validate option, scenes are checked in this process and
+    inconsistent ones are reported without reaching a worker.
+    workers > 1 uses a process pool with at most `window` scenes in flight
+    (default 2 * workers); ordered=False yields records as they complete.
+    shared_memory=True hands scenes to the workers in shared memory
+    segments, which are unlinked as soon as each result is back; scenes
+    that cannot be encoded are pickled as usual.
+    """
+    defaults = defaults or {}
+
+    scenes = (_preflight(line, data, dict(defaults, **options)) for line, data, options in scenes)
+
+    if workers <= 1:
+        for line, data, options in scenes:
+            yield _analyze_line(line, data, options)
+        return
+
+    window = window or 2 * workers
+    shared: Dict[Future, SharedScene] = {}  # segments owned by scenes in flight
+    inputs: Dict[Future, Tuple[int, Dict, Dict]] = {}  # (line, data, options) of scenes in flight
+    if shared_memory:
+        start_tracking()  # before the pool, so the workers share this tracker
+    pools = [ProcessPoolExecutor(max_workers=workers)]
+    alone: List[ProcessPoolExecutor] = []  # one worker, for scenes in flight when a worker died
+
+    def failed(line: int, options: Dict, error: BaseException) -> Dict:
+        record = error_record(options.get("name"), error)
+        record["line"] = line
+        return record
+
+    def rerun_alone(line: int, data: Dict, options: Dict) -> Dict:
+        """Run a scene by itself; it fails only if it kills this worker too"""
+        if not alone:
+            alone.append(ProcessPoolExecutor(max_workers=1))
+        try:
+            return alone[0].submit(_analyze_line, line, data, options).result()
+        except BrokenProcessPool as e:
+            alone.pop().shutdown(wait=False)
+            return failed(line, options, e)
+
+    def result(future: Future) -> Dict:
+        line, data, options = inputs.pop(future, (None, None, {}))
+        scene = shared.pop(future, None)
+        try:
+            record = future.result()
+        except Exception as e:  # the worker died, or the result could not come back
+            if scene is not None:
+                scene.close()
+            if isinstance(e, BrokenProcessPool) and data is not None:
+                return rerun_alone(line, data, options)
+            return failed(line, options, e)
+        if scene is not None:
+            with scene:
+                record = scene.collect(record)
+        return record
+
+    def pool_submit(*args) -> Future:
+        try:
+            return pools[-1].submit(_analyze_line, *args)
+        except BrokenProcessPool:
+            # A worker died; scenes in flight are rerun, later ones get a new pool
+            pools[-1].shutdown(wait=False)
+            pools.append(ProcessPoolExecutor(max_workers=workers))
+            return pools[-1].submit(_analyze_line, *args)
+
+    def submit(line: int, data: Optional[Dict], options: Dict) -> Future:
+        if data is None:  # unreadable or invalid: no worker needed
+            future: Future = Future()
+            future.set_result(_analyze_line(line, data, options))
+            return future
+        future = None
+        if shared_memory:
+            try:
+                scene = SharedScene.from_data(data, options.get("name"))
+            except ValueError:  # malformed KIND lists: let the worker report it
+                pass
+            else:
+                try:
+                    future = pool_submit(line, scene.descriptor, options)
+                except Exception:
+                    scene.close()
+                    raise
+                shared[future] = scene
+        if future is None:
+            future = pool_submit(line, data, options)
+        inputs[future] = (line, data, options)
+        return future
+
+    try:
+        if ordered:
+            pending: deque = deque()
+            for item in scenes:
+                pending.append(submit(*item))
+                if len(pending) >= window:
+                    yield result(pending.popleft())
+            while pending:
+                yield result(pending.popleft())
+        else:
+            running = set()
+            for item in scenes:
+                running.add(submit(*item))
+                if len(running) >= window:
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield result(future)
+            for future in _as_completed(running):
+                yield result(future)
+    finally:
+        # Stopped early: let running scenes finish so the body segments they
+        # write are unlinked along with the scenes
+        for pool in pools + alone:
+            pool.shutdown(cancel_futures=True)
+        for future, scene in shared.items():
+            if not future.cancelled() and future.exception() is None:
+                scene.collect(future.result())
+            scene.close()
+
+def _as_completed(futures) -> Iterator[Future]:
+    while futures:
+        done, futures = wait(futures, return_when=FIRST_COMPLETED)
+        yield from done
+
+def write_ndjson_stream(records: Iterable[Dict], output: IO[str]) -> Tuple[int, int]:
+    """Write each record as one line as soon as it arrives; return (ok, failed)"""
+    ok = failed = 0
+    for record in records:
+        output.write(dumps_ndjson([record]))
+        output.flush()
+        if record["status"] == "ok":
+            ok += 1
+        else:
+            failed += 1
+    return ok, failed
+
+def run_stream(source: str = "-", output: Optional[str] = None, defaults: Optional[Dict] = None,
+               workers: int = 1, ordered: bool = True, shared_memory: bool = False) -> Tuple[int, int]:
+    """Stream scenes from a file (or "-" for stdin) to a file (or stdout)"""
+    infile = sys.stdin if source == "-" else open(source)
+    outfile = sys.stdout if output in (None, "-") else open(output, "w")
+    try:
+        scenes = read_ndjson_scenes(infile, "<stdin>" if source == "-" else source)
+        return write_ndjson_stream(analyze_stream(scenes, defaults, workers, ordered,
+                                                  shared_memory=shared_memory), outfile)
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+        if outfile is not sys.stdout:
+            outfile.close()
+
+def test_stream_order_and_bad_lines():
+    """Records come back in input order, and unreadable lines become error records in place"""
+    import io
+    from synthetic_scenes import generate_scene
+    sizes = [200, 10, 100, 10, 200, 10]  # big scenes first, so workers finish out of order
+    lines = [json.dumps(generate_scene(num_regions=size, seed=seed)) for seed, size in enumerate(sizes)]
+    lines.insert(2, "{not json")
+    lines.insert(4, json.dumps({"scene": [1, 2]}))
+    lines.insert(5, "")
+    text = "\n".join(lines) + "\n"
+    expected = list(analyze_stream(read_ndjson_scenes(io.StringIO(text), "s.ndjson")))
+    statuses = [record["status"] for record in expected]
+    assert statuses == ["ok", "ok", "error", "ok", "error", "ok", "ok", "ok"]
+    assert [record["line"] for record in expected] == [1, 2, 3, 4, 5, 7, 8, 9]
+    assert expected[2]["input"] == "s.ndjson:3" and "JSONDecodeError" in expected[2]["error"]
+    for shared_memory in (False, True):
+        records = list(analyze_stream(read_ndjson_scenes(io.StringIO(text), "s.ndjson"),
+                                      workers=2, window=3, shared_memory=shared_memory))
+        assert records == expected
+
+def test_worker_crash_with_shared_memory(monkeypatch):
+    """A worker that dies mid-scene fails only that scene and leaves no segments behind"""
+    import os
+    from batch import TEST_EXIT_ENV
+    from scene_service import WARMUP_SCENE
+    before = set(os.listdir("/dev/shm"))
+    monkeypatch.setenv(TEST_EXIT_ENV, "crash")
+    items = [(1, WARMUP_SCENE, {"name": "first"}), (2, WARMUP_SCENE, {"name": "crash"})]
+    items += [(line, WARMUP_SCENE, {"name": f"after-{line}"}) for line in range(3, 9)]
+    for ordered in (True, False):
+        records = list(analyze_stream(iter(items), workers=2, ordered=ordered, shared_memory=True))
+        if not ordered:
+            records.sort(key=lambda r: r["line"])
+        assert [r["line"] for r in records] == list(range(1, 9))
+        assert records[1]["status"] == "error" and records[1]["input"] == "crash"
+        assert all(r["status"] == "ok" for r in records[:1] + records[2:])
+    assert set(os.listdir("/dev/shm")) <= before
@@ -0,0 +1,284 @@
+"""
+Consistency checks for scene input, run before any analysis.
+
+Malformed drawings otherwise fail late (a bare KeyError on an unknown
+neighbour id) or not at all (one-sided edges, regions that disagree across
+an edge silently produce wrong links). validate_scene_data makes two linear
+passes: the first collects vertex ids, the second checks every KIND list
+and fills a hashed half-edge index
+
+    {(vertex, neighbour): (region, region)}
+
+holding the regions on either side of each edge as seen from `vertex`.
+Each edge is then looked up from its other end: it must exist there and
+separate the same two regions. Every problem is reported in one
+ValidationReport rather than stopping at the first.
+
+Usage:
+    python3 scene_validation.py drawing.json [more.json ...]
+"""
+import json
+import logging
+import math
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ERROR = "error"
+WARNING = "warning"
+
+class ValidationReport:
+    """All issues found in one scene; ok when none of them is an error"""
+    def __init__(self, source: Optional[str] = None):
+        self.source = source
+        self.issues: List[Dict] = []
+        self.vertices = 0
+        self.edges = 0
+
+    def add(self, severity: str, code: str, message: str, **where) -> None:
+        self.issues.append(dict({"severity": severity, "code": code, "message": message}, **where))
+
+    @property
+    def errors(self) -> List[Dict]:
+        return [issue for issue in self.issues if issue["severity"] == ERROR]
+
+    @property
+    def warnings(self) -> List[Dict]:
+        return [issue for issue in self.issues if issue["severity"] == WARNING]
+
+    @property
+    def ok(self) -> bool:
+        return not any(issue["severity"] == ERROR for issue in self.issues)
+
+    def to_dict(self) -> Dict:
+        return {"input": self.source, "ok": self.ok, "vertices": self.vertices,
+                "edges": self.edges, "issues": self.issues}
+
+    def render(self, limit: int = 20) -> str:
+        """Human-readable summary with up to `limit` issues"""
+        errors, warnings = len(self.errors), len(self.warnings)
+        lines = [f"{self.source or 'scene'}: {errors} error(s), {warnings} warning(s) "
+                 f"in {self.vertices} vertices, {self.edges} edges"]
+        lines.extend(f"  {issue['severity']:7s} {issue['code']:20s} {issue['message']}"
+                     for issue in self.issues[:limit])
+        if len(self.issues) > limit:
+            lines.append(f"  ... {len(self.issues) - limit} more")
+        return "\n".join(lines)
+
+class SceneValidationError(ValueError):
+    """Raised when a scene fails validation; carries the full report"""
+    def __init__(self, report: ValidationReport):
+        self.report = report
+        self.issues = report.issues
+        errors = report.errors
+        super().__init__(f"{len(errors)} validation error(s), first: {errors[0]['message']}")
+
+NUMBER_TYPES = {int, float}  # exact types: bool is not a coordinate
+
+def _valid_coords(xy) -> bool:
+    return (type(xy) is list and len(xy) == 2 and set(map(type, xy)) <= NUMBER_TYPES
+            and all(map(math.isfinite, xy)))
+
+def validate_scene_data(data, source: Optional[str] = None) -> ValidationReport:
+    """Check raw input-file data ({"vertex-data": [...], "background": n})"""
+    report = ValidationReport(source)
+    if not isinstance(data, dict) or not isinstance(data.get("vertex-data"), list):
+        report.add(ERROR, "missing_vertex_data", "Scene has no vertex-data list")
+        return report
+    background = data.get("background")
+    if background is None:
+        report.add(ERROR, "missing_background", "Scene has no background region")
+    elif not isinstance(background, int) or isinstance(background, bool):
+        report.add(ERROR, "bad_background", f"Background {background!r} is not a region number")
+
+    # Pass 1: vertex ids and coordinates
+    coords: Dict[str, list] = {}
+    kinds: List[Tuple[str, list]] = []
+    for position, v in enumerate(data["vertex-data"]):
+        if not isinstance(v, dict) or not isinstance(v.get("id"), str):
+            report.add(ERROR, "bad_vertex", f"Entry {position} has no string id", index=position)
+            continue
+        vid = v["id"]
+        if vid in coords:
+            report.add(ERROR, "duplicate_id", f"Vertex {vid} is defined more than once", vertex=vid)
+            continue
+        xy = v.get("coords")
+        if not _valid_coords(xy):
+            report.add(ERROR, "bad_coords", f"Vertex {vid} has invalid coords {xy!r}", vertex=vid)
+            xy = None
+        coords[vid] = xy
+        kinds.append((vid, v.get("kind-list")))
+    report.vertices = len(coords)
+
+    # Pass 2: every KIND list, filling the half-edge index
+    half_edges: Dict[Tuple[str, str], Tuple[int, ...]] = {}
+    background_seen = False
+    skipped = set()
+    for vid, kind in kinds:
+        if not isinstance(kind, list) or not kind:
+            report.add(ERROR, "bad_kind_list", f"Vertex {vid} has no KIND list", vertex=vid)
+            skipped.add(vid)
+            continue
+        row, regions = kind[0::2], kind[1::2]
+        if set(map(type, row)) != {str} or not set(map(type, regions)) <= {int}:
+            report.add(ERROR, "bad_kind_list",
+                       f"Vertex {vid}: KIND list does not alternate neighbour ids and regions",
+                       vertex=vid)
+            skipped.add(vid)
+            continue
+        background_seen = background_seen or background in regions
+        closed = len(row) > 1 and row[0] == row[-1] and len(regions) == len(row) - 1
+        if closed:
+            row = row[:-1]
+        elif len(row) > 1:
+            report.add(WARNING, "open_kind_list",
+                       f"Vertex {vid}: KIND list does not return to its first neighbour {row[0]}",
+                       vertex=vid)
+
+        seen = set(row)
+        xy = coords[vid]
+        usable = len(seen) == len(row) and vid not in seen and coords.keys() >= seen
+        if usable:
+            for n in row:
+                if xy is not None and coords[n] == xy:
+                    report.add(ERROR, "zero_length_edge", f"Vertices {vid} and {n} share coordinates",
+                               vertex=vid, neighbor=n)
+        else:
+            seen = set()
+            for n in row:
+                if n == vid:
+                    report.add(ERROR, "self_loop", f"Vertex {vid} lists itself as a neighbour",
+                               vertex=vid)
+                elif n not in coords:
+                    report.add(ERROR, "unknown_neighbor", f"Vertex {vid} lists unknown vertex {n}",
+                               vertex=vid, neighbor=n)
+                elif n in seen:
+                    report.add(ERROR, "repeated_neighbor", f"Vertex {vid} lists {n} more than once",
+                               vertex=vid, neighbor=n)
+                seen.add(n)
+        if len(seen) < 2:
+            report.add(WARNING, "dangling_vertex", f"Vertex {vid} has fewer than two lines", vertex=vid)
+        elif len(seen) > 3:
+            report.add(WARNING, "unsupported_junction",
+                       f"Vertex {vid} joins {len(seen)} lines and will not be classified", vertex=vid)
+        if not usable:
+            skipped.add(vid)
+            continue
+
+        # The regions either side of edge (vid, row[k]) are those before and after it
+        last = len(regions)
+        for k, n in enumerate(row):
+            before = regions[k - 1] if k > 0 or closed else None
+            after = regions[k] if k < last else None
+            if before is None or after is None:
+                half_edges[(vid, n)] = (after,) if before is None else (before,)
+            else:
+                half_edges[(vid, n)] = (before, after) if before <= after else (after, before)
+    if background is not None and not background_seen and report.vertices:
+        report.add(WARNING, "unused_background",
+                   f"Background region {background} appears in no KIND list")
+
+    # Every half-edge must have a twin separating the same regions
+    for (u, v), sides in half_edges.items():
+        twin = half_edges.get((v, u))
+        if twin is None:
+            if v in skipped:
+                continue  # v's KIND list is already reported as unusable
+            report.add(ERROR, "asymmetric_edge", f"Vertex {u} lists {v} but {v} does not list {u}",
+                       vertex=u, neighbor=v)
+            continue
+        if u < v:
+            report.edges += 1
+            if sides != twin and not (set(sides) <= set(twin) or set(twin) <= set(sides)):
+                report.add(ERROR, "region_mismatch",
+                           f"Edge {u}-{v} separates regions {list(sides)} at {u} "
+                           f"but {list(twin)} at {v}", vertex=u, neighbor=v)
+    return report
+
+def validate_scene(source, name: Optional[str] = None) -> ValidationReport:
+    """
+    Validate a path, raw input data, or an already parsed Scene/BinaryScene.
+    Files are read as plain JSON, so problems that would stop Scene() from
+    parsing them are reported too.
+    """
+    if isinstance(source, dict):
+        return validate_scene_data(source, name)
+    if isinstance(source, (str, Path)):
+        from scene_binary import is_binary_path
+        if not is_binary_path(source):
+            from take_input import get_data
+            return validate_scene_data(get_data(source), source=str(source))
+        from take_input import load_scene
+        source = load_scene(source)
+    return validate_scene_data(source.to_data(), source=source.source)
+
+def check_scene(source, name: Optional[str] = None) -> ValidationReport:
+    """validate_scene, raising SceneValidationError on errors and logging warnings"""
+    report = validate_scene(source, name)
+    if not report.ok:
+        raise SceneValidationError(report)
+    for issue in report.warnings:
+        logger.warning("%s: %s", report.source or "scene", issue["message"])
+    return report
+
+def test_validation():
+    """cube.json passes; a dangling edge, a duplicate vertex or an unknown neighbour fail"""
+    import copy
+    from take_input import get_data
+    data = get_data(str(Path(__file__).parent / "cube.json"))
+    report = validate_scene(data, "cube.json")
+    assert report.ok and not report.warnings, report.render()
+    # one.json is kept as drawn: vertex C lists itself
+    report = validate_scene(str(Path(__file__).parent / "one.json"))
+    assert {issue["code"] for issue in report.errors} == {"self_loop"}
+
+    def codes(broken):
+        report = validate_scene_data(broken)
+        assert not report.ok
+        return {issue["code"] for issue in report.errors}
+
+    dangling = copy.deepcopy(data)  # a new vertex with an edge its neighbour does not list
+    first = dangling["vertex-data"][0]["id"]
+    dangling["vertex-data"].append({"id": "Z", "coords": [-50, -50], "kind-list": [first, 1, first]})
+    assert codes(dangling) == {"asymmetric_edge"}
+
+    duplicate = copy.deepcopy(data)
+    duplicate["vertex-data"].append(copy.deepcopy(duplicate["vertex-data"][0]))
+    assert codes(duplicate) == {"duplicate_id"}
+
+    unknown = copy.deepcopy(data)
+    unknown["vertex-data"][0]["kind-list"][0] = "nowhere"
+    assert "unknown_neighbor" in codes(unknown)
+    try:
+        check_scene(unknown)
+    except SceneValidationError:
+        pass
+    else:
+        raise AssertionError("check_scene accepted an unknown neighbour")
+
+def main():
+    """Command line interface: validate scene files"""
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(description="Check scene files for inconsistent KIND lists")
+    parser.add_argument('inputs', nargs='+', help='Scene files (.json or .scnb)')
+    parser.add_argument('--json', action='store_true', help='Print the reports as JSON')
+    args = parser.parse_args()
+
+    reports = []
+    for path in args.inputs:
+        try:
+            reports.append(validate_scene(path))
+        except (OSError, ValueError) as e:  # unreadable file or invalid JSON
+            report = ValidationReport(path)
+            report.add(ERROR, "unreadable", f"{type(e).__name__}: {e}")
+            reports.append(report)
+    if args.json:
+        print(json.dumps([r.to_dict() for r in reports], indent=2))
+    else:
+        print("\n".join(r.render() for r in reports))
+    sys.exit(0 if all(r.ok for r in reports) else 1)
+
+if __name__ == "__main__":
+    main()
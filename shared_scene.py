@@ -0,0 +1,164 @@
+"""
+Zero-copy scene hand-off to worker processes through shared memory.
+
+Sending a parsed scene to a process pool pickles every vertex dict,
+coordinate list and KIND list, and the worker unpickles and re-parses
+them. Here the parent writes the scene once into a
+multiprocessing.shared_memory segment, in the columnar .scnb layout of
+scene_binary.py (coordinates, CSR neighbour and region index arrays, ids).
+Only a small descriptor crosses the process boundary:
+
+    {"shared-scene": "<segment name>", "size": n, "source": "name", "bodies": "<name>"}
+
+The worker maps the segment as a BinaryScene without copying, runs the
+pipeline and writes the result back the same way: a segment of int32 body
+labels indexed by region number (0 = in no body), under the "bodies" name
+the parent chose. The parent rebuilds the bodies from it.
+
+Lifecycle: the parent owns both segments. SharedScene.collect unlinks the
+labels segment as it reads it, and SharedScene.close (or leaving the
+`with` block) unlinks the scene, and the labels too if a worker wrote them
+but died before reporting back. Workers only attach and close. Call
+start_tracking() before starting the pool, so that workers share the
+parent's resource tracker and anything else left behind by a crash is
+removed when the parent exits.
+"""
+import logging
+from array import array
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional, Union
+
+from take_input import Scene
+from scene_binary import BinaryScene, encode_data, encode_scene
+
+logger = logging.getLogger(__name__)
+
+SHARED_KEY = "shared-scene"
+BODIES_KEY = "shared-bodies"
+
+def start_tracking() -> None:
+    """Start this process's resource tracker, so worker processes started later share it"""
+    resource_tracker.ensure_running()
+
+def is_shared(data) -> bool:
+    """True for a shared-scene descriptor rather than scene data"""
+    return isinstance(data, dict) and SHARED_KEY in data
+
+class SharedScene:
+    """A scene encoded into a shared memory segment owned by this process"""
+    def __init__(self, payload: bytes, source: Optional[str] = None):
+        self.source = source
+        self.size = len(payload)
+        self._shm: Optional[SharedMemory] = SharedMemory(create=True, size=max(1, self.size))
+        self._shm.buf[:self.size] = payload
+        self.bodies_name = self._shm.name + "-bodies"  # where the worker writes its labels
+
+    @classmethod
+    def from_data(cls, data: Dict, source: Optional[str] = None) -> "SharedScene":
+        """Share raw input-file data; ValueError if its KIND lists cannot be encoded"""
+        return cls(encode_data(data), source)
+
+    @classmethod
+    def from_scene(cls, scene: Union[Scene, BinaryScene]) -> "SharedScene":
+        """Share a parsed scene; a BinaryScene's buffer is copied as it is"""
+        if isinstance(scene, BinaryScene):
+            return cls(bytes(memoryview(scene._buffer)), scene.source)
+        return cls(encode_scene(scene), scene.source)
+
+    @property
+    def descriptor(self) -> Dict:
+        """What a worker needs to attach: segment name, payload size and scene name"""
+        return {SHARED_KEY: self._shm.name, "size": self.size, "source": self.source,
+                "bodies": self.bodies_name}
+
+    def collect(self, record: Dict) -> Dict:
+        """Put the bodies a worker left in shared memory back into its record"""
+        shared = record.pop(BODIES_KEY, None)
+        if shared is None:
+            return record
+        shm = SharedMemory(name=shared["name"])
+        labels = array("i")
+        try:
+            labels.frombytes(shm.buf[:4 * shared["regions"]])
+        finally:
+            shm.close()
+            shm.unlink()
+        bodies: Dict[int, List[int]] = {}
+        for region, label in enumerate(labels):
+            if label:
+                bodies.setdefault(label, []).append(region)
+        # Same key order as scene_record, bodies in the order they were found
+        ordered = {key: record[key] for key in ("input", "status")}
+        ordered["bodies"] = [bodies[label] for label in sorted(bodies)]
+        ordered.update((key, value) for key, value in record.items() if key not in ordered)
+        return ordered
+
+    def close(self) -> None:
+        """Release and unlink the scene segment and any uncollected labels; safe to call twice"""
+        if self._shm is None:
+            return
+        self._shm.close()
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+        self._shm = None
+        try:
+            leftover = SharedMemory(name=self.bodies_name)
+        except FileNotFoundError:  # collected, or never written
+            return
+        leftover.close()
+        leftover.unlink()
+
+    def __enter__(self) -> "SharedScene":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def _share_bodies(bodies: List[List[int]], name: Optional[str] = None) -> Optional[Dict]:
+    """Write body labels per region into a new segment; None if regions are not small ints"""
+    regions = [r for body in bodies for r in body]
+    if not regions or min(regions) < 0 or max(regions) >= 4 * len(regions) + 1024:
+        return None
+    labels = array("i", bytes(4 * (max(regions) + 1)))
+    for label, body in enumerate(bodies, 1):
+        for r in body:
+            labels[r] = label
+    shm = SharedMemory(name=name, create=True, size=4 * len(labels))
+    shm.buf[:4 * len(labels)] = labels.tobytes()
+    name = shm.name
+    shm.close()  # the parent unlinks it after reading
+    return {"name": name, "regions": len(labels)}
+
+def analyze_shared(descriptor: Dict, options: Dict) -> Dict:
+    """Worker entry point: analyze a shared scene in place; never raises"""
+    from batch import analyze_scene_data
+    from result_writer import error_record
+    name = options.get("name") or descriptor.get("source")
+    try:
+        shm = SharedMemory(name=descriptor[SHARED_KEY])
+    except OSError as e:
+        return error_record(name, e)
+    buffer = shm.buf[:descriptor["size"]]
+    try:
+        scene = BinaryScene(buffer, source=name)
+        record = analyze_scene_data(scene, dict(options, name=name))
+        scene.close()
+    except Exception as e:
+        record = error_record(name, e)
+    finally:
+        try:
+            buffer.release()
+            shm.close()
+        except BufferError:
+            # Something still holds a view; the mapping goes with the worker
+            logger.debug("Shared scene %s still referenced in the worker", descriptor[SHARED_KEY])
+
+    if record["status"] == "ok":
+        shared = _share_bodies(record["bodies"], descriptor.get("bodies"))
+        if shared is not None:
+            record[BODIES_KEY] = shared
+            del record["bodies"]
+    return record
@@ -0,0 +1,342 @@
+"""
+Synthetic line drawings for benchmarks.
+
+Every body is a prism over a regular polygon, drawn in oblique projection:
+the front face plus whichever side faces point towards the viewer. More
+polygon sides give more regions per body. Bodies are laid out on a grid,
+either on their own, stacked (a smaller prism standing on a larger one) or
+occluding (one prism partly hiding another). Hidden edges are clipped
+against the front body's silhouette, which creates T-junctions.
+
+The drawing is turned into the usual input format by sorting each vertex's
+neighbours counter-clockwise and tracing faces: every bounded face becomes a
+region and the outside of every group of bodies is the background.
+
+Usage:
+    python3 synthetic_scenes.py --regions 1000 --layout mixed -o big.json
+"""
+import json
+import math
+import random
+from typing import Dict, List, Optional, Sequence, Tuple
+
+Point = Tuple[float, float]
+
+LAYOUTS = ("separate", "stacked", "occluding", "mixed")
+
+# Polygon sides -> regions the prism shows (front face + visible sides).
+# Kept to sizes whose junction angles stay well clear of the T tolerance.
+SIDES_TO_REGIONS = {4: 3, 5: 4, 8: 5, 10: 6, 12: 7}
+
+EXTRUDE_ANGLE = math.radians(45)
+
+# --- Geometry helpers ---
+
+def _cross(o: Point, a: Point, b: Point) -> float:
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+def convex_hull(points: Sequence[Point]) -> List[int]:
+    """Indices of the convex hull in counter-clockwise order (monotone chain)"""
+    order = sorted(range(len(points)), key=lambda i: points[i])
+    if len(order) < 3:
+        return order
+
+    def half(indices):
+        chain = []
+        for i in indices:
+            while len(chain) >= 2 and _cross(points[chain[-2]], points[chain[-1]], points[i]) <= 0:
+                chain.pop()
+            chain.append(i)
+        return chain
+
+    lower, upper = half(order), half(reversed(order))
+    return lower[:-1] + upper[:-1]
+
+def clip_outside(p: Point, q: Point, polygon: Sequence[Point]) -> Tuple[List[Tuple[float, float]], List[Tuple[float, int]]]:
+    """
+    Parts of segment pq outside a convex counter-clockwise polygon.
+
+    Returns (visible, hits): visible is a list of (t0, t1) parameter ranges
+    along pq, hits is (t, polygon_edge) for every point where pq enters or
+    leaves the polygon strictly between its endpoints.
+    """
+    dx, dy = q[0] - p[0], q[1] - p[1]
+    t_in, t_out = 0.0, 1.0
+    edge_in = edge_out = None
+    count = len(polygon)
+    for i in range(count):
+        a, b = polygon[i], polygon[(i + 1) % count]
+        # Outward normal of a counter-clockwise edge
+        nx, ny = b[1] - a[1], a[0] - b[0]
+        num = nx * (p[0] - a[0]) + ny * (p[1] - a[1])   # > 0: p outside this edge
+        den = nx * dx + ny * dy
+        if den == 0:
+            if num > 0:
+                return [(0.0, 1.0)], []
+            continue
+        t = -num / den
+        if den < 0:   # entering
+            if t > t_in:
+                t_in, edge_in = t, i
+        else:         # leaving
+            if t < t_out:
+                t_out, edge_out = t, i
+        if t_in >= t_out:
+            return [(0.0, 1.0)], []
+
+    visible, hits = [], []
+    if edge_in is not None:
+        visible.append((0.0, t_in))
+        hits.append((t_in, edge_in))
+    if edge_out is not None:
+        visible.append((t_out, 1.0))
+        hits.append((t_out, edge_out))
+    return visible, hits
+
+# --- Bodies ---
+
+class Drawing:
+    """Points and straight edges of a line drawing under construction"""
+    def __init__(self):
+        self.points: List[Point] = []
+        self.edges: List[Tuple[int, int]] = []
+
+    def add_point(self, point: Point) -> int:
+        self.points.append(point)
+        return len(self.points) - 1
+
+def prism(cx: float, cy: float, radius: float, sides: int, depth: float) -> Tuple[List[Point], List[Tuple[int, int]]]:
+    """Points and edges of one prism drawn with the receding edges at 45 degrees"""
+    step = 2 * math.pi / sides
+    # Rotate so no side face is seen exactly edge-on
+    offset = step / 2 if sides % 4 == 0 else 0.0
+    ex, ey = depth * math.cos(EXTRUDE_ANGLE), depth * math.sin(EXTRUDE_ANGLE)
+
+    # Side k joins front vertex k and k + 1; its outward normal is at normals[k]
+    normals = [EXTRUDE_ANGLE + offset + k * step for k in range(sides)]
+    front = [(cx + radius * math.cos(a - step / 2), cy + radius * math.sin(a - step / 2))
+             for a in normals]
+    visible = [k for k in range(sides) if math.cos(normals[k] - EXTRUDE_ANGLE) > 1e-9]
+
+    points = list(front)
+    edges = [(k, (k + 1) % sides) for k in range(sides)]
+    back = {}
+    for k in visible:
+        for v in (k, (k + 1) % sides):
+            if v not in back:
+                back[v] = len(points)
+                points.append((front[v][0] + ex, front[v][1] + ey))
+                edges.append((v, back[v]))
+        edges.append((back[k], back[(k + 1) % sides]))
+    return points, edges
+
+def place(drawing: Drawing, body: Tuple[List[Point], List[Tuple[int, int]]]) -> Tuple[List[int], List[Tuple[int, int]]]:
+    """Add a body's points to the drawing; return its point ids and edges (not yet added)"""
+    points, edges = body
+    ids = [drawing.add_point(p) for p in points]
+    return ids, [(ids[a], ids[b]) for a, b in edges]
+
+def occlude(drawing: Drawing, front_edges: List[Tuple[int, int]],
+            back_edges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """
+    Hide the parts of back_edges covered by the front body's silhouette.
+
+    Returns the final edge list for both bodies: back edges are cut where they
+    pass behind the silhouette, and silhouette edges are split at the
+    resulting T-junctions.
+    """
+    pts = drawing.points
+    front_ids = sorted({v for e in front_edges for v in e})
+    hull = [front_ids[i] for i in convex_hull([pts[v] for v in front_ids])]
+    polygon = [pts[v] for v in hull]
+
+    splits: Dict[Tuple[int, int], List[Tuple[float, int]]] = {}
+    edges = []
+    for a, b in back_edges:
+        visible, hits = clip_outside(pts[a], pts[b], polygon)
+        if not hits:
+            if visible:
+                edges.append((a, b))
+            continue
+        # New junction points where the back edge meets the silhouette
+        (ax, ay), (bx, by) = pts[a], pts[b]
+        junction = {}
+        for t, side in hits:
+            v = drawing.add_point((ax + t * (bx - ax), ay + t * (by - ay)))
+            junction[t] = v
+            u, w = hull[side], hull[(side + 1) % len(hull)]
+            s = _project(pts[u], pts[w], pts[v])
+            splits.setdefault((u, w), []).append((s, v))
+        for t0, t1 in visible:
+            start = a if t0 == 0.0 else junction[t0]
+            end = b if t1 == 1.0 else junction[t1]
+            edges.append((start, end))
+
+    for a, b in front_edges:
+        cut = splits.get((a, b)) or splits.get((b, a))
+        if not cut:
+            edges.append((a, b))
+            continue
+        if (a, b) not in splits:
+            a, b = b, a
+        chain = [a] + [v for _, v in sorted(cut)] + [b]
+        edges.extend(zip(chain, chain[1:]))
+    return edges
+
+def _project(a: Point, b: Point, p: Point) -> float:
+    """Parameter of p along segment ab"""
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    return ((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / (dx * dx + dy * dy)
+
+# --- Scene construction ---
+
+def scene_from_drawing(drawing: Drawing) -> Dict:
+    """
+    Convert a planar straight-line drawing into scene JSON data.
+
+    Neighbours are sorted counter-clockwise; each bounded face becomes a
+    region (numbered from 1 in discovery order) and every outer face is the
+    background, numbered after the last region.
+    """
+    used = sorted({v for e in drawing.edges for v in e})
+    names = {v: f"V{i}" for i, v in enumerate(used)}
+    pts = drawing.points
+
+    neighbors: Dict[int, List[int]] = {v: [] for v in used}
+    for a, b in drawing.edges:
+        neighbors[a].append(b)
+        neighbors[b].append(a)
+    position = {}
+    for v, nbs in neighbors.items():
+        x, y = pts[v]
+        nbs.sort(key=lambda n: math.atan2(pts[n][1] - y, pts[n][0] - x))
+        for i, n in enumerate(nbs):
+            position[(v, n)] = i
+
+    # Trace the face to the left of every half-edge
+    face_of: Dict[Tuple[int, int], int] = {}
+    faces: List[float] = []  # signed area per face
+    for v in used:
+        for n in neighbors[v]:
+            if (v, n) in face_of:
+                continue
+            face = len(faces)
+            area = 0.0
+            a, b = v, n
+            while (a, b) not in face_of:
+                face_of[(a, b)] = face
+                area += pts[a][0] * pts[b][1] - pts[b][0] * pts[a][1]
+                around = neighbors[b]
+                a, b = b, around[(position[(b, a)] - 1) % len(around)]
+            faces.append(area)
+
+    region = {}
+    for face, area in enumerate(faces):
+        if area > 0:
+            region[face] = len(region) + 1
+    background = len(region) + 1
+
+    vertex_data = []
+    for v in used:
+        nbs = neighbors[v]
+        kind = []
+        for i, n in enumerate(nbs):
+            nxt = nbs[(i + 1) % len(nbs)]
+            kind.append(names[n])
+            kind.append(region.get(face_of[(nxt, v)], background))
+        kind.append(names[nbs[0]])
+        x, y = pts[v]
+        vertex_data.append({"id": names[v], "coords": [round(x, 3), round(y, 3)],
+                            "kind-list": kind})
+    return {"vertex-data": vertex_data, "background": background}
+
+def _pick_sides(rnd: random.Random, regions_per_body: float) -> int:
+    """Polygon size whose region count averages out to regions_per_body"""
+    options = sorted(SIDES_TO_REGIONS.items(), key=lambda kv: kv[1])
+    lower = [s for s, r in options if r <= regions_per_body] or [options[0][0]]
+    upper = [s for s, r in options if r >= regions_per_body] or [options[-1][0]]
+    lo, hi = lower[-1], upper[0]
+    if lo == hi:
+        return lo
+    r_lo, r_hi = SIDES_TO_REGIONS[lo], SIDES_TO_REGIONS[hi]
+    return hi if rnd.random() < (regions_per_body - r_lo) / (r_hi - r_lo) else lo
+
+def generate_scene(num_bodies: Optional[int] = None, num_regions: Optional[int] = None,
+                   layout: str = "mixed", seed: int = 0) -> Dict:
+    """
+    Generate a synthetic scene.
+
+    Give num_bodies, num_regions or both; with only num_regions, bodies
+    average three regions each. layout is one of LAYOUTS. Region counts are
+    approximate: occlusion can hide or split faces.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout: {layout}")
+    if num_bodies is None:
+        num_bodies = max(1, (num_regions or 3) // 3)
+    per_body = (num_regions / num_bodies) if num_regions else 3.0
+
+    rnd = random.Random(seed)
+    drawing = Drawing()
+    cell = 100.0
+    columns = max(1, math.isqrt(num_bodies))
+
+    placed, unit = 0, 0
+    while placed < num_bodies:
+        kind = layout
+        if layout == "mixed":
+            kind = LAYOUTS[unit % 3]
+        if placed + 2 > num_bodies:
+            kind = "separate"
+
+        ox = (unit % columns) * cell
+        oy = (unit // columns) * cell
+        unit += 1
+        sides = _pick_sides(rnd, per_body)
+        size = rnd.uniform(14, 18)
+
+        if kind == "separate":
+            _, edges = place(drawing, prism(ox + 30, oy + 30, size, sides, size * 0.6))
+            drawing.edges.extend(edges)
+            placed += 1
+        elif kind == "stacked":
+            # A smaller prism standing on the top face of a larger one
+            _, base = place(drawing, prism(ox + 30, oy + 30, size, sides, size * 0.6))
+            top_sides = _pick_sides(rnd, per_body)
+            top_size = size * 0.45
+            _, top = place(drawing, prism(ox + 30 + size * 0.1, oy + 30 + size * 1.05,
+                                          top_size, top_sides, top_size * 0.6))
+            drawing.edges.extend(occlude(drawing, top, base))
+            placed += 2
+        else:
+            # A second prism behind and to the right, partly hidden
+            _, back = place(drawing, prism(ox + 30 + size * 1.55, oy + 30 + size * 0.35,
+                                           size, _pick_sides(rnd, per_body), size * 0.6))
+            _, front = place(drawing, prism(ox + 30, oy + 30, size, sides, size * 0.6))
+            drawing.edges.extend(occlude(drawing, front, back))
+            placed += 2
+
+    return scene_from_drawing(drawing)
+
+def main():
+    """Command line interface for the synthetic scene generator"""
+    import argparse
+    parser = argparse.ArgumentParser(description="Generate a synthetic line drawing")
+    parser.add_argument('--bodies', type=int, default=None, help='Number of bodies')
+    parser.add_argument('--regions', type=int, default=None, help='Approximate number of regions')
+    parser.add_argument('--layout', choices=LAYOUTS, default='mixed',
+                       help='How bodies are arranged (default: mixed)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--output', '-o', default=None, help='Output JSON file (default: stdout)')
+    args = parser.parse_args()
+
+    data = generate_scene(args.bodies, args.regions, args.layout, args.seed)
+    text = json.dumps(data)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,24 @@
 import json
+import logging
 import math
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
 
 
 def get_data(filename:str="cube.json"):
     # Load and parse the JSON file Load and para the JSON file 
-    print("Loading file...")
+    logger.debug("Loading %s...", filename)
     with open(filename, "r") as f:
         data = json.load(f)
 
+    # Raw line segments (e.g. from a vectoriser) are turned into a scene first
+    from line_ingest import is_segment_data, ingest_data
+    if is_segment_data(data):
+        logger.debug("Building junctions from %d segments...", len(data["segments"]))
+        return ingest_data(data)
+
     # # Print the entire structure to understand its contents
     # print("JSON Data Structure:")
     # print(json.dumps(data, indent=2))
@@ -33,4 +44,73 @@ def get_data(filename:str="cube.json"):
     # for vertex, kind in kind_lists.items():
     #     print(f"Vertex {vertex}: {kind}")
 
-    return data
\ No newline at end of file
+    return data
+
+
+class Scene:
+    """A parsed line drawing, shared by every pipeline stage"""
+    def __init__(self, data: dict, source: Optional[str] = None):
+        self.source = source
+        self.vertex_ids: List[str] = []
+        self.coords: Dict[str, List[float]] = {}
+        self.kind_lists: Dict[str, list] = {}
+        self.regions: Dict[str, List[int]] = {}  # {vertex: regions from its KIND list}
+        self.background = data.get("background")
+        # {vertex: [(region, sector_degrees), ...]} counter-clockwise; filled by analyze_vertices
+        self.angular_table: Optional[Dict[str, List[tuple]]] = None
+        self.graph = None  # PlanarGraph, built on first use by planar_graph.planar_graph
+
+        for v in data["vertex-data"]:
+            vid = v["id"]
+            self.vertex_ids.append(vid)
+            self.coords[vid] = v["coords"]
+            self.kind_lists[vid] = v["kind-list"]
+            self.regions[vid] = [x for x in v["kind-list"] if isinstance(x, int)]
+
+    def set_vertex(self, vid: str, coords: List[float], kind_list: list) -> None:
+        """Replace a vertex's data in place, or append a new vertex"""
+        self.graph = None
+        if vid not in self.coords:
+            self.vertex_ids.append(vid)
+        self.coords[vid] = coords
+        self.kind_lists[vid] = kind_list
+        self.regions[vid] = [x for x in kind_list if isinstance(x, int)]
+
+    def remove_vertex(self, vid: str) -> None:
+        """Drop a vertex and everything derived from it"""
+        self.graph = None
+        self.vertex_ids.remove(vid)
+        del self.coords[vid], self.kind_lists[vid], self.regions[vid]
+        if self.angular_table is not None:
+            self.angular_table.pop(vid, None)
+
+    def to_data(self) -> dict:
+        """The scene in input-file form"""
+        return {
+            "vertex-data": [{"id": vid, "coords": self.coords[vid], "kind-list": self.kind_lists[vid]}
+                            for vid in self.vertex_ids],
+            "background": self.background,
+        }
+
+    @property
+    def name(self) -> str:
+        """Short name used in banners and plot titles"""
+        return Path(self.source).stem if self.source else "scene"
+
+
+def load_scene(filename: str = "cube.json") -> Scene:
+    """
+    Read and parse an input file into a Scene. Binary .scnb files are
+    memory-mapped into a BinaryScene instead (see scene_binary.py).
+    """
+    from scene_binary import is_binary_path, load_binary
+    if is_binary_path(filename):
+        return load_binary(filename)
+    return Scene(get_data(filename), source=filename)
+
+
+def as_scene(source: Union[str, Scene]) -> Scene:
+    """Return `source` unchanged if it is already a parsed scene, otherwise load it"""
+    if not isinstance(source, (str, Path)):
+        return source
+    return load_scene(source)
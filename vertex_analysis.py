@@ -1,63 +1,365 @@
 import math
 import json
-from take_input import get_data
-from typing import Dict
+import logging
+import os
+import tempfile
+from take_input import Scene, as_scene
+from scene_binary import BinaryScene
+from planar_graph import PlanarGraph, planar_graph
+from typing import Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
 
 
 # Helper function - get list of neighbors for each vertex, and remove duplicates by making into a set
 def get_neighbors(kind):
     return set([x for x in kind if isinstance(x, str)])
 
+def sector_regions(kind, ordered_neighbors, differences) -> List[Tuple[int, float]]:
+    """
+    Pair each angular sector around a vertex with the region its KIND list
+    places there. ordered_neighbors are in counter-clockwise order; sector i
+    runs from neighbour i to neighbour i+1 and is differences[i] degrees wide.
+    KIND lists may be written in either rotational direction.
+    """
+    between = {}  # {(neighbour, next_neighbour): region}
+    for k in range(0, len(kind) - 2, 2):
+        if isinstance(kind[k], str) and isinstance(kind[k + 2], str) and isinstance(kind[k + 1], int):
+            between[(kind[k], kind[k + 2])] = kind[k + 1]
+    return _sectors_between(between, ordered_neighbors, differences)
+
+def _sectors_between(between, ordered_neighbors, differences) -> List[Tuple[int, float]]:
+    """Sectors from a {(neighbour, next_neighbour): region} table"""
+    sectors = []
+    count = len(ordered_neighbors)
+    for i in range(count):
+        a, b = ordered_neighbors[i], ordered_neighbors[(i + 1) % count]
+        region = between.get((a, b), between.get((b, a)))
+        sectors.append((region, differences[i]))
+    return sectors
+
+def build_angular_table(input: Union[str, Scene]) -> Dict[str, List[Tuple[int, float]]]:
+    """
+    {vertex: sectors} for every vertex, read off the scene's planar graph.
+    Stored on the scene and returned.
+    """
+    scene = as_scene(input)
+    table = planar_graph(scene).sector_table()
+    scene.angular_table = table
+    return table
+
+CLASSIFIER_ENGINES = ("reference", "numpy")
+
+JUNCTION_CODES = ("L", "T", "Arrow", "Fork")  # label codes used by classify_binary
+
+NEAR_TIE = 1e-9  # degrees; closer spoke angles are recomputed with math.atan2 by the numpy engine
+
+def classify_graph(graph: PlanarGraph) -> Dict[str, str]:
+    """
+    Classify every vertex from the half-edge graph: the number of lines is
+    the vertex degree and the angular gaps are stored per half-edge.
+    """
+    classifications = {}
+    offsets, gap = graph.offsets, graph.gap
+    for v, vid in enumerate(graph.vertex_ids):
+        start, end = offsets[v], offsets[v + 1]
+        label = _junction_label(end - start, gap[start:end])
+        if label:
+            classifications[vid] = label
+    return classifications
+
+def classify_vertex(scene: Scene, vid: str) -> Tuple[Optional[str], List[Tuple[int, float]]]:
+    """
+    Classify one vertex from its own neighbours. Used for vertices edited
+    after the scene's planar graph was built.
+
+    Returns the junction label (None unless two or three lines meet there)
+    and the vertex's sectors in counter-clockwise order.
+    """
+    coords = scene.coords
+    x1, y1 = coords[vid]
+    neighbors = get_neighbors(scene.kind_lists[vid])
+
+    angles = []
+    for n in neighbors:
+        x2, y2 = coords[n]
+        dx, dy = x2 - x1, y2-y1
+        angle = math.atan2(dy, dx)
+        angle_degree = math.degrees(angle)
+        angles.append((angle_degree, n))
+
+    angles.sort()
+
+    #Compute angular differences
+    differences = []
+    for i in range(len(angles)):
+        j = (i+1) % len(angles)
+        difference = (angles[j][0] - angles[i][0]) % 360
+        differences.append(difference)
+
+    # Keep the geometry for region linking
+    sectors = sector_regions(scene.kind_lists[vid], [n for _, n in angles], differences)
+
+    return _junction_label(len(neighbors), differences), sectors
+
+def _junction_label(count: int, differences: List[float]) -> Optional[str]:
+    """Junction type from the number of lines and the gaps between them"""
+    #Classifying vertices
+    label = None
+    if count == 2:
+        label = "L" #corner with 2 lines
+    elif count == 3:
+        max_angle = max(differences)
+        if any(abs(d-180) < 10 for d in differences):
+            label = "T"
+        elif max_angle > 180:
+            label = "Arrow"
+        else:
+            label = "Fork"
+    return label
+
 # Main function for analyzing
-def analyze_vertices(input:str):
-    data = get_data(input)
-    vertices = data['vertex-data']
+def analyze_vertices(input: Union[str, Scene, BinaryScene], engine: str = "reference"):
+    if engine not in CLASSIFIER_ENGINES:
+        # An engine registered in engines.py (raises ValueError for unknown names)
+        from engines import get_engine
+        return get_engine("classify", engine)(as_scene(input))
+    scene = as_scene(input)
+    if engine == "numpy":
+        if isinstance(scene, BinaryScene):
+            return classify_binary(scene, engine)
+        return classify_vertices_batched(scene)
+
+    # Reference: built once, the graph also serves region linking
+    return classify_graph(planar_graph(scene))
+
+def _scalar_angles_at_ties(np, angles, vectors) -> None:
+    """
+    Recompute with math.atan2, in place, the rows of `angles` in which two
+    spokes (nearly) coincide in direction. np.arctan2 can round such angles
+    differently from the scalar path, which would swap the spokes' order.
+    """
+    ordered = np.sort(angles, axis=1)
+    for r in np.flatnonzero((np.diff(ordered, axis=1) < NEAR_TIE).any(axis=1)).tolist():
+        angles[r] = [math.degrees(math.atan2(dy, dx)) for dx, dy in vectors[r].tolist()]
+
+def classify_vertices_batched(input: Union[str, Scene]) -> Dict[str, str]:
+    """
+    Classify all vertices in one batch with NumPy.
+
+    Gives the same labels as analyze_vertices. Neighbour vectors of every
+    3-line junction are stacked into one array, so the angles, the sorting
+    and the circular gaps are computed for all of them at once. Falls back
+    to the per-vertex classifier when NumPy is not installed.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        logger.warning("numpy not installed. Using the per-vertex classifier.")
+        return analyze_vertices(input)
+
+    scene = as_scene(input)
     classifications = {}
 
-    # Make hash table of coordinates 
-    coords = {}
-    for v in vertices:
-        coords[v["id"]]=v["coords"]
-
-    for v in vertices: 
-        x1, y1 = v["coords"]
-        neighbors = get_neighbors(v["kind-list"])
-
-        angles = []
-        for n in neighbors:
-            x2, y2 = coords[n]
-            dx, dy = x2 - x1, y2-y1
-            angle = math.atan2(dy, dx)
-            angle_degree = math.degrees(angle)
-            angles.append(angle_degree)
-
-        angles.sort()
-
-        #Compute angular differences
-        differences = []
-        for i in range(len(angles)):
-            j = (i+1) % len(angles)
-            difference = (angles[j] - angles[i]) % 360
-            differences.append(difference)
-
-        #Classifying vertices
+    # One coordinate table for the whole scene, addressed by vertex position
+    position = {vid: i for i, vid in enumerate(scene.vertex_ids)}
+    xy = np.array([scene.coords[vid] for vid in scene.vertex_ids], dtype=float).reshape(-1, 2)
+
+    # Gather: L needs no geometry, 3-line junctions are classified below
+    junctions, centres, spokes = [], [], []
+    angular_table = {}
+    kind_lists = scene.kind_lists
+    for i, vid in enumerate(scene.vertex_ids):
+        # By id, so equal angles keep the order classify_vertex gives them
+        neighbors = [position[n] for n in sorted({x for x in kind_lists[vid] if type(x) is str})]
         if len(neighbors) == 2:
-            classifications[v["id"]]="L" #corner with 2 lines
+            classifications[vid] = "L"
         elif len(neighbors) == 3:
-            max_angle = max(differences)
-            if any(abs(d-180) < 10 for d in differences):
-                classifications[v["id"]]="T"
-            elif max_angle > 180:
-                classifications[v["id"]]="Arrow"
-            else:
-                classifications[v["id"]]="Fork"
+            classifications[vid] = None  # keeps output in vertex order
+            junctions.append(vid)
+            centres.append(i)
+            spokes.extend(neighbors)
+
+    if junctions:
+        spokes = np.array(spokes, dtype=np.intp).reshape(-1, 3)
+        vectors = xy[spokes] - xy[np.array(centres, dtype=np.intp)][:, None, :]
+        angles = np.degrees(np.arctan2(vectors[..., 1], vectors[..., 0]))
+        _scalar_angles_at_ties(np, angles, vectors)
+        order = np.argsort(angles, axis=1, kind="stable")
+        angles = np.take_along_axis(angles, order, axis=1)
+        spokes = np.take_along_axis(spokes, order, axis=1)
+        differences = (np.roll(angles, -1, axis=1) - angles) % 360
+
+        is_t = (np.abs(differences - 180) < 10).any(axis=1)
+        is_arrow = differences.max(axis=1) > 180
+        labels = np.where(is_t, "T", np.where(is_arrow, "Arrow", "Fork"))
+        for vid, label in zip(junctions, labels.tolist()):
+            classifications[vid] = label
+
+        # Angular-order table for the junctions region linking looks at
+        ids = scene.vertex_ids
+        for vid, row, gaps in zip(junctions, spokes.tolist(), differences.tolist()):
+            angular_table[vid] = sector_regions(kind_lists[vid], [ids[i] for i in row], gaps)
+
+    scene.angular_table = angular_table
+    return classifications
+
+def classify_binary_vertex(scene: BinaryScene, i: int) -> Tuple[Optional[str], List[Tuple[int, float]]]:
+    """classify_vertex for vertex i of a BinaryScene, read straight from its arrays"""
+    xy = scene.xy
+    row = scene.neighbors_of(i)
+    regions = scene.regions_of(i)
+    x1, y1 = xy[2 * i], xy[2 * i + 1]
+    angles = sorted((math.degrees(math.atan2(xy[2 * n + 1] - y1, xy[2 * n] - x1)), n)
+                    for n in set(row))
+    differences = [(angles[(k + 1) % len(angles)][0] - angles[k][0]) % 360
+                   for k in range(len(angles))]
+
+    # Region k lies between neighbours k and k + 1 of the KIND list
+    between = {(row[k], row[k + 1]): regions[k] for k in range(min(len(regions), len(row) - 1))}
+    sectors = _sectors_between(between, [n for _, n in angles], differences)
+    return _junction_label(len(angles), differences), sectors
+
+def classify_binary(scene: BinaryScene, engine: str = "reference") -> Dict[str, str]:
+    """
+    Classify a BinaryScene from its coordinate and CSR arrays.
+
+    Same labels and angular table as analyze_vertices on the JSON scene.
+    The numpy engine classifies every 2- and 3-line junction at once;
+    vertices whose KIND list repeats a neighbour fall back per vertex.
+    """
+    np = None
+    if engine == "numpy":
+        try:
+            import numpy as np
+        except ImportError:
+            logger.warning("numpy not installed. Using the per-vertex classifier.")
+
+    if np is None:
+        return classify_graph(planar_graph(scene))
 
+    ids = scene.vertex_ids
+    angular_table = {}
+
+    count = scene.vertex_count
+    xy = np.frombuffer(scene.xy, dtype=np.float64).reshape(-1, 2)
+    offsets = np.frombuffer(scene.neighbor_offsets, dtype=np.int64)
+    row = np.frombuffer(scene.neighbors, dtype=np.int32)
+    region_offsets = np.frombuffer(scene.region_offsets, dtype=np.int64)
+    region_values = np.frombuffer(scene.region_values, dtype=np.int32)
+    starts, lengths = offsets[:-1], np.diff(offsets)
+    owner = np.repeat(np.arange(count), lengths)
+
+    # Drop the closing repeat of n0, then flag rows that still repeat a neighbour
+    keep = np.ones(len(row), dtype=bool)
+    if len(row):
+        closed = (lengths > 1) & (row[np.minimum(starts, len(row) - 1)] ==
+                                  row[np.maximum(offsets[1:] - 1, 0)])
+        keep[offsets[1:][closed] - 1] = False
+    spokes_all, spoke_owner = row[keep], owner[keep]
+    by_owner = np.lexsort((spokes_all, spoke_owner))
+    sorted_owner, sorted_spokes = spoke_owner[by_owner], spokes_all[by_owner]
+    repeated = (sorted_owner[1:] == sorted_owner[:-1]) & (sorted_spokes[1:] == sorted_spokes[:-1])
+    irregular = np.zeros(count, dtype=bool)
+    irregular[sorted_owner[1:][repeated]] = True
+    degree = np.bincount(spoke_owner, minlength=count)
+    spoke_starts = np.concatenate(([0], np.cumsum(degree)))[:-1]
+
+    codes = np.zeros(count, dtype=np.int8)  # 0: unlabelled, then JUNCTION_CODES
+    codes[(degree == 2) & ~irregular] = 1
+    junctions = np.flatnonzero((degree == 3) & ~irregular)
+    if len(junctions):
+        position = spoke_starts[junctions][:, None] + np.arange(3)
+        spokes = spokes_all[position]
+        vectors = xy[spokes] - xy[junctions][:, None, :]
+        angles = np.degrees(np.arctan2(vectors[..., 1], vectors[..., 0]))
+        _scalar_angles_at_ties(np, angles, vectors)
+        # Equal angles in neighbour order, as in classify_binary_vertex
+        order = np.lexsort((spokes, angles), axis=1)
+        angles = np.take_along_axis(angles, order, axis=1)
+        differences = (np.roll(angles, -1, axis=1) - angles) % 360
+        is_t = (np.abs(differences - 180) < 10).any(axis=1)
+        is_arrow = differences.max(axis=1) > 180
+        codes[junctions] = np.where(is_t, 2, np.where(is_arrow, 3, 4))
+
+        # Sector k runs from spoke order[k] to order[k + 1]; with three spokes
+        # the KIND list has them adjacent one way round or the other
+        here, following = order, np.roll(order, -1, axis=1)
+        slot = np.where((here + 1) % 3 == following, here, following)
+        region_counts = region_offsets[junctions + 1] - region_offsets[junctions]
+        valid = (slot < (lengths[junctions] - 1)[:, None]) & (slot < region_counts[:, None])
+        index = region_offsets[junctions][:, None] + np.where(valid, slot, 0)
+        if len(region_values):
+            regions = region_values[np.minimum(index, len(region_values) - 1)]
+        else:
+            regions = np.zeros_like(index)
+        for i, row_regions, row_valid, gaps in zip(junctions.tolist(), regions.tolist(),
+                                                    valid.tolist(), differences.tolist()):
+            angular_table[ids[i]] = [(r if ok else None, d)
+                                     for r, ok, d in zip(row_regions, row_valid, gaps)]
+
+    labels = (None,) + JUNCTION_CODES
+    classifications = {}
+    for i in np.flatnonzero(codes | irregular).tolist():
+        if irregular[i]:
+            label, angular_table[ids[i]] = classify_binary_vertex(scene, i)
+        else:
+            label = labels[codes[i]]
+        if label:
+            classifications[ids[i]] = label
+    scene.angular_table = angular_table
     return classifications
 
 def write_analysis(classifications: Dict[str, str], output_file: str = "vertex_analysis_output.json") -> None:
-    """Write vertex classifications to JSON file"""
-    with open(output_file, 'w') as f:
-        json.dump(classifications, f, indent=2)
+    """Write vertex classifications to JSON file.
+
+    The file is written to a temporary name in the same directory and then
+    renamed into place, so concurrent writers never leave a torn file.
+    """
+    directory = os.path.dirname(os.path.abspath(output_file))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(classifications, f, indent=2)
+        os.replace(tmp_path, output_file)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def test_batched_matches_scalar():
+    """Fuzz: the numpy classifier gives the reference labels and sectors, ties included"""
+    import json
+
+    def same_sectors(row, expected):
+        # Regions in the same order; widths may differ in the last bits of np.arctan2
+        return ([r for r, _ in row] == [r for r, _ in expected] and
+                all(abs(a - b) < NEAR_TIE for (_, a), (_, b) in zip(row, expected)))
+
+    from scene_binary import encode_data
+    from synthetic_scenes import LAYOUTS, generate_scene
+    for seed in range(12):
+        for layout in LAYOUTS:
+            data = generate_scene(num_regions=40, layout=layout, seed=seed)
+            # A coarse grid makes many spokes of a vertex point the same way
+            snapped = json.loads(json.dumps(data))
+            for vertex in snapped["vertex-data"]:
+                vertex["coords"] = [round(c / 8) * 8 for c in vertex["coords"]]
+            for scene_data in (data, snapped):
+                text = json.dumps(scene_data)
+                reference = Scene(json.loads(text))
+                expected = analyze_vertices(reference)
+                sectors = build_angular_table(reference)
+                batched = Scene(json.loads(text))
+                assert classify_vertices_batched(batched) == expected, (seed, layout)
+                for vid, row in batched.angular_table.items():
+                    assert same_sectors(row, sectors[vid]), (seed, layout, vid)
+
+                binary = BinaryScene(encode_data(scene_data))
+                assert analyze_vertices(binary, "numpy") == analyze_vertices(binary), (seed, layout)
+                table = binary.angular_table
+                binary_sectors = build_angular_table(BinaryScene(encode_data(scene_data)))
+                for vid, row in table.items():
+                    assert same_sectors(row, binary_sectors[vid]), (seed, layout, vid)
 
 def main():
     # Analyze vertices